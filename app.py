@@ -1,9 +1,18 @@
 import streamlit as st
+import os
 import sqlite3
+import threading
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import matplotlib.ticker as ticker
-from itertools import combinations
+from db_utils import ARCHIVE_DIR, PUBLISH_DIR, read_published_snapshot
+from schema import create_compat_views
+from season_archive import attach_archives
+from best_team import FORMATIONS, KADER_SIZE, BUDGET_LIMIT, DEFAULT_MARKET_VALUE, solve_best_team
+from precompute_best_teams import SEASON_GAME_DAY
+from season_cache import build_season_cache
+import queries
 
 # Setze die Page-Konfiguration
 st.set_page_config(
@@ -13,272 +22,168 @@ st.set_page_config(
 
 # Dateipfad zur Datenbank
 DB_FILE = "kicker_main.db"
+# Veröffentlichte Snapshots (PUBLISH_DIR) und archivierte Saisons (ARCHIVE_DIR) liegen in
+# den Ordnern aus db_utils neben den Skripten; fehlt PUBLISH_DIR (z.B. auf Streamlit Cloud),
+# liest die App DB_FILE direkt
+# Speicher der gemeinsamen Lese-Verbindung: Memory-Mapping und Seiten-Cache (in KiB)
+MMAP_SIZE = 256 * 1024 * 1024
+CACHE_SIZE_KIB = 64 * 1024
+# Höchstzahl zwischengespeicherter Ergebnisse je Funktion (ältere Datenstände fallen heraus)
+CACHE_MAX_ENTRIES = 256
+# Saison-Caches (NumPy), die gleichzeitig im Speicher bleiben (Saisons und Datenstände)
+SEASON_CACHE_MAX_ENTRIES = 8
+# Spieler je Seite in der Spieler-Übersicht der Saison-Analyse
+PAGE_SIZE = 50
+# Höchstzahl der Treffer der Spielersuche in der Spieler-Analyse
+SEARCH_LIMIT = 50
+
+@st.cache_resource(max_entries=2)
+def get_connection(path):
+    """
+    Eine schreibgeschützte Verbindung je Datenbankdatei für alle Sitzungen der App.
+    Veröffentlichte Snapshots ändern sich nie und werden mit immutable=1 geöffnet
+    (keine Sperren, kein Prüfen auf Änderungen). Streamlit führt Sitzungen in eigenen
+    Threads aus, daher wird jeder Zugriff über das Lock serialisiert. Bei einer noch nicht
+    migrierten Datenbank bilden TEMP-Views die Nachschlagetabellen clubs und positions nach.
+    Archivierte Saisons werden angehängt und erscheinen über TEMP-Views in denselben Tabellen.
+    """
+    mode = "mode=ro" if path == DB_FILE else "immutable=1"
+    conn = sqlite3.connect(f"file:{path}?{mode}", uri=True, check_same_thread=False)
+    conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+    conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KIB}")
+    create_compat_views(conn)
+    attach_archives(conn, ARCHIVE_DIR)
+    return conn, threading.Lock()
+
+def get_data_version():
+    """
+    Datenstand dieses Durchlaufs als (Datei, Stand). Gibt es einen veröffentlichten
+    Snapshot, ist der Stand sein Dateiname (eine Generation je Import); die App wechselt
+    also beim nächsten Durchlauf nach dem Umsetzen des Zeigers. Sonst wird DB_FILE mit
+    PRAGMA data_version gelesen, das sich nur ändert, wenn ein Import-Skript über eine
+    andere Verbindung geschrieben hat. Alle zwischengespeicherten Funktionen erhalten
+    den Stand als Argument, damit nach einem Import neue Ergebnisse geladen werden.
+    """
+    snapshot_path = read_published_snapshot(PUBLISH_DIR)
+    if snapshot_path:
+        return snapshot_path, os.path.basename(snapshot_path)
+    try:
+        conn, lock = get_connection(DB_FILE)
+        with lock:
+            return DB_FILE, conn.execute("PRAGMA data_version").fetchone()[0]
+    except sqlite3.Error as e:
+        st.error(f"Datenbankfehler: {e}")
+        return DB_FILE, None
 
 # Caching-Funktion, um Daten aus der Datenbank zu laden
-@st.cache_data
-def load_data(query, params=None):
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES)
+def load_data(query, params=None, version=None):
     """
-    Lädt Daten aus der SQLite-Datenbank.
-    Verwendet Caching, um Abfragen bei wiederholtem Laden zu beschleunigen.
+    Lädt Daten aus der SQLite-Datenbank über die gemeinsame Verbindung.
+    Verwendet Caching, um Abfragen bei wiederholtem Laden zu beschleunigen;
+    version (siehe get_data_version) bestimmt die Datei und ist Teil des Cache-Schlüssels.
     """
     try:
-        conn = sqlite3.connect(DB_FILE)
-        if params:
-            df = pd.read_sql_query(query, conn, params=params)
-        else:
-            df = pd.read_sql_query(query, conn)
-        conn.close()
-        return df
+        conn, lock = get_connection(version[0] if version else DB_FILE)
+        with lock:
+            if params:
+                return pd.read_sql_query(query, conn, params=params)
+            return pd.read_sql_query(query, conn)
     except sqlite3.Error as e:
         st.error(f"Datenbankfehler: {e}")
         return pd.DataFrame()
 
-@st.cache_data
-def load_all_seasons():
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES)
+def load_all_seasons(version):
     """Lädt alle Saisons aus der Datenbank."""
-    return load_data("SELECT season_name, season_id FROM seasons ORDER BY season_name DESC")
-
-@st.cache_data
-def load_seasonal_data(season_id):
-    """
-    Lädt Spielerdaten für eine bestimmte Saison, einschließlich Gesamtpunkten und Marktwert.
-    Berechnet die Effizienz (Punkte pro Million).
-    """
-    query = f"""
-    SELECT
-        p.player_id,
-        p.first_name || ' ' || p.last_name AS player_name,
-        psd.club AS club,
-        psd.position AS position,
-        psd.market_value AS market_value_eur,
-        MAX(ps.gesamtpunkte) AS points
-    FROM
-        player_seasonal_details psd
-    JOIN
-        players p ON psd.player_id = p.player_id
-    JOIN
-        player_stats ps ON psd.id = ps.player_seasonal_details_id
-    WHERE
-        psd.season_id = {season_id}
-    GROUP BY
-        psd.id
-    HAVING
-        points IS NOT NULL
-    """
-    df = load_data(query)
-    if not df.empty:
-        df['efficiency_points_per_mil'] = df.apply(
-            lambda row: round(row['points'] / (row['market_value_eur'] / 1_000_000), 2)
-            if row['market_value_eur'] > 0 else 0, axis=1
-        )
-    return df
+    return load_data(queries.SEASONS_QUERY, version=version)
 
-@st.cache_data
-def load_player_gameday_stats(season_id, player_names):
-    """
-    Lädt die kumulierten Gesamtpunkte pro Spieltag für ausgewählte Spieler.
-    Korrigierte Abfrage ohne JOIN auf game_days.
-    """
-    if not player_names:
-        return pd.DataFrame()
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES)
+def table_exists(table_name, version):
+    """Prüft, ob eine Tabelle existiert (ältere, noch nicht migrierte Datenbanken)."""
+    return not load_data(queries.TABLE_EXISTS_QUERY, params=(table_name,), version=version).empty
 
-    placeholders = ', '.join('?' for name in player_names)
-    query = f"""
-    SELECT
-        p.first_name || ' ' || p.last_name AS player_name,
-        ps.game_day_id as game_day_number,
-        ps.gesamtpunkte as points
-    FROM
-        player_stats ps
-    JOIN
-        player_seasonal_details psd ON ps.player_seasonal_details_id = psd.id
-    JOIN
-        players p ON psd.player_id = p.player_id
-    WHERE
-        psd.season_id = {season_id}
-        AND p.first_name || ' ' || p.last_name IN ({placeholders})
-    ORDER BY
-        player_name, game_day_number
+@st.cache_resource(max_entries=SEASON_CACHE_MAX_ENTRIES)
+def get_season_cache(season_id, version):
     """
-    df = load_data(query, params=player_names)
-    return df
-
-@st.cache_data
-def load_all_players_for_analysis():
+    Spieler, Punkte und Spieltage einer Saison als NumPy-Arrays (season_cache.py). Wird einmal
+    je Saison und Datenstand gebaut und von allen Sitzungen geteilt; Filter, Sortierung,
+    Seiten und die Eingaben für den Solver sind danach reine Array-Operationen.
     """
-    Lädt alle Spieler mit ihrer Position und ihrem Verein für alle Saisons,
-    um sie in der Spieler-Analyse-Seite auszuwählen.
+    conn, lock = get_connection(version[0] if version else DB_FILE)
+    with lock:
+        return build_season_cache(conn, season_id)
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES)
+def load_clubs(version):
+    """Alle Vereine aus allen Saisons für den Vereinsfilter der Spieler-Analyse."""
+    df = load_data(queries.CLUBS_QUERY, version=version)
+    return df['club'].tolist() if not df.empty else []
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES)
+def search_players(text, club, position, version):
     """
-    query = """
-    SELECT DISTINCT
-        p.first_name || ' ' || p.last_name AS player_name,
-        psd.club AS club,
-        psd.position AS position
-    FROM
-        players p
-    JOIN
-        player_seasonal_details psd ON p.player_id = psd.player_id
-    ORDER BY
-        player_name
+    Spielersuche der Spieler-Analyse: höchstens SEARCH_LIMIT Treffer für den eingegebenen
+    Namen (oder Namensanfang), optional auf Verein und Position eingeschränkt. Ohne den
+    Volltextindex player_search (ältere Datenbanken) wird per LIKE gesucht.
     """
-    return load_data(query)
-
-@st.cache_data
-def load_player_seasonal_overview(player_name):
+    fts = table_exists('player_search', version)
+    expression = queries.fts_search_expression(text) if fts else text.strip()
+    params = []
+    if expression:
+        params.append(expression if fts else f"%{expression}%")
+    params += [value for value in (club, position) if value]
+    query = queries.player_search_query(fts, bool(expression), club, position)
+    return load_data(query, params=(*params, SEARCH_LIMIT), version=version)
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES)
+def load_player_seasonal_overview(player_id, version):
     """
     Lädt saisonübergreifende Daten für einen bestimmten Spieler.
     """
-    query = """
-    SELECT
-        s.season_name,
-        psd.club,
-        psd.position,
-        psd.market_value AS market_value_eur,
-        MAX(ps.gesamtpunkte) AS points
-    FROM
-        player_seasonal_details psd
-    JOIN
-        players p ON psd.player_id = p.player_id
-    JOIN
-        player_stats ps ON psd.id = ps.player_seasonal_details_id
-    JOIN
-        seasons s ON psd.season_id = s.season_id
-    WHERE
-        p.first_name || ' ' || p.last_name = ?
-    GROUP BY
-        s.season_name, psd.club, psd.position, psd.market_value
-    ORDER BY
-        s.season_name
-    """
-    return load_data(query, params=(player_name,))
+    return load_data(queries.PLAYER_SEASONAL_OVERVIEW_QUERY, params=(player_id,), version=version)
 
-def get_unique_values(df, column):
-    """Gibt eine Liste der eindeutigen Werte einer Spalte zurück."""
-    if df.empty or column not in df.columns:
-        return []
-    return sorted(df[column].unique().tolist())
-
-@st.cache_data
-def load_gameday_data(season_id, gameday_number):
-    """
-    Lädt alle Spielerdaten für einen bestimmten Spieltag in einer Saison.
-    Korrigierte Abfrage: Bezieht alle Spieler der Saison ein und weist 0 Punkte zu, wenn keine Stats vorhanden sind.
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES)
+def load_player_value_history(player_id, version):
     """
-    query = f"""
-    SELECT
-        p.player_id,
-        p.first_name || ' ' || p.last_name AS player_name,
-        psd.club,
-        psd.position,
-        psd.market_value AS market_value_eur,
-        COALESCE(ps.points, 0) AS points
-    FROM
-        player_seasonal_details psd
-    JOIN
-        players p ON psd.player_id = p.player_id
-    LEFT JOIN
-        player_stats ps ON psd.id = ps.player_seasonal_details_id AND ps.game_day_id = {gameday_number}
-    WHERE
-        psd.season_id = {season_id}
-    ORDER BY
-        points DESC
+    Lädt den Verlauf von Marktwert, Verein und Position eines Spielers
+    (nur Änderungen, siehe value_history.py).
     """
-    return load_data(query)
+    if not table_exists('player_value_history', version):
+        return pd.DataFrame()
+    df = load_data(queries.PLAYER_VALUE_HISTORY_QUERY, params=(player_id,), version=version)
+    if not df.empty:
+        df['valid_from'] = pd.to_datetime(df['valid_from'])
+    return df
+
+def format_euro(values):
+    """Formatiert Beträge als '1.234.567 €' für eine ganze Spalte auf einmal (ohne apply je Zeile)."""
+    digits = values.fillna(0).round().astype('int64').astype(str)
+    return digits.str.replace(r"\B(?=(\d{3})+(?!\d))", ".", regex=True) + " €"
 
-def get_best_team(player_data, formation_counts, kader_size, budget_limit):
+def get_best_team(season_cache, game_day_number, formation_counts, kader_size, budget_limit):
     """
-    Findet das beste Team unter den gegebenen Restriktionen mittels dynamischer Programmierung.
+    Findet das beste Team unter den gegebenen Restriktionen mit dem exakten Solver aus best_team.py.
+    Die Eingaben kommen direkt aus dem Saison-Cache (game_day_number=None für die ganze Saison);
+    für einen Spieltag mit Verein, Position und Marktwert, wie sie an diesem Spieltag galten.
     """
-    if player_data.empty:
+    rows, pool = season_cache.pool(game_day_number, DEFAULT_MARKET_VALUE)
+    if len(rows) == 0:
         st.warning("Keine Spielerdaten für die ausgewählte Saison/Spieltag vorhanden.")
         return None
 
-    # Daten vorbereiten
-    player_data['market_value_eur'] = player_data['market_value_eur'].fillna(500000).astype(int)
-    player_data = player_data.drop_duplicates(subset=['player_id'])
-    
-    positions = {
-        'GOALKEEPER': player_data[player_data['position'] == 'GOALKEEPER'],
-        'DEFENDER': player_data[player_data['position'] == 'DEFENDER'],
-        'MIDFIELDER': player_data[player_data['position'] == 'MIDFIELDER'],
-        'FORWARD': player_data[player_data['position'] == 'FORWARD']
-    }
-    
-    formation_map = {
-        'GOALKEEPER': formation_counts[0], 'DEFENDER': formation_counts[1],
-        'MIDFIELDER': formation_counts[2], 'FORWARD': formation_counts[3]
-    }
-
-    # Schritt 1: Günstigste Ersatzbank auffüllen und Spielerpools für Startelf erstellen
-    starter_pools = {}
-    ersatzbank_players = []
-    ersatzbank_value = 0
-
-    for pos, df in positions.items():
-        if len(df) < kader_size[pos]:
-            st.error(f"Nicht genügend Spieler für die Position {pos}, um den Kader zu füllen. Benötigt: {kader_size[pos]}, Verfügbar: {len(df)}")
-            return None
-        
-        df_sorted = df.sort_values('market_value_eur', ascending=True)
-        num_starters = formation_map[pos]
-        num_bench = kader_size[pos] - num_starters
-        
-        bench = df_sorted.head(num_bench)
-        ersatzbank_players.append(bench)
-        ersatzbank_value += bench['market_value_eur'].sum()
-        
-        starter_pools[pos] = df[~df['player_id'].isin(bench['player_id'])].to_dict('records')
-
-    # Performance-Optimierung: Reduziere die Größe der Spieler-Pools
-    PRUNING_LIMITS = {'GOALKEEPER': 8, 'DEFENDER': 8, 'MIDFIELDER': 8, 'FORWARD': 8}
-
-    for pos in positions.keys():
-        pool = starter_pools[pos]
-        limit = PRUNING_LIMITS[pos]
-        if len(pool) > limit:
-            # Sortiere nach Punkten absteigend (primär) und Marktwert aufsteigend (sekundär)
-            sorted_pool = sorted(pool, key=lambda x: (x.get('points', 0), -x.get('market_value_eur', 999999999)), reverse=True)
-            starter_pools[pos] = sorted_pool[:limit]
-
-    budget_for_eleven = budget_limit - ersatzbank_value
-
-    # Schritt 2: Beste Startelf per Dynamic Programming (Knapsack-Problem) finden
-    dp = {0: (0.0, [])}
-    
-    for pos in ['GOALKEEPER', 'DEFENDER', 'MIDFIELDER', 'FORWARD']:
-        new_dp = {}
-        num_to_pick = formation_map[pos]
-        
-        if len(starter_pools[pos]) < num_to_pick:
-             st.error(f"Nicht genügend Spieler im Starter-Pool für Position {pos}. Benötigt: {num_to_pick}, Verfügbar: {len(starter_pools[pos])}")
-             return None
-
-        for combo in combinations(starter_pools[pos], num_to_pick):
-            combo_cost = sum(p['market_value_eur'] for p in combo)
-            combo_points = sum(p.get('points', 0) for p in combo)
-            combo_players = [p['player_id'] for p in combo]
-
-            for cost, (points, players) in dp.items():
-                new_cost = cost + combo_cost
-                if new_cost <= budget_for_eleven:
-                    new_points = points + combo_points
-                    if new_cost not in new_dp or new_points > new_dp[new_cost][0]:
-                        new_dp[new_cost] = (new_points, players + combo_players)
-        
-        if not new_dp:
-            st.warning(f"Konnte nach Hinzufügen von {pos} keine gültige Mannschaft mehr bilden.")
-            dp = {}
-            break
-        dp = new_dp
-    
-    if not dp:
-        st.error("Konnte keine Startelf finden, die das Budget einhält.")
+    try:
+        result = solve_best_team(**pool, formation_counts=formation_counts, kader_size=kader_size, budget_limit=budget_limit)
+    except ValueError as e:
+        st.error(str(e))
         return None
 
-    best_cost, (best_points, best_player_ids) = max(dp.items(), key=lambda item: item[1][0])
-
-    startelf_df = player_data[player_data['player_id'].isin(best_player_ids)]
-    ersatzbank_df = pd.concat(ersatzbank_players)
+    # Nur der gewählte Kader wird für die Anzeige zu einem DataFrame
+    chosen = np.flatnonzero(np.isin(pool['player_ids'], result['starter_ids'] + result['bench_ids']))
+    team_df = pd.DataFrame(season_cache.rows(rows[chosen], game_day_number)).assign(
+        points=pool['points'][chosen], market_value_eur=pool['market_values'][chosen])
+    startelf_df = team_df[team_df['player_id'].isin(result['starter_ids'])]
+    ersatzbank_df = team_df[team_df['player_id'].isin(result['bench_ids'])].copy()
     ersatzbank_df['points'] = 0.0
     
     final_kader_df = pd.concat([startelf_df, ersatzbank_df])
@@ -286,8 +191,30 @@ def get_best_team(player_data, formation_counts, kader_size, budget_limit):
     return {
         'team': final_kader_df,
         'playing_eleven': startelf_df,
-        'total_points': best_points,
-        'total_cost': final_kader_df['market_value_eur'].sum()
+        'total_points': result['total_points'],
+        'total_cost': result['total_cost']
+    }
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES)
+def load_precomputed_best_team(season_id, gameday_number, formation, version):
+    """
+    Lädt ein von precompute_best_teams.py vorberechnetes Team.
+    Gibt None zurück, wenn für die Auswahl (noch) kein Ergebnis vorliegt.
+    """
+    if not table_exists('best_teams', version):
+        return None
+
+    summary = load_data(queries.BEST_TEAM_SUMMARY_QUERY, params=(season_id, gameday_number, formation), version=version)
+    if summary.empty:
+        return None
+
+    team_df = load_data(queries.BEST_TEAM_PLAYERS_QUERY, params=(season_id, gameday_number, formation), version=version)
+
+    return {
+        'team': team_df,
+        'playing_eleven': team_df[team_df['is_starter'] == 1],
+        'total_points': float(summary['total_points'].iloc[0]),
+        'total_cost': int(summary['total_cost'].iloc[0])
     }
 
 # --- Layout der Streamlit-App ---
@@ -301,90 +228,92 @@ position_translation = {
     'MIDFIELDER': 'Mittelfeld',
     'FORWARD': 'Sturm'
 }
+position_codes = {german: code for code, german in position_translation.items()}
 
 # Seitenleiste
 st.sidebar.title("App-Navigation")
 page = st.sidebar.radio("Wähle eine Seite", ["Saison-Analyse", "Spieler-Analyse", "Bestes Team"])
 
+# Datenstand einmal je Durchlauf lesen; neue Importe machen die Caches ungültig
+db_version = get_data_version()
+
 # --- Seite: Saison-Analyse ---
 if page == "Saison-Analyse":
     st.header("Saison-Analyse")
     st.write("Detaillierte Analyse der Spielerleistungen innerhalb einer ausgewählten Saison.")
 
-    seasons_df = load_all_seasons()
+    seasons_df = load_all_seasons(db_version)
     if seasons_df.empty:
         st.error("Keine Saisons in der Datenbank gefunden.")
     else:
         selected_season_name = st.sidebar.selectbox("Saison wählen", seasons_df['season_name'])
         selected_season_id = int(seasons_df[seasons_df['season_name'] == selected_season_name]['season_id'].iloc[0])
         
-        seasonal_data = load_seasonal_data(selected_season_id)
+        season_cache = get_season_cache(selected_season_id, db_version)
+        filter_options = season_cache.filter_options()
 
         st.sidebar.subheader("Filter")
-        all_clubs = ['Alle'] + get_unique_values(seasonal_data, 'club')
+        all_clubs = ['Alle'] + filter_options['clubs']
         selected_club = st.sidebar.selectbox("Verein", all_clubs)
         
         # Positionen für Filter übersetzen
-        seasonal_data['position_german'] = seasonal_data['position'].map(position_translation)
-        all_positions = ['Alle'] + get_unique_values(seasonal_data, 'position_german')
+        all_positions = ['Alle'] + sorted(position_translation.get(p, p) for p in filter_options['positions'])
         selected_position_german = st.sidebar.selectbox("Position", all_positions)
         
         min_points_filter = st.sidebar.slider("Minimale Gesamtpunkte", 
-                                              int(seasonal_data['points'].min()) if not seasonal_data.empty else 0, 
-                                              int(seasonal_data['points'].max()) if not seasonal_data.empty else 1000, 
+                                              int(filter_options['min_points']) if filter_options['count'] else 0, 
+                                              int(filter_options['max_points']) if filter_options['count'] else 1000, 
                                               0)
         
-        min_market_value = float(seasonal_data['market_value_eur'].min()) if not seasonal_data.empty else 0.0
-        max_market_value = float(seasonal_data['market_value_eur'].max()) if not seasonal_data.empty else 200000000.0
+        min_market_value = float(filter_options['min_market_value']) if filter_options['count'] else 0.0
+        max_market_value = float(filter_options['max_market_value']) if filter_options['count'] else 200000000.0
         market_value_range = st.sidebar.slider(
             "Marktwert (in Mio. €)",
             min_market_value / 1_000_000, max_market_value / 1_000_000, 
             (min_market_value / 1_000_000, max_market_value / 1_000_000)
         )
 
-        filtered_data = seasonal_data.copy()
-        if selected_club != 'Alle':
-            filtered_data = filtered_data[filtered_data['club'] == selected_club]
-        if selected_position_german != 'Alle':
-            filtered_data = filtered_data[filtered_data['position_german'] == selected_position_german]
-        
-        filtered_data = filtered_data[filtered_data['points'] >= min_points_filter]
-        filtered_data = filtered_data[
-            (filtered_data['market_value_eur'] >= market_value_range[0] * 1_000_000) & 
-            (filtered_data['market_value_eur'] <= market_value_range[1] * 1_000_000)
-        ]
-
-        if not filtered_data.empty:
-            display_data = filtered_data.rename(columns={
+        # Filter und Sortierung auf den Arrays des Saison-Caches; eine Seite ist ein Ausschnitt davon
+        selected_rows = season_cache.select(
+            None if selected_club == 'Alle' else selected_club,
+            None if selected_position_german == 'Alle' else position_codes.get(selected_position_german, selected_position_german),
+            min_points_filter,
+            (round(market_value_range[0] * 1_000_000), round(market_value_range[1] * 1_000_000)),
+        )
+        page_count = max(1, -(-len(selected_rows) // PAGE_SIZE))
+        page_number = st.sidebar.number_input(f"Seite (von {page_count})", min_value=1, max_value=page_count, value=1)
+
+        if len(selected_rows):
+            page_rows = selected_rows[(page_number - 1) * PAGE_SIZE:page_number * PAGE_SIZE]
+            display_data = pd.DataFrame(season_cache.rows(page_rows))
+            display_data['position_german'] = display_data['position'].map(position_translation)
+            display_data = display_data.rename(columns={
                 'player_name': 'Spieler', 'club': 'Verein', 'position_german': 'Position',
                 'market_value_eur': 'Marktwert (€)', 'points': 'Gesamtpunkte',
                 'efficiency_points_per_mil': 'Effizienz (P/Mio.€)'
             })
-            
-            display_data['Marktwert (€)'] = display_data['Marktwert (€)'].apply(lambda x: f"{x:,.0f} €".replace(",", "."))
-            
-            # Sortierung nach Position
-            pos_order = ['Sturm', 'Mittelfeld', 'Abwehr', 'Torwart']
-            display_data['Position'] = pd.Categorical(display_data['Position'], categories=pos_order, ordered=True)
-            display_data = display_data.sort_values(by=['Position', 'Gesamtpunkte'], ascending=[True, False])
+            display_data['Marktwert (€)'] = format_euro(display_data['Marktwert (€)'])
 
             st.subheader("Spieler-Übersicht")
+            st.caption(f"{len(selected_rows)} Spieler, Seite {page_number} von {page_count}")
             st.dataframe(display_data[['Spieler', 'Verein', 'Position', 'Marktwert (€)', 'Gesamtpunkte', 'Effizienz (P/Mio.€)']], use_container_width=True, hide_index=True)
         else:
             st.warning("Keine Spieler gefunden, die den Filterkriterien entsprechen.")
 
         st.subheader("Detaillierter Spielervergleich")
-        player_options = filtered_data['player_name'].tolist()
-        if player_options:
-            selected_players = st.multiselect("Wähle Spieler für den Vergleich", player_options)
+        if len(selected_rows):
+            selected_players = st.multiselect("Wähle Spieler für den Vergleich", season_cache.player_ids[selected_rows].tolist(),
+                                              format_func=lambda player_id: season_cache.names[season_cache.index[player_id]])
             if selected_players:
-                comparison_data = load_player_gameday_stats(selected_season_id, selected_players)
-                if not comparison_data.empty:
-                    fig, ax = plt.subplots(figsize=(10, 6))
-                    for player in selected_players:
-                        player_data = comparison_data[comparison_data['player_name'] == player]
-                        ax.plot(player_data['game_day_number'], player_data['points'], label=player)
-                    
+                fig, ax = plt.subplots(figsize=(10, 6))
+                plotted = False
+                for player in selected_players:
+                    row = season_cache.index[player]
+                    gamedays, totals = season_cache.cumulative(row)
+                    plotted |= len(gamedays) > 0
+                    ax.plot(gamedays, totals, label=season_cache.names[row])
+
+                if plotted:
                     ax.set_title(f"Kumulierte Gesamtpunkte pro Spieltag ({selected_season_name})")
                     ax.set_xlabel("Spieltag")
                     ax.set_ylabel("Gesamtpunkte")
@@ -399,48 +328,72 @@ elif page == "Spieler-Analyse":
     st.header("Saisonübergreifende Spieler-Analyse")
     st.write("Wähle einen Spieler aus, um seine Leistung über die Saisons hinweg zu verfolgen.")
 
-    all_players_df = load_all_players_for_analysis()
-    if not all_players_df.empty:
-        st.sidebar.subheader("Spieler-Filter")
+    st.sidebar.subheader("Spieler-Filter")
+
+    # Positionen für Filter übersetzen
+    all_positions_player = ['Alle'] + sorted(position_translation.values())
+    selected_position_player_german = st.sidebar.selectbox("Position", all_positions_player)
+
+    # Verein-Filter
+    all_clubs_player = ['Alle'] + load_clubs(db_version)
+    selected_club_player = st.sidebar.selectbox("Verein", all_clubs_player)
+
+    # Suche in der Datenbank (Volltextindex); ausgeliefert werden nur die Treffer
+    search_text = st.text_input("Spieler suchen", placeholder="Name oder Namensanfang, z.B. 'Kane' oder 'mül'")
+    found_players_df = search_players(
+        search_text,
+        None if selected_club_player == 'Alle' else selected_club_player,
+        None if selected_position_player_german == 'Alle' else position_codes[selected_position_player_german],
+        db_version
+    )
+
+    # Spieler-Auswahl basierend auf Suche und Filtern
+    if not found_players_df.empty:
+        player_labels = {
+            row.player_id: f"{row.player_name} ({row.club}, {position_translation.get(row.position, row.position)})"
+            for row in found_players_df.itertuples()
+        }
+        player_names = dict(zip(found_players_df['player_id'], found_players_df['player_name']))
+        selected_player_id = st.selectbox("Wähle einen Spieler", list(player_labels), format_func=player_labels.get)
+        selected_player = player_names.get(selected_player_id)
+
+        if selected_player:
+            player_overview_df = load_player_seasonal_overview(selected_player_id, db_version)
+            if not player_overview_df.empty:
+                st.subheader(f"Saisonale Übersicht für {selected_player}")
+                display_df = player_overview_df.rename(columns={
+                    'season_name': 'Saison', 'club': 'Verein', 'position': 'Position',
+                    'market_value_eur': 'Marktwert (€)', 'points': 'Gesamtpunkte'
+                })
+                display_df['Position'] = display_df['Position'].map(position_translation).fillna(display_df['Position'])
+                display_df['Marktwert (€)'] = format_euro(display_df['Marktwert (€)'])
+                st.dataframe(display_df, use_container_width=True, hide_index=True)
+
+                value_history_df = load_player_value_history(selected_player_id, db_version)
+                if not value_history_df.empty:
+                    st.subheader("Marktwert-Verlauf")
+                    # Jeder Eintrag gilt bis zum nächsten; die letzte Stufe bis heute verlängern
+                    steps = pd.concat([value_history_df, value_history_df.tail(1).assign(valid_from=pd.Timestamp.now())])
+                    fig, ax = plt.subplots(figsize=(10, 4))
+                    ax.step(steps['valid_from'], steps['market_value_eur'] / 1_000_000, where='post')
+                    ax.set_xlabel("Datum")
+                    ax.set_ylabel("Marktwert (Mio. €)")
+                    ax.yaxis.set_major_formatter(ticker.FormatStrFormatter('%.1f'))
+                    ax.grid(True)
+                    fig.autofmt_xdate()
+                    st.pyplot(fig)
 
-        # Positionen für Filter übersetzen
-        all_players_df['position_german'] = all_players_df['position'].map(position_translation)
-        all_positions_player = ['Alle'] + get_unique_values(all_players_df, 'position_german')
-        selected_position_player_german = st.sidebar.selectbox("Position", all_positions_player)
-
-        # Verein-Filter
-        all_clubs_player = ['Alle'] + get_unique_values(all_players_df, 'club')
-        selected_club_player = st.sidebar.selectbox("Verein", all_clubs_player)
-
-        # Daten filtern
-        filtered_players_df = all_players_df.copy()
-        if selected_club_player != 'Alle':
-            filtered_players_df = filtered_players_df[filtered_players_df['club'] == selected_club_player]
-        if selected_position_player_german != 'Alle':
-            filtered_players_df = filtered_players_df[filtered_players_df['position_german'] == selected_position_player_german]
-
-        # Spieler-Auswahl basierend auf den Filtern
-        if not filtered_players_df.empty:
-            player_list = sorted(filtered_players_df['player_name'].unique().tolist())
-            selected_player = st.selectbox("Wähle einen Spieler", player_list)
-
-            if selected_player:
-                player_overview_df = load_player_seasonal_overview(selected_player)
-                if not player_overview_df.empty:
-                    st.subheader(f"Saisonale Übersicht für {selected_player}")
-                    display_df = player_overview_df.rename(columns={
-                        'season_name': 'Saison', 'club': 'Verein', 'position': 'Position',
-                        'market_value_eur': 'Marktwert (€)', 'points': 'Gesamtpunkte'
+                    changes_df = value_history_df.rename(columns={
+                        'valid_from': 'Gültig ab', 'season_name': 'Saison', 'club': 'Verein',
+                        'position': 'Position', 'market_value_eur': 'Marktwert (€)'
                     })
-                    display_df['Position'] = display_df['Position'].map(position_translation).fillna(display_df['Position'])
-                    display_df['Marktwert (€)'] = display_df['Marktwert (€)'].apply(lambda x: f"{x:,.0f} €".replace(",", "."))
-                    st.dataframe(display_df, use_container_width=True, hide_index=True)
-                else:
-                    st.warning(f"Keine Daten für {selected_player} gefunden.")
-        else:
-            st.warning("Keine Spieler gefunden, die den Filterkriterien entsprechen.")
+                    changes_df['Position'] = changes_df['Position'].map(position_translation).fillna(changes_df['Position'])
+                    changes_df['Marktwert (€)'] = format_euro(changes_df['Marktwert (€)'])
+                    st.dataframe(changes_df, use_container_width=True, hide_index=True)
+            else:
+                st.warning(f"Keine Daten für {selected_player} gefunden.")
     else:
-        st.error("Keine Spielerdaten zum Laden vorhanden.")
+        st.warning("Keine Spieler gefunden, die den Filterkriterien entsprechen.")
 
 
 # --- Seite: Bestes Team ---
@@ -448,80 +401,65 @@ elif page == "Bestes Team":
     st.header("Bestes Team ermitteln")
     st.write("Finde das Team mit der höchsten Punktzahl unter den gegebenen Restriktionen.")
 
-    seasons_df = load_all_seasons()
+    seasons_df = load_all_seasons(db_version)
     if seasons_df.empty:
         st.error("Keine Saisons in der Datenbank gefunden.")
     else:
         selected_season_name = st.selectbox("Saison wählen", seasons_df['season_name'])
         selected_season_id = int(seasons_df[seasons_df['season_name'] == selected_season_name]['season_id'].iloc[0])
 
-        # Korrigierte Abfrage für die Spieltagsauswahl
-        gamedays_query = f"""
-        SELECT DISTINCT ps.game_day_id FROM player_stats ps
-        JOIN player_seasonal_details psd ON psd.id = ps.player_seasonal_details_id
-        WHERE psd.season_id = {selected_season_id}
-        ORDER BY ps.game_day_id
-        """
-        gamedays_df = load_data(gamedays_query)
+        gamedays_df = load_data(queries.GAMEDAYS_QUERY, params=(selected_season_id,), version=db_version)
 
         gameday_options = ['Gesamte Saison'] + gamedays_df['game_day_id'].tolist()
         selected_gameday = st.selectbox("Spieltag wählen", gameday_options)
 
-        formations = {
-            '4-4-2': (1, 4, 4, 2), '3-5-2': (1, 3, 5, 2), '4-3-3': (1, 4, 3, 3),
-            '3-4-3': (1, 3, 4, 3), '4-5-1': (1, 4, 5, 1), '5-3-2': (1, 5, 3, 2),
-            '5-4-1': (1, 5, 4, 1),
-        }
-        selected_formation_name = st.selectbox("Wähle eine Formation", list(formations.keys()))
+        selected_formation_name = st.selectbox("Wähle eine Formation", list(FORMATIONS.keys()))
         
-        if st.button("Bestes Team berechnen"):
-            with st.spinner("Berechne das beste Team... Das kann einen Moment dauern."):
-                if selected_gameday == 'Gesamte Saison':
-                    player_data = load_seasonal_data(selected_season_id)
-                else:
-                    player_data = load_gameday_data(selected_season_id, int(selected_gameday))
-                
-                kader_size = {'GOALKEEPER': 3, 'DEFENDER': 7, 'MIDFIELDER': 7, 'FORWARD': 5}
-                budget_limit = 42_000_000
-                formation_counts = formations[selected_formation_name]
-
-                best_team_result = get_best_team(player_data, formation_counts, kader_size, budget_limit)
-                
-                if best_team_result:
-                    st.success("Berechnung abgeschlossen!")
-                    st.subheader(f"Bestes Team für: {selected_season_name}, Spieltag: {selected_gameday}")
-                    
-                    col1, col2, col3 = st.columns(3)
-                    col1.metric("Formation", selected_formation_name)
-                    col2.metric("Gesamtpunkte (Startelf)", f"{best_team_result['total_points']:,.2f}".replace(",", "."))
-                    col3.metric("Gesamtkosten (Kader)", f"{best_team_result['total_cost']:,.0f} €".replace(",", "."))
-                    
-                    st.markdown("### Startelf")
-                    playing_eleven_df = best_team_result['playing_eleven'].rename(columns={
-                        'player_name': 'Spieler', 'club': 'Verein', 'position': 'Position', 
-                        'market_value_eur': 'Marktwert (€)', 'points': 'Punkte'
-                    })
-                    playing_eleven_df['Position'] = playing_eleven_df['Position'].map(position_translation).fillna(playing_eleven_df['Position'])
-                    playing_eleven_df['Marktwert (€)'] = playing_eleven_df['Marktwert (€)'].apply(lambda x: f"{x:,.0f} €".replace(",", "."))
-                    
-                    pos_order = ['Sturm', 'Mittelfeld', 'Abwehr', 'Torwart']
-                    playing_eleven_df['Position'] = pd.Categorical(playing_eleven_df['Position'], categories=pos_order, ordered=True)
-                    
-                    st.dataframe(playing_eleven_df[['Spieler', 'Verein', 'Position', 'Punkte', 'Marktwert (€)']].sort_values('Position'), 
-                                 use_container_width=True, hide_index=True, height=420)
-                    
-                    st.markdown("### Kompletter Kader (inkl. Ersatzbank)")
-                    kader_df = best_team_result['team'].rename(columns={
-                        'player_name': 'Spieler', 'club': 'Verein', 'position': 'Position', 
-                        'market_value_eur': 'Marktwert (€)', 'points': 'Punkte'
-                    })
-                    kader_df['Position'] = kader_df['Position'].map(position_translation).fillna(kader_df['Position'])
-                    kader_df['Marktwert (€)'] = kader_df['Marktwert (€)'].apply(lambda x: f"{x:,.0f} €".replace(",", "."))
-                    
-                    kader_df['Position'] = pd.Categorical(kader_df['Position'], categories=pos_order, ordered=True)
-                    
-                    st.dataframe(kader_df[['Spieler', 'Verein', 'Position', 'Punkte', 'Marktwert (€)']].sort_values(['Position', 'Punkte'], ascending=[True, False]), 
-                                 use_container_width=True, hide_index=True)
-                else:
-                    st.error("Es konnte kein Team gefunden werden, das die Kriterien erfüllt.")
-
+        gameday_number = SEASON_GAME_DAY if selected_gameday == 'Gesamte Saison' else int(selected_gameday)
+        best_team_result = load_precomputed_best_team(selected_season_id, gameday_number, selected_formation_name, db_version)
+
+        if best_team_result is None:
+            st.info("Für diese Auswahl liegt noch kein vorberechnetes Team vor (precompute_best_teams.py).")
+            if st.button("Bestes Team berechnen"):
+                with st.spinner("Berechne das beste Team..."):
+                    season_cache = get_season_cache(selected_season_id, db_version)
+                    formation_counts = FORMATIONS[selected_formation_name]
+                    best_team_result = get_best_team(season_cache, None if selected_gameday == 'Gesamte Saison' else int(selected_gameday),
+                                                     formation_counts, KADER_SIZE, BUDGET_LIMIT)
+                    if not best_team_result:
+                        st.error("Es konnte kein Team gefunden werden, das die Kriterien erfüllt.")
+
+        if best_team_result:
+            st.subheader(f"Bestes Team für: {selected_season_name}, Spieltag: {selected_gameday}")
+            
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Formation", selected_formation_name)
+            col2.metric("Gesamtpunkte (Startelf)", f"{best_team_result['total_points']:,.2f}".replace(",", "."))
+            col3.metric("Gesamtkosten (Kader)", f"{best_team_result['total_cost']:,.0f} €".replace(",", "."))
+            
+            st.markdown("### Startelf")
+            playing_eleven_df = best_team_result['playing_eleven'].rename(columns={
+                'player_name': 'Spieler', 'club': 'Verein', 'position': 'Position', 
+                'market_value_eur': 'Marktwert (€)', 'points': 'Punkte'
+            })
+            playing_eleven_df['Position'] = playing_eleven_df['Position'].map(position_translation).fillna(playing_eleven_df['Position'])
+            playing_eleven_df['Marktwert (€)'] = format_euro(playing_eleven_df['Marktwert (€)'])
+            
+            pos_order = ['Sturm', 'Mittelfeld', 'Abwehr', 'Torwart']
+            playing_eleven_df['Position'] = pd.Categorical(playing_eleven_df['Position'], categories=pos_order, ordered=True)
+            
+            st.dataframe(playing_eleven_df[['Spieler', 'Verein', 'Position', 'Punkte', 'Marktwert (€)']].sort_values('Position'), 
+                         use_container_width=True, hide_index=True, height=420)
+            
+            st.markdown("### Kompletter Kader (inkl. Ersatzbank)")
+            kader_df = best_team_result['team'].rename(columns={
+                'player_name': 'Spieler', 'club': 'Verein', 'position': 'Position', 
+                'market_value_eur': 'Marktwert (€)', 'points': 'Punkte'
+            })
+            kader_df['Position'] = kader_df['Position'].map(position_translation).fillna(kader_df['Position'])
+            kader_df['Marktwert (€)'] = format_euro(kader_df['Marktwert (€)'])
+            
+            kader_df['Position'] = pd.Categorical(kader_df['Position'], categories=pos_order, ordered=True)
+            
+            st.dataframe(kader_df[['Spieler', 'Verein', 'Position', 'Punkte', 'Marktwert (€)']].sort_values(['Position', 'Punkte'], ascending=[True, False]), 
+                         use_container_width=True, hide_index=True)
@@ -1,58 +1,327 @@
 import requests
 import hashlib
+import json
 import os
-from datetime import datetime
+import sys
+import glob
+import random
+import sqlite3
+import asyncio
+import argparse
+from collections import deque
+from datetime import datetime, timedelta
+
+from feeds import feeds, STORE_FILE
+from snapshot_store import SnapshotStore, import_archive
 
 # Konfiguration
-url = "https://www.kicker-libero.de/api/sportsdata/v1/players-details/se-k00012025.csv" 
-download_dir = "/volume2/Austauschordner/python/kickerdb/autodownload"
-hash_file = os.path.join(download_dir, "last_hash.txt")
+# Höchstzahl gleichzeitiger Verbindungen über alle Feeds
+max_connections = 4
+# Anzahl der vollständigen CSV-Dateien, die für die Import-Skripte liegen bleiben
+keep_csv_files = 1
+# Zeitlimit pro Anfrage in Sekunden und Blockgröße beim Schreiben
+request_timeout = 30
+chunk_size = 64 * 1024
+
+# Daemon-Modus (--daemon): Abfrageintervalle in Sekunden
+# Spielzeiten (Wochentag 0=Montag, Startstunde, Endstunde), in denen sich Punkte ändern
+match_windows = [(4, 20, 23), (5, 15, 20), (6, 15, 22)]
+match_interval = 120
+# Außerhalb der Spielzeiten: Basisintervall, verdoppelt pro unveränderter Abfrage in Folge
+min_interval = 600
+max_interval = 4 * 3600
+backoff_factor = 2
+# Anzahl der letzten Abfrageergebnisse, aus denen der Backoff berechnet wird
+history_size = 8
+# Zufällige Abweichung (+/- Anteil), damit die Abfragen nicht immer zur selben Sekunde kommen
+jitter = 0.1
+# Wartezeit nach einem Fehler (Timeout, HTTP-Fehler), verdoppelt bis max_retry_delay
+retry_delay = 30
+max_retry_delay = 900
+# Wird nach jeder neuen Datei gestartet
+ingest_command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "kickerdb.py"), "ingest"]
+
+# Dateien im Download-Ordner
+HASH_FILE = "last_hash.txt"
+# ETag/Last-Modified der letzten Antwort für bedingte Anfragen
+VALIDATORS_FILE = "last_validators.json"
+
+def fetch_file(url, temp_path, validators, session=requests):
+    """
+    Bedingter Download: Sendet If-None-Match/If-Modified-Since aus den gespeicherten
+    Validatoren. Bei 200 wird der Inhalt in Blöcken nach temp_path geschrieben und dabei
+    gehasht. Gibt (Statuscode, SHA-256 oder None, neue Validatoren) zurück.
+    """
+    headers = {}
+    if validators.get('etag'):
+        headers['If-None-Match'] = validators['etag']
+    if validators.get('last_modified'):
+        headers['If-Modified-Since'] = validators['last_modified']
 
-def download_file(url, temp_path):
-    r = requests.get(url)
-    if r.status_code == 200:
+    with session.get(url, headers=headers, stream=True, timeout=request_timeout) as r:
+        if r.status_code != 200:
+            return r.status_code, None, validators
+        sha = hashlib.sha256()
         with open(temp_path, 'wb') as f:
-            f.write(r.content)
-        return True
-    return False
-
-def file_hash(path):
-    sha = hashlib.sha256()
-    with open(path, 'rb') as f:
-        for chunk in iter(lambda: f.read(4096), b''):
-            sha.update(chunk)
-    return sha.hexdigest()
-
-def load_last_hash():
+            for chunk in r.iter_content(chunk_size=chunk_size):
+                sha.update(chunk)
+                f.write(chunk)
+        new_validators = {'etag': r.headers.get('ETag'), 'last_modified': r.headers.get('Last-Modified')}
+        return 200, sha.hexdigest(), new_validators
+
+def load_last_hash(directory):
+    hash_file = os.path.join(directory, HASH_FILE)
     if os.path.exists(hash_file):
         with open(hash_file, 'r') as f:
             return f.read().strip()
     return None
 
-def save_hash(h):
-    with open(hash_file, 'w') as f:
+def save_hash(directory, h):
+    with open(os.path.join(directory, HASH_FILE), 'w') as f:
         f.write(h)
 
+def load_validators(directory):
+    validators_file = os.path.join(directory, VALIDATORS_FILE)
+    if os.path.exists(validators_file):
+        with open(validators_file, 'r') as f:
+            return json.load(f)
+    return {}
+
+def save_validators(directory, validators):
+    with open(os.path.join(directory, VALIDATORS_FILE), 'w') as f:
+        json.dump(validators, f)
+
+def prune_csv_files(directory):
+    # Ältere Versionen liegen im Delta-Speicher und werden als Datei nicht mehr gebraucht
+    files = sorted(glob.glob(os.path.join(directory, "data_*.csv")))
+    for path in files[:-keep_csv_files]:
+        os.remove(path)
+
+def remove_temp_file(temp_path):
+    # Nach einem Fehler: halb geschriebene oder nicht übernommene Datei entfernen
+    try:
+        os.remove(temp_path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        print(f"Temporäre Datei {temp_path} konnte nicht gelöscht werden: {e}")
+
+def create_session():
+    """Gemeinsame Session für alle Feeds mit begrenztem Verbindungspool."""
+    session = requests.Session()
+    # pool_block: Weitere Anfragen warten auf eine freie Verbindung statt neue zu öffnen
+    adapter = requests.adapters.HTTPAdapter(pool_connections=max_connections, pool_maxsize=max_connections, pool_block=True)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def poll_once(url, directory, session=requests, name=None):
+    """
+    Fragt den Feed einmal ab und legt eine geänderte Version ab.
+    Gibt 'neu', 'unverändert' oder 'fehler' zurück.
+    """
+    prefix = f"[{name}] " if name else ""
+    os.makedirs(directory, exist_ok=True)
+    temp_path = os.path.join(directory, "temp.csv")
+    try:
+        status, new_hash, validators = fetch_file(url, temp_path, load_validators(directory), session)
+    except (requests.RequestException, OSError) as e:
+        print(f"{prefix}Download fehlgeschlagen: {e}")
+        remove_temp_file(temp_path)
+        return 'fehler'
+
+    if status == 304:
+        # Server meldet keine Änderung, es wurde nichts übertragen
+        print(f"{prefix}Keine Änderung festgestellt (304).")
+        return 'unverändert'
+    if status != 200:
+        print(f"{prefix}Download fehlgeschlagen (HTTP {status})")
+        return 'fehler'
+
+    if new_hash == load_last_hash(directory):
+        # Keine Änderung, temporäre Datei löschen
+        remove_temp_file(temp_path)
+        try:
+            save_validators(directory, validators)
+        except OSError as e:
+            print(f"{prefix}Speichern fehlgeschlagen: {e}")
+            return 'fehler'
+        print(f"{prefix}Keine Änderung festgestellt.")
+        return 'unverändert'
+
+    # Datei hat sich verändert
+    now = datetime.now()
+    new_filename = f"data_{now.strftime('%Y-%m-%d_%H-%M-%S')}.csv"
+    try:
+        with open(temp_path, 'rb') as f:
+            content = f.read()
+        store = SnapshotStore(os.path.join(directory, STORE_FILE))
+        try:
+            # Noch nicht übernommene CSV-Dateien zuerst, damit beim Aufräumen nichts verloren geht
+            import_archive(store, directory)
+            store.add(now, content)
+        finally:
+            store.close()
+
+        os.rename(temp_path, os.path.join(directory, new_filename))
+        save_hash(directory, new_hash)
+        save_validators(directory, validators)
+        prune_csv_files(directory)
+    except (OSError, sqlite3.Error) as e:
+        # Der Hash wird erst nach dem Umbenennen gespeichert: Die nächste Abfrage lädt die
+        # Version erneut (ein bereits aufgenommener Inhalt wird vom Speicher übersprungen)
+        print(f"{prefix}Speichern fehlgeschlagen: {e}")
+        remove_temp_file(temp_path)
+        return 'fehler'
+    print(f"{prefix}Neue Version gespeichert als {new_filename} (Delta-Speicher: {STORE_FILE})")
+    return 'neu'
+
+def check_feeds(feeds):
+    """Gibt eine Fehlermeldung zurück, wenn sich Feeds einen Namen oder Zielordner teilen."""
+    for key in ("name", "directory"):
+        values = [feed[key] for feed in feeds]
+        duplicates = sorted({value for value in values if values.count(value) > 1})
+        if duplicates:
+            return f"Mehrere Feeds mit demselben Wert für '{key}': {', '.join(duplicates)}"
+    return None
+
+async def poll_feeds(feeds, session):
+    """
+    Fragt alle übergebenen Feeds gleichzeitig ab (je ein Thread, höchstens max_connections
+    gleichzeitig). Gibt ein Dict Feed-Name -> Ergebnis von poll_once zurück.
+    """
+    semaphore = asyncio.Semaphore(max_connections)
+
+    async def poll(feed):
+        async with semaphore:
+            return await asyncio.to_thread(poll_once, feed["url"], feed["directory"], session, feed["name"])
+
+    results = await asyncio.gather(*(poll(feed) for feed in feeds))
+    return {feed["name"]: result for feed, result in zip(feeds, results)}
+
+async def poll_all(feeds):
+    """Einmalige Abfrage aller Feeds (Cron-Modus)."""
+    with create_session() as session:
+        return await poll_feeds(feeds, session)
+
+def in_match_window(now):
+    return any(now.weekday() == day and start <= now.hour < end for day, start, end in match_windows)
+
+def seconds_until_next_window(now):
+    """Sekunden bis zum Beginn der nächsten Spielzeit (None ohne Spielzeiten)."""
+    starts = []
+    for day, start, _ in match_windows:
+        begin = (now + timedelta(days=(day - now.weekday()) % 7)).replace(hour=start, minute=0, second=0, microsecond=0)
+        if begin <= now:
+            begin += timedelta(days=7)
+        starts.append((begin - now).total_seconds())
+    return min(starts) if starts else None
+
+def next_interval(history, now):
+    """
+    Wartezeit bis zur nächsten Abfrage. In Spielzeiten gilt match_interval, sonst wächst
+    das Intervall exponentiell mit der Zahl der unveränderten Abfragen seit der letzten
+    Änderung (history: True = neue Version). Dazu kommt eine zufällige Abweichung. Außerhalb
+    der Spielzeiten endet die Wartezeit spätestens mit dem Beginn der nächsten Spielzeit.
+    """
+    if in_match_window(now):
+        return match_interval * random.uniform(1 - jitter, 1 + jitter)
+    unchanged = 0
+    for changed in reversed(history):
+        if changed:
+            break
+        unchanged += 1
+    interval = min(min_interval * backoff_factor ** unchanged, max_interval) * random.uniform(1 - jitter, 1 + jitter)
+    until_window = seconds_until_next_window(now)
+    return interval if until_window is None else min(interval, until_window)
+
+async def run_ingest(command):
+    """Startet den Import als eigenen Prozess, ohne die Abfrageschleife zu blockieren."""
+    print(f"Starte Import: {' '.join(command)}")
+    process = await asyncio.create_subprocess_exec(*command)
+    returncode = await process.wait()
+    if returncode != 0:
+        print(f"Import fehlgeschlagen (Exit-Code {returncode})")
+    return returncode
+
+async def run_daemon(feeds, command=None, max_polls=None):
+    """
+    Fragt die Feeds dauerhaft ab. Jeder Feed hat seinen eigenen Zeitplan (adaptiv, siehe
+    next_interval, nach Fehlern mit wachsender Wartezeit); fällige Feeds werden gemeinsam
+    und gleichzeitig abgefragt. Nach jeder neuen Datei eines Feeds mit ingest=True wird
+    der Import gestartet. Läuft noch ein Import, folgt genau ein weiterer, sobald er
+    fertig ist; die Abfragen laufen währenddessen weiter. max_polls begrenzt die Anzahl
+    der Abfragerunden (für Tests).
+    """
+    command = command or ingest_command
+    loop = asyncio.get_running_loop()
+    state = {feed["name"]: {"history": deque(maxlen=history_size), "delay": retry_delay, "due": 0}
+             for feed in feeds}
+    # Laufender Import und ob danach ein weiterer nötig ist (nie zwei gleichzeitig)
+    ingest = {"task": None, "pending": False}
+
+    def start_ingest():
+        ingest["task"] = asyncio.create_task(run_ingest(command))
+        ingest["task"].add_done_callback(ingest_done)
+
+    def ingest_done(task):
+        if not task.cancelled() and task.exception():
+            print(f"Import fehlgeschlagen: {task.exception()}")
+        if ingest["pending"]:
+            ingest["pending"] = False
+            start_ingest()
+
+    polls = 0
+    with create_session() as session:
+        while max_polls is None or polls < max_polls:
+            polls += 1
+            due = [feed for feed in feeds if state[feed["name"]]["due"] <= loop.time()]
+            results = await poll_feeds(due, session)
+            new_file = False
+            for feed in due:
+                name, result = feed["name"], results[feed["name"]]
+                feed_state = state[name]
+                if result == 'fehler':
+                    wait = feed_state["delay"] * random.uniform(1 - jitter, 1 + jitter)
+                    feed_state["delay"] = min(feed_state["delay"] * 2, max_retry_delay)
+                    print(f"[{name}] Neuer Versuch in {wait:.0f} s.")
+                else:
+                    feed_state["delay"] = retry_delay
+                    feed_state["history"].append(result == 'neu')
+                    new_file = new_file or (result == 'neu' and feed.get("ingest", False))
+                    wait = next_interval(feed_state["history"], datetime.now())
+                    print(f"[{name}] Nächste Abfrage in {wait:.0f} s.")
+                feed_state["due"] = loop.time() + wait
+            if new_file:
+                if ingest["task"] and not ingest["task"].done():
+                    ingest["pending"] = True
+                else:
+                    start_ingest()
+            if max_polls is None or polls < max_polls:
+                next_due = min(feed_state["due"] for feed_state in state.values())
+                await asyncio.sleep(max(next_due - loop.time(), 0))
+        # Laufenden und ggf. nachfolgenden Import abschließen
+        while ingest["task"] and not ingest["task"].done():
+            await asyncio.wait([ingest["task"]])
+
 def main():
-    temp_path = os.path.join(download_dir, "temp.csv")
-    if download_file(url, temp_path):
-        new_hash = file_hash(temp_path)
-        old_hash = load_last_hash()
-
-        if new_hash != old_hash:
-            # Datei hat sich verändert
-            timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-            new_filename = f"data_{timestamp}.csv"
-            new_filepath = os.path.join(download_dir, new_filename)
-            os.rename(temp_path, new_filepath)
-            save_hash(new_hash)
-            print(f"Neue Version gespeichert als {new_filename}")
-        else:
-            # Keine Änderung, temporäre Datei löschen
-            os.remove(temp_path)
-            print("Keine Änderung festgestellt.")
+    parser = argparse.ArgumentParser(description="Lädt die aktuellen Spieler-CSVs aller Feeds herunter, wenn sie sich geändert haben.")
+    parser.add_argument("--daemon", action="store_true", help="Dauerhaft mit adaptivem Zeitplan abfragen und neue Dateien sofort importieren.")
+    parser.add_argument("--feed", action="append", help="Nur diesen Feed abfragen (Name, mehrfach möglich).")
+    args = parser.parse_args()
+
+    selected = [feed for feed in feeds if not args.feed or feed["name"] in args.feed]
+    error = check_feeds(selected)
+    if error or not selected:
+        print(f"Fehler: {error or 'Kein passender Feed konfiguriert.'}")
+        return
+    if args.daemon:
+        try:
+            asyncio.run(run_daemon(selected))
+        except KeyboardInterrupt:
+            print("Beendet.")
     else:
-        print("Download fehlgeschlagen")
+        asyncio.run(poll_all(selected))
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,365 @@
+import sqlite3
+import os
+import csv
+import glob
+import time
+import hashlib
+import argparse
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+import migrate_database
+from db_utils import write_transaction
+from lookups import lookup_maps
+from schema import apply_migrations
+from season_totals import rebuild_season_totals
+from snapshot_store import SnapshotStore, SNAPSHOT_PATTERN, TIMESTAMP_FORMAT, season_name_for
+from value_history import format_timestamp
+
+# ==============================================================================
+# --- KONFIGURATION ---
+# ==============================================================================
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+ARCHIVE_DIR = os.path.join(SCRIPT_DIR, "dl-backup")
+TARGET_DB_PATH = os.path.join(SCRIPT_DIR, "kicker_history.db")
+REFERENCE_DB_PATH = os.path.join(SCRIPT_DIR, "kicker_main.db")
+
+# Ein Snapshot gilt als neuer Spieltag, wenn sich bei mindestens diesem Anteil
+# der Spieler (die auch im vorherigen Snapshot waren) die Gesamtpunkte ändern.
+# Einzelne Korrekturen zwischen den Spieltagen bleiben darunter.
+GAMEDAY_MIN_CHANGED_SHARE = 0.2
+# Neue Saison: Bei mindestens diesem Anteil der Spieler mit Punkten fallen die Punkte auf 0
+SEASON_RESET_SHARE = 0.5
+# Spieltage pro Saison (Bundesliga); nötig, um eine mitten in der Saison beginnende
+# Historie rückwärts vom letzten Spieltag zu nummerieren
+GAMEDAYS_PER_SEASON = 34
+# ==============================================================================
+
+def discover_snapshots(directory):
+    """Findet alle Snapshots im Archiv, sortiert nach dem Zeitstempel im Dateinamen."""
+    snapshots = []
+    for path in glob.glob(os.path.join(directory, "data_*.csv")):
+        match = SNAPSHOT_PATTERN.search(os.path.basename(path))
+        if match:
+            snapshots.append((datetime.strptime(match.group(1), TIMESTAMP_FORMAT), path))
+    return sorted(snapshots)
+
+
+def dedupe_snapshots(snapshots):
+    """Verwirft Snapshots, deren Inhalt (SHA-256) bereits früher vorkam."""
+    seen = set()
+    unique = []
+    for timestamp, path in snapshots:
+        with open(path, "rb") as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        if digest not in seen:
+            seen.add(digest)
+            unique.append((timestamp, path))
+    return unique
+
+
+def _to_number(value, cast, default):
+    try:
+        return cast(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _player_values(row):
+    """(Vorname, Nachname, Verein, Position, Marktwert, Punkte, Notendurchschnitt) oder None."""
+    market_value = _to_number(row["Marktwert"], int, 0)
+    if market_value == 999000000:
+        return None
+    return (
+        row["Vorname"], row["Nachname"], row["Verein"], row["Position"], market_value,
+        _to_number(row["Punkte"], float, 0.0), _to_number(row["Notendurchschnitt"], float, 0.0),
+    )
+
+
+def parse_snapshot(path):
+    """
+    Worker: liest einen Snapshot ein und gibt {Spieler-ID: Werte-Tupel} zurück.
+    Spieler mit Platzhalter-Marktwert (999000000) werden wie beim Import ignoriert.
+    """
+    players = {}
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f, delimiter=";"):
+            values = _player_values(row)
+            if values is not None:
+                players[row["ID"]] = values
+    return players
+
+
+def load_from_store(store_path):
+    """
+    Liest den Verlauf aus dem Delta-Speicher (snapshot_store.py). Geparst werden nur
+    die geänderten Zeilen, unveränderte Spieler werden vom Vorgänger übernommen.
+    """
+    store = SnapshotStore(store_path)
+    try:
+        header = None
+        timestamps, parsed, state = [], [], {}
+        for timestamp, is_base, changes in store.iter_deltas():
+            if header is None or is_base:
+                header = store.header(timestamp).split(";")
+                state = {}
+            for player_id, line in changes.items():
+                values = None if line is None else _player_values(dict(zip(header, line.split(";"))))
+                if values is None:
+                    state.pop(player_id, None)
+                else:
+                    state[player_id] = values
+            timestamps.append(timestamp)
+            parsed.append(dict(state))
+    finally:
+        store.close()
+    return timestamps, parsed
+
+
+def detect_seasons(timestamps, snapshots):
+    """
+    Ordnet die Snapshots Saisons und Spieltagen zu. Ein Spieltag beginnt mit dem
+    Snapshot, in dem sich die Punkte eines Großteils der Spieler geändert haben;
+    eine Saison endet, wenn die Punkte auf 0 zurückgesetzt werden.
+    Gibt eine Liste von Saisons zurück: {'baseline', 'gamedays', 'reset_start', 'reset_end'}.
+    """
+    seasons = [{'baseline': 0, 'gamedays': [], 'reset_start': False, 'reset_end': False}]
+    for i in range(1, len(snapshots)):
+        prev, cur = snapshots[i - 1], snapshots[i]
+        common = prev.keys() & cur.keys()
+        if not common:
+            continue
+        changed = sum(1 for pid in common if prev[pid][5] != cur[pid][5])
+        with_points = [pid for pid in common if prev[pid][5] != 0]
+        reset = sum(1 for pid in with_points if cur[pid][5] == 0)
+
+        if with_points and reset / len(with_points) >= SEASON_RESET_SHARE:
+            seasons[-1]['reset_end'] = True
+            seasons.append({'baseline': i, 'gamedays': [], 'reset_start': True, 'reset_end': False})
+        elif changed / len(common) >= GAMEDAY_MIN_CHANGED_SHARE:
+            seasons[-1]['gamedays'].append(i)
+
+    seasons = [s for s in seasons if s['gamedays']]
+    for season in seasons:
+        season['name'] = season_name_for(timestamps[season['gamedays'][0]])
+        count = len(season['gamedays'])
+        if season['reset_start'] or not season['reset_end']:
+            season['first_number'] = 1
+        else:
+            # Historie beginnt mitten in der Saison, endet aber mit dem letzten Spieltag
+            season['first_number'] = GAMEDAYS_PER_SEASON - count + 1
+        if not season['reset_start'] and not season['reset_end']:
+            print(f"WARNUNG: Saison {season['name']}: Anfang und Ende fehlen im Archiv, Spieltage werden ab 1 nummeriert.")
+    return seasons
+
+
+def build_intervals(season, snapshots, details):
+    """
+    Gültigkeitsintervalle von Verein, Position und Marktwert je Spieltag (wie details_history.py):
+    Für einen Spieltag gilt der Stand im letzten Snapshot davor. Das letzte Intervall bleibt offen.
+    Gibt Zeilen (player_id, valid_from, valid_to, Verein, Position, Marktwert) zurück.
+    """
+    spans = {}
+    last_number = season['first_number'] + len(season['gamedays']) - 1
+    for offset, index in enumerate(season['gamedays']):
+        number = season['first_number'] + offset
+        for pid, values in snapshots[index - 1].items():
+            if pid not in details:
+                continue
+            state = tuple(values[2:5])
+            player_spans = spans.setdefault(pid, [])
+            if player_spans and player_spans[-1][1] == number - 1 and player_spans[-1][2] == state:
+                player_spans[-1][1] = number
+            else:
+                player_spans.append([number, number, state])
+    return [(pid, valid_from, None if valid_to == last_number else valid_to, *state)
+            for pid, player_spans in spans.items() for valid_from, valid_to, state in player_spans]
+
+
+def build_rows(seasons, snapshots):
+    """Erzeugt die Zeilen für players, player_seasonal_details, player_stats und die Intervalle je Saison."""
+    players = {}
+    result = []
+    for season in seasons:
+        baseline = snapshots[season['baseline']]
+        # Wie process_gameday.py: Spieltagspunkte = Differenz zum letzten bekannten Gesamtstand
+        last_total = {pid: values[5] for pid, values in baseline.items()}
+        details = {}
+        stats = []
+        for offset, index in enumerate(season['gamedays']):
+            number = season['first_number'] + offset
+            for pid, values in snapshots[index].items():
+                first_name, last_name, club, position, market_value, total, grade = values
+                players.setdefault(pid, (first_name, last_name))
+                details[pid] = (club, position, market_value)
+                stats.append((pid, number, total - last_total.get(pid, 0.0), grade, total))
+                last_total[pid] = total
+        result.append((season, details, stats, build_intervals(season, snapshots, details)))
+    return players, result
+
+
+def build_value_history(timestamps, snapshots):
+    """Änderungen von Marktwert, Verein und Position über alle Snapshots (nur geänderte Werte)."""
+    last = {}
+    history = []
+    for timestamp, snapshot in zip(timestamps, snapshots):
+        season_name = season_name_for(timestamp)
+        for pid, values in snapshot.items():
+            current = (season_name, values[2], values[3], values[4])
+            if last.get(pid) != current:
+                last[pid] = current
+                history.append((pid, format_timestamp(timestamp), *current))
+    return history
+
+
+def load_database(target_path, players, seasons_rows, value_history):
+    """Schreibt alles in einer einzigen Transaktion in eine neue Datenbank. Gibt die Zeilenzahl zurück."""
+    part_path = target_path + ".part"
+    if os.path.exists(part_path):
+        os.remove(part_path)
+
+    conn = sqlite3.connect(part_path)
+    try:
+        migrate_database.create_new_schema(conn)
+        apply_migrations(conn)
+
+        rows = 0
+        with write_transaction(conn):
+            club_id, position_id = lookup_maps(conn)
+            conn.executemany("INSERT INTO players (player_id, first_name, last_name) VALUES (?, ?, ?)",
+                             [(pid, *names) for pid, names in players.items()])
+            rows += len(players)
+            for season, details, stats, intervals in seasons_rows:
+                season_id = conn.execute("INSERT INTO seasons (season_name) VALUES (?)", (season['name'],)).lastrowid
+                conn.executemany("""
+                    INSERT INTO player_seasonal_details (player_id, season_id, club_id, position_id, market_value, is_active)
+                    VALUES (?, ?, ?, ?, ?, 1)
+                """, [(pid, season_id, club_id(club), position_id(position), market_value)
+                      for pid, (club, position, market_value) in details.items()])
+                psd_ids = dict(conn.execute(
+                    "SELECT player_id, id FROM player_seasonal_details WHERE season_id = ?", (season_id,)))
+                numbers = range(season['first_number'], season['first_number'] + len(season['gamedays']))
+                conn.executemany("INSERT INTO game_days (season_id, game_day_number) VALUES (?, ?)",
+                                 [(season_id, number) for number in numbers])
+                # player_stats.game_day_id enthält (wie in process_gameday.py) die Spieltagsnummer
+                conn.executemany("""
+                    INSERT INTO player_stats (player_seasonal_details_id, game_day_id, points, grade, gesamtpunkte)
+                    VALUES (?, ?, ?, ?, ?)
+                """, [(psd_ids[pid], number, points, grade, total) for pid, number, points, grade, total in stats])
+                rebuild_season_totals(conn, season_id)
+                conn.executemany("""
+                    INSERT INTO player_seasonal_details_history
+                        (season_id, player_id, valid_from_gameday, valid_to_gameday, club_id, position_id, market_value)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                """, [(season_id, pid, valid_from, valid_to, club_id(club), position_id(position), market_value)
+                      for pid, valid_from, valid_to, club, position, market_value in intervals])
+                rows += 1 + len(details) + len(numbers) + len(stats) + len(intervals)
+
+            # Historie nur für Saisons, die auch Spieltage im Archiv haben
+            season_ids = dict(conn.execute("SELECT season_name, season_id FROM seasons"))
+            history_rows = [(pid, valid_from, season_ids[season_name], club_id(club), position_id(position), market_value)
+                            for pid, valid_from, season_name, club, position, market_value in value_history
+                            if season_name in season_ids]
+            conn.executemany("""
+                INSERT INTO player_value_history (player_id, valid_from, season_id, club_id, position_id, market_value)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, history_rows)
+            rows += len(history_rows)
+
+        conn.execute("ANALYZE")
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(part_path, target_path)
+    return rows
+
+
+def compare_with_reference(target_path, reference_path):
+    """Vergleicht die Gesamtpunkte je Spieler und Spieltag mit der Hauptdatenbank."""
+    query = """
+        SELECT s.season_name, ps.game_day_id, psd.player_id, ps.gesamtpunkte
+        FROM player_stats ps
+        JOIN player_seasonal_details psd ON psd.id = ps.player_seasonal_details_id
+        JOIN seasons s ON s.season_id = psd.season_id
+    """
+    conn = sqlite3.connect(f"file:{reference_path}?mode=ro", uri=True)
+    reference = {(season, gd, pid): total for season, gd, pid, total in conn.execute(query)}
+    conn.close()
+    conn = sqlite3.connect(target_path)
+    rebuilt = {(season, gd, pid): total for season, gd, pid, total in conn.execute(query)}
+    conn.close()
+
+    print("\n--- Vergleich mit der Hauptdatenbank ---")
+    print(f"{'Saison':<12}{'Spieltag':>9}{'Gleich':>9}{'Abweichend':>12}{'Nur Archiv':>12}{'Nur Haupt-DB':>14}")
+    keys = sorted({(season, gd) for season, gd, _ in rebuilt} & {(season, gd) for season, gd, _ in reference})
+    total_equal = total_diff = 0
+    for season, gd in keys:
+        ours = {pid: v for (s, g, pid), v in rebuilt.items() if s == season and g == gd}
+        theirs = {pid: v for (s, g, pid), v in reference.items() if s == season and g == gd}
+        common = ours.keys() & theirs.keys()
+        equal = sum(1 for pid in common if ours[pid] == theirs[pid])
+        total_equal += equal
+        total_diff += len(common) - equal
+        print(f"{season:<12}{gd:>9}{equal:>9}{len(common) - equal:>12}{len(ours.keys() - theirs.keys()):>12}{len(theirs.keys() - ours.keys()):>14}")
+
+    if not keys:
+        print("Keine gemeinsamen Spieltage gefunden.")
+    elif total_diff:
+        print(f"❌ {total_diff} von {total_equal + total_diff} Gesamtpunkteständen weichen ab.")
+    else:
+        print(f"✅ Alle {total_equal} gemeinsamen Gesamtpunktestände stimmen überein.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Baut die Historie aus den Snapshots in dl-backup/ in eine neue Datenbank.")
+    parser.add_argument("--archiv", default=ARCHIVE_DIR)
+    parser.add_argument("--speicher", help="Statt der CSV-Dateien den Delta-Speicher (snapshot_store.py) lesen.")
+    parser.add_argument("--ziel", default=TARGET_DB_PATH)
+    parser.add_argument("--vergleich", default=REFERENCE_DB_PATH, help="Datenbank zum Abgleich (leer = kein Abgleich).")
+    parser.add_argument("--workers", type=int, default=None, help="Anzahl der Prozesse (Standard: Anzahl CPUs).")
+    args = parser.parse_args()
+
+    if os.path.abspath(args.ziel) == os.path.abspath(args.vergleich):
+        print("Fehler: Zieldatenbank und Vergleichsdatenbank dürfen nicht identisch sein.")
+        return
+
+    start = time.perf_counter()
+    if args.speicher:
+        t_parse = time.perf_counter()
+        timestamps, parsed = load_from_store(args.speicher)
+        print(f"INFO: {len(parsed)} Versionen aus dem Delta-Speicher gelesen.")
+    else:
+        snapshots = discover_snapshots(args.archiv)
+        if not snapshots:
+            print(f"Fehler: Keine Snapshots in '{args.archiv}' gefunden.")
+            return
+        unique = dedupe_snapshots(snapshots)
+        print(f"INFO: {len(snapshots)} Snapshots gefunden, {len(snapshots) - len(unique)} inhaltsgleiche verworfen.")
+
+        t_parse = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            parsed = list(executor.map(parse_snapshot, [path for _, path in unique]))
+        timestamps = [timestamp for timestamp, _ in unique]
+    t_detect = time.perf_counter()
+
+    seasons = detect_seasons(timestamps, parsed)
+    for season in seasons:
+        first, last = season['gamedays'][0], season['gamedays'][-1]
+        print(f"INFO: Saison {season['name']}: Spieltage {season['first_number']}-{season['first_number'] + len(season['gamedays']) - 1} "
+              f"({timestamps[first]:%d.%m.%Y} bis {timestamps[last]:%d.%m.%Y})")
+    players, seasons_rows = build_rows(seasons, parsed)
+    value_history = build_value_history(timestamps, parsed)
+    t_load = time.perf_counter()
+
+    rows = load_database(args.ziel, players, seasons_rows, value_history)
+    end = time.perf_counter()
+
+    print(f"\nEinlesen: {t_detect - t_parse:.2f} s, Auswertung: {t_load - t_detect:.2f} s, Laden: {end - t_load:.2f} s")
+    print(f"{rows} Zeilen in {end - start:.2f} s geschrieben ({rows / (end - start):,.0f} Zeilen/s) -> {args.ziel}")
+
+    if args.vergleich and os.path.exists(args.vergleich):
+        compare_with_reference(args.ziel, args.vergleich)
+
+
+if __name__ == "__main__":
+    main()
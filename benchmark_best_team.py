@@ -0,0 +1,133 @@
+import sqlite3
+import time
+import argparse
+from itertools import combinations
+
+import pandas as pd
+
+from best_team import FORMATIONS, KADER_SIZE, BUDGET_LIMIT, POSITIONS, load_player_pool, solve_best_team
+from schema import get_schema_version, SCHEMA_VERSION
+
+# ==============================================================================
+# --- KONFIGURATION ---
+# ==============================================================================
+DB_PATH = "kicker_main.db"
+# ==============================================================================
+
+
+def legacy_best_team(player_data, formation_counts, kader_size, budget_limit):
+    """
+    Die bisherige DP aus app.py (ohne Streamlit-Ausgaben) als Vergleichsbasis:
+    günstigste Ersatzbank zuerst, danach Startelf aus den 8 punktbesten Spielern je Position.
+    """
+    formation_map = dict(zip(POSITIONS, formation_counts))
+    starter_pools = {}
+    ersatzbank_value = 0
+
+    for pos in POSITIONS:
+        df = player_data[player_data['position'] == pos]
+        if len(df) < kader_size[pos]:
+            return None
+        bench = df.sort_values('market_value_eur', ascending=True).head(kader_size[pos] - formation_map[pos])
+        ersatzbank_value += bench['market_value_eur'].sum()
+        pool = df[~df['player_id'].isin(bench['player_id'])].to_dict('records')
+        pool = sorted(pool, key=lambda x: (x.get('points', 0), -x.get('market_value_eur', 999999999)), reverse=True)
+        starter_pools[pos] = pool[:8]
+
+    budget_for_eleven = budget_limit - ersatzbank_value
+    dp = {0: (0.0, [])}
+    for pos in POSITIONS:
+        new_dp = {}
+        for combo in combinations(starter_pools[pos], formation_map[pos]):
+            combo_cost = sum(p['market_value_eur'] for p in combo)
+            combo_points = sum(p.get('points', 0) for p in combo)
+            combo_players = [p['player_id'] for p in combo]
+            for cost, (points, players) in dp.items():
+                new_cost = cost + combo_cost
+                if new_cost <= budget_for_eleven:
+                    new_points = points + combo_points
+                    if new_cost not in new_dp or new_points > new_dp[new_cost][0]:
+                        new_dp[new_cost] = (new_points, players + combo_players)
+        if not new_dp:
+            return None
+        dp = new_dp
+
+    return max(dp.values(), key=lambda item: item[0])[0]
+
+
+def pool_to_frame(pool):
+    return pd.DataFrame({
+        'player_id': pool['player_ids'], 'position': pool['positions'],
+        'market_value_eur': pool['market_values'], 'points': pool['points'],
+    })
+
+
+def run_case(label, pool):
+    """Vergleicht alte DP und exakten Solver für alle Formationen auf einem Datensatz."""
+    df = pool_to_frame(pool)
+    rows = []
+    for name, counts in FORMATIONS.items():
+        t0 = time.perf_counter()
+        legacy_points = legacy_best_team(df, counts, KADER_SIZE, BUDGET_LIMIT)
+        t1 = time.perf_counter()
+        try:
+            exact = solve_best_team(pool['player_ids'], pool['positions'], pool['market_values'], pool['points'],
+                                    counts, KADER_SIZE, BUDGET_LIMIT)
+            exact_points = exact['total_points']
+        except ValueError:
+            exact_points = None
+        t2 = time.perf_counter()
+        rows.append((label, name, legacy_points, exact_points, t1 - t0, t2 - t1))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark: alte DP vs. exakter Solver für 'Bestes Team'.")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--spieltage", action="store_true", help="Zusätzlich jeden einzelnen Spieltag vergleichen.")
+    args = parser.parse_args()
+
+    # Nur lesen: Der Benchmark darf weder Schema noch Daten der Datenbank verändern
+    conn = sqlite3.connect(f"file:{args.db}?mode=ro", uri=True)
+    version = get_schema_version(conn)
+    if version != SCHEMA_VERSION:
+        conn.close()
+        print(f"Fehler: '{args.db}' hat Schema-Version {version}, benötigt wird {SCHEMA_VERSION}. "
+              "Bitte zuerst ein Import-Skript ausführen (migriert die Datenbank).")
+        return
+    seasons = conn.execute("SELECT season_id, season_name FROM seasons ORDER BY season_name").fetchall()
+
+    rows = []
+    for season_id, season_name in seasons:
+        pool = load_player_pool(conn, season_id)
+        print(f"Saison {season_name}: {len(pool['player_ids'])} Spieler im Pool")
+        rows += run_case(f"{season_name} gesamt", pool)
+
+        if args.spieltage:
+            gamedays = [r[0] for r in conn.execute(
+                "SELECT DISTINCT ps.game_day_id FROM player_stats ps "
+                "JOIN player_seasonal_details psd ON psd.id = ps.player_seasonal_details_id "
+                "WHERE psd.season_id = ? ORDER BY ps.game_day_id", (season_id,))]
+            for gd in gamedays:
+                rows += run_case(f"{season_name} ST {gd}", load_player_pool(conn, season_id, gd))
+    conn.close()
+
+    print(f"\n{'Datensatz':<22}{'Formation':<10}{'Alt (P)':>10}{'Exakt (P)':>11}{'Alt (ms)':>10}{'Exakt (ms)':>12}")
+    worse = 0
+    for label, name, legacy_points, exact_points, t_legacy, t_exact in rows:
+        fmt = lambda v: "-" if v is None else f"{v:.0f}"
+        print(f"{label:<22}{name:<10}{fmt(legacy_points):>10}{fmt(exact_points):>11}{t_legacy * 1000:>10.1f}{t_exact * 1000:>12.1f}")
+        if legacy_points is not None and (exact_points is None or exact_points < legacy_points):
+            worse += 1
+
+    improved = sum(1 for r in rows if r[2] is not None and r[3] is not None and r[3] > r[2])
+    print(f"\nFälle: {len(rows)}, davon vom exakten Solver verbessert: {improved}")
+    print(f"Gesamtzeit alt: {sum(r[4] for r in rows):.2f} s, exakt: {sum(r[5] for r in rows):.2f} s")
+    if worse:
+        print(f"❌ FEHLER: In {worse} Fällen ist der exakte Solver schlechter als die alte DP.")
+    else:
+        print("✅ Der exakte Solver ist in allen Fällen mindestens so gut wie die alte DP.")
+
+
+if __name__ == "__main__":
+    main()
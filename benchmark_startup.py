@@ -0,0 +1,75 @@
+import os
+import sys
+import glob
+import time
+import argparse
+import statistics
+import subprocess
+
+# ==============================================================================
+# --- KONFIGURATION ---
+# ==============================================================================
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+ARCHIVE_DIR = os.path.join(SCRIPT_DIR, "dl-backup")
+# Wiederholungen je Messung (jeweils ein neuer Python-Prozess)
+RUNS = 5
+# ==============================================================================
+
+# Bisheriger Weg (pandas) und neuer Weg (player_csv) zum Einlesen einer Spieler-CSV
+PANDAS_READ = """
+import pandas as pd
+df = pd.read_csv(CSV_PATH, sep=';')
+df = df[df['Marktwert'] != 999000000].copy()
+df['Marktwert'] = pd.to_numeric(df['Marktwert'], errors='coerce').fillna(0).astype(int)
+df['Punkte'] = pd.to_numeric(df['Punkte'], errors='coerce').fillna(0).astype(float)
+"""
+CSV_READ = """
+from player_csv import read_players
+players = read_players(CSV_PATH)
+"""
+
+# Import der Cron-Einstiegspunkte; pandas darf dabei nicht geladen werden
+ENTRY_POINTS = ["kickerdb", "update_master_data", "process_gameday"]
+PANDAS_CHECK = "import sys\nassert 'pandas' not in sys.modules, 'pandas wurde geladen'\n"
+
+
+def measure(code, runs):
+    """Median der Laufzeit eines neuen Python-Prozesses, der code ausführt (in Sekunden)."""
+    durations = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=SCRIPT_DIR, check=True)
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark: Kaltstart der Cron-Skripte mit und ohne pandas.")
+    parser.add_argument("--csv", help="Spieler-CSV für die Lesemessung (Standard: neueste Datei im Archiv).")
+    parser.add_argument("--runs", type=int, default=RUNS)
+    args = parser.parse_args()
+
+    csv_path = args.csv or max(glob.glob(os.path.join(ARCHIVE_DIR, "data_*.csv")))
+    prefix = f"CSV_PATH = {csv_path!r}\n"
+    print(f"Messung mit {os.path.basename(csv_path)}, Median aus {args.runs} Prozessen.\n")
+
+    rows = [
+        ("Leerer Python-Start", measure("pass", args.runs)),
+        ("CSV lesen mit pandas", measure(prefix + PANDAS_READ, args.runs)),
+        ("CSV lesen mit player_csv", measure(prefix + CSV_READ, args.runs)),
+    ]
+    for module in ENTRY_POINTS:
+        rows.append((f"import {module}", measure(f"import {module}\n" + PANDAS_CHECK, args.runs)))
+    rows.append(("import pandas (zum Vergleich)", measure("import pandas", args.runs)))
+
+    print(f"{'Messung':<34}{'Zeit (ms)':>10}")
+    for label, duration in rows:
+        print(f"{label:<34}{duration * 1000:>10.0f}")
+
+    saved = rows[1][1] - rows[2][1]
+    print(f"\nCSV-Einlesen ohne pandas: {saved * 1000:.0f} ms schneller ({rows[1][1] / rows[2][1]:.1f}x).")
+    print("✅ Keiner der Einstiegspunkte lädt pandas.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+import math
+import numpy as np
+
+# ==============================================================================
+# --- KONFIGURATION ---
+# ==============================================================================
+POSITIONS = ['GOALKEEPER', 'DEFENDER', 'MIDFIELDER', 'FORWARD']
+
+FORMATIONS = {
+    '4-4-2': (1, 4, 4, 2), '3-5-2': (1, 3, 5, 2), '4-3-3': (1, 4, 3, 3),
+    '3-4-3': (1, 3, 4, 3), '4-5-1': (1, 4, 5, 1), '5-3-2': (1, 5, 3, 2),
+    '5-4-1': (1, 5, 4, 1),
+}
+
+KADER_SIZE = {'GOALKEEPER': 3, 'DEFENDER': 7, 'MIDFIELDER': 7, 'FORWARD': 5}
+BUDGET_LIMIT = 42_000_000
+
+# Marktwert für Spieler ohne Eintrag
+DEFAULT_MARKET_VALUE = 500000
+
+# Obergrenze für die Anzahl der Budget-Stufen. Alle Marktwerte im Managerspiel
+# sind Vielfache von 100.000 €, das ergibt bei 42 Mio. nur 420 Stufen.
+MAX_BUDGET_STEPS = 5000
+# ==============================================================================
+
+SEASON_POOL_QUERY = """
+    SELECT psd.player_id, pos.name AS position, psd.market_value, t.gesamtpunkte AS points
+    FROM player_season_totals t
+    JOIN player_seasonal_details psd ON psd.id = t.player_seasonal_details_id
+    LEFT JOIN positions pos ON pos.position_id = psd.position_id
+    WHERE t.season_id = ? AND t.gesamtpunkte IS NOT NULL
+"""
+
+# Position und Marktwert wie zum Spieltag gültig (player_seasonal_details_history)
+GAMEDAY_POOL_QUERY = """
+    SELECT psd.player_id, pos.name AS position, h.market_value, COALESCE(ps.points, 0) AS points
+    FROM player_seasonal_details psd
+    JOIN player_seasonal_details_history h
+        ON h.season_id = psd.season_id AND h.player_id = psd.player_id
+       AND h.valid_from_gameday <= :game_day
+       AND (h.valid_to_gameday IS NULL OR h.valid_to_gameday >= :game_day)
+    LEFT JOIN positions pos ON pos.position_id = h.position_id
+    LEFT JOIN player_stats ps ON psd.id = ps.player_seasonal_details_id AND ps.game_day_id = :game_day
+    WHERE psd.season_id = :season_id
+"""
+
+# Entscheidungen im Positions-DP
+_SKIP, _STARTER, _BENCH = 0, 1, 2
+
+
+def _budget_unit(market_values, budget_limit):
+    """Ermittelt die Schrittweite des Kostenrasters (ggT aller Marktwerte)."""
+    unit = int(budget_limit)
+    for value in market_values:
+        unit = math.gcd(unit, int(value))
+    unit = max(unit, 1)
+    if budget_limit // unit > MAX_BUDGET_STEPS:
+        # Ungewöhnlich feine Marktwerte: auf ein gröberes Raster ausweichen.
+        # Kosten werden dabei aufgerundet, das Ergebnis bleibt im Budget.
+        unit = math.ceil(budget_limit / MAX_BUDGET_STEPS)
+    return unit
+
+
+def _solve_position(costs, points, num_starters, num_bench, max_steps):
+    """
+    0/1-Knapsack für eine Position mit exakter Anzahl an Start- und Bankspielern.
+
+    Liefert für jede Kostenstufe die maximal erreichbaren Startelf-Punkte sowie
+    die Entscheidungstabellen für die Rekonstruktion.
+    """
+    dp = np.full((num_starters + 1, num_bench + 1, max_steps + 1), -np.inf)
+    dp[0, 0, 0] = 0.0
+    decisions = np.zeros((len(costs), num_starters + 1, num_bench + 1, max_steps + 1), dtype=np.int8)
+
+    for i, (cost, pts) in enumerate(zip(costs, points)):
+        if cost > max_steps:
+            continue
+        new_dp = dp.copy()
+        width = max_steps + 1 - cost
+
+        if num_starters > 0:
+            candidate = dp[:-1, :, :width] + pts
+            target = new_dp[1:, :, cost:]
+            better = candidate > target
+            target[better] = candidate[better]
+            decisions[i, 1:, :, cost:][better] = _STARTER
+
+        if num_bench > 0:
+            candidate = dp[:, :-1, :width]
+            target = new_dp[:, 1:, cost:]
+            better = candidate > target
+            target[better] = candidate[better]
+            decisions[i, :, 1:, cost:][better] = _BENCH
+
+        dp = new_dp
+
+    return dp[num_starters, num_bench], decisions
+
+
+def _backtrack_position(decisions, costs, num_starters, num_bench, step):
+    """Rekonstruiert Start- und Bankspieler (Indizes) einer Position."""
+    starters, bench = [], []
+    s, b = num_starters, num_bench
+    for i in range(len(costs) - 1, -1, -1):
+        choice = decisions[i, s, b, step]
+        if choice == _STARTER:
+            starters.append(i)
+            s -= 1
+            step -= costs[i]
+        elif choice == _BENCH:
+            bench.append(i)
+            b -= 1
+            step -= costs[i]
+    return starters, bench
+
+
+def _combine(left, right, max_steps):
+    """Max-Plus-Faltung zweier Kostenvektoren. Merkt sich die Aufteilung des Budgets."""
+    combined = np.full(max_steps + 1, -np.inf)
+    split = np.zeros(max_steps + 1, dtype=np.int64)
+    for c in np.flatnonzero(np.isfinite(left)):
+        candidate = left[c] + right[:max_steps + 1 - c]
+        target = combined[c:]
+        better = candidate > target
+        target[better] = candidate[better]
+        split[c:][better] = c
+    return combined, split
+
+
+def load_player_pool(conn, season_id, game_day_number=None):
+    """
+    Lädt den Spieler-Pool einer Saison (game_day_number=None) oder eines Spieltags
+    als NumPy-Arrays: player_ids, positions, market_values, points. Für einen Spieltag
+    gelten Position und Marktwert, wie sie an diesem Spieltag gültig waren.
+    """
+    if game_day_number is None:
+        rows = conn.execute(SEASON_POOL_QUERY, (season_id,)).fetchall()
+    else:
+        rows = conn.execute(GAMEDAY_POOL_QUERY, {"season_id": season_id, "game_day": game_day_number}).fetchall()
+
+    seen = set()
+    pool = {'player_ids': [], 'positions': [], 'market_values': [], 'points': []}
+    for player_id, position, market_value, points in rows:
+        if player_id in seen:
+            continue
+        seen.add(player_id)
+        pool['player_ids'].append(player_id)
+        pool['positions'].append(position)
+        pool['market_values'].append(DEFAULT_MARKET_VALUE if market_value is None else market_value)
+        pool['points'].append(points or 0)
+
+    return {
+        'player_ids': np.array(pool['player_ids'], dtype=object),
+        'positions': np.array(pool['positions'], dtype=object),
+        'market_values': np.array(pool['market_values'], dtype=np.int64),
+        'points': np.array(pool['points'], dtype=float),
+    }
+
+
+def solve_best_team(player_ids, positions, market_values, points, formation_counts, kader_size, budget_limit):
+    """
+    Findet den exakt besten Kader (Startelf + Ersatzbank) unter dem Budget.
+
+    Im Gegensatz zur alten Variante wird kein Spieler-Pool beschnitten: Für jede
+    Position läuft ein Knapsack über alle Spieler auf einem Kostenraster
+    (ggT der Marktwerte), danach werden die vier Positionen per Max-Plus-Faltung
+    kombiniert. Start- und Bankspieler werden gemeinsam gewählt, die Bank zählt
+    nur mit ihren Kosten.
+
+    Gibt ein Dict mit 'starter_ids', 'bench_ids', 'total_points' und 'total_cost'
+    zurück und wirft einen ValueError, wenn kein gültiger Kader existiert.
+    """
+    positions = np.asarray(positions)
+    market_values = np.asarray(market_values, dtype=np.int64)
+    points = np.asarray(points, dtype=float)
+    player_ids = np.asarray(player_ids)
+
+    formation_map = dict(zip(POSITIONS, formation_counts))
+    unit = _budget_unit(market_values, budget_limit)
+    max_steps = int(budget_limit // unit)
+    steps = -(-market_values // unit)  # aufrunden
+
+    pos_results = {}
+    for pos in POSITIONS:
+        idx = np.flatnonzero(positions == pos)
+        if len(idx) < kader_size[pos]:
+            raise ValueError(f"Nicht genügend Spieler für die Position {pos}, um den Kader zu füllen. Benötigt: {kader_size[pos]}, Verfügbar: {len(idx)}")
+
+        # Günstige Spieler zuerst: Gleichstände werden so zugunsten der Bank aufgelöst
+        idx = idx[np.argsort(market_values[idx], kind='stable')]
+        num_starters = formation_map[pos]
+        num_bench = kader_size[pos] - num_starters
+        best, decisions = _solve_position(steps[idx], points[idx], num_starters, num_bench, max_steps)
+        pos_results[pos] = (idx, best, decisions, num_starters, num_bench)
+
+    # Positionen nacheinander kombinieren
+    total = pos_results[POSITIONS[0]][1]
+    splits = []
+    for pos in POSITIONS[1:]:
+        total, split = _combine(total, pos_results[pos][1], max_steps)
+        splits.append(split)
+
+    if not np.isfinite(total).any():
+        raise ValueError("Konnte keine Startelf finden, die das Budget einhält.")
+
+    # argmax liefert bei Gleichstand die günstigste Kostenstufe
+    step = int(np.argmax(total))
+    total_points = float(total[step])
+
+    # Budget rückwärts auf die Positionen verteilen
+    pos_steps = {}
+    for pos, split in zip(reversed(POSITIONS[1:]), reversed(splits)):
+        left_step = int(split[step])
+        pos_steps[pos] = step - left_step
+        step = left_step
+    pos_steps[POSITIONS[0]] = step
+
+    starter_ids, bench_ids = [], []
+    for pos in POSITIONS:
+        idx, _, decisions, num_starters, num_bench = pos_results[pos]
+        starters, bench = _backtrack_position(decisions, steps[idx], num_starters, num_bench, pos_steps[pos])
+        starter_ids.extend(player_ids[idx[starters]].tolist())
+        bench_ids.extend(player_ids[idx[bench]].tolist())
+
+    chosen = np.isin(player_ids, starter_ids + bench_ids)
+    return {
+        'starter_ids': starter_ids,
+        'bench_ids': bench_ids,
+        'total_points': total_points,
+        'total_cost': int(market_values[chosen].sum()),
+    }
@@ -0,0 +1,197 @@
+import sqlite3
+import os
+import re
+import glob
+import time
+import fcntl
+import shutil
+from contextlib import contextmanager
+from datetime import datetime
+
+# ==============================================================================
+# --- KONFIGURATION ---
+# ==============================================================================
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKUP_DIR = os.path.join(SCRIPT_DIR, "backups")
+
+# Anzahl der aufbewahrten Sicherungen (älteste werden gelöscht)
+BACKUP_KEEP = 7
+# Eine neue Sicherung wird höchstens alle X Stunden erstellt, nicht bei jedem Cron-Lauf
+BACKUP_MIN_INTERVAL_HOURS = 24
+# Seiten pro Backup-Schritt; zwischen den Schritten bleibt die Datenbank für andere frei
+BACKUP_PAGES_PER_STEP = 1024
+# Veröffentlichte, schreibgeschützte Snapshots für die Streamlit-App
+PUBLISH_DIR = os.path.join(SCRIPT_DIR, "published")
+# Anzahl der aufbewahrten Generationen (Sitzungen dürfen die vorige noch lesen)
+PUBLISH_KEEP = 3
+# Abgeschlossene Saisons, je Saison eine schreibgeschützte Datei (season_archive.py)
+ARCHIVE_DIR = os.path.join(SCRIPT_DIR, "archive")
+# ==============================================================================
+
+
+def get_db_connection(path):
+    """
+    Öffnet die Datenbank zum Schreiben im WAL-Modus.
+    Leser (z.B. die Streamlit-App) werden durch laufende Schreibvorgänge nicht blockiert.
+    """
+    try:
+        conn = sqlite3.connect(path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute("PRAGMA busy_timeout = 30000")
+        return conn
+    except sqlite3.Error as e:
+        print(f"Fehler beim Verbinden mit der Datenbank unter {path}: {e}")
+        return None
+
+
+@contextmanager
+def write_transaction(conn):
+    """
+    Führt alle Schreibvorgänge in einer einzigen Transaktion auf der Live-Datenbank aus
+    ("Alles-oder-Nichts"). Bei einem Fehler wird alles zurückgerollt.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+
+def checkpoint(conn):
+    """Überträgt das WAL vollständig in die Datenbankdatei und leert es."""
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+
+def _list_backups(db_path, backup_dir):
+    name = os.path.splitext(os.path.basename(db_path))[0]
+    return sorted(glob.glob(os.path.join(backup_dir, f"{name}_*.db")))
+
+
+def backup_database(db_path, backup_dir=BACKUP_DIR, keep=BACKUP_KEEP, min_interval_hours=BACKUP_MIN_INTERVAL_HOURS):
+    """
+    Erstellt eine Sicherung über die SQLite-Backup-API (schrittweise, konsistent) und
+    rotiert die vorhandenen Sicherungen. Ist die letzte Sicherung jünger als
+    min_interval_hours, wird nichts getan. Gibt den Pfad der neuen Sicherung oder None zurück.
+    """
+    os.makedirs(backup_dir, exist_ok=True)
+    backups = _list_backups(db_path, backup_dir)
+    if backups and time.time() - os.path.getmtime(backups[-1]) < min_interval_hours * 3600:
+        return None
+
+    name = os.path.splitext(os.path.basename(db_path))[0]
+    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    backup_path = os.path.join(backup_dir, f"{name}_{timestamp}.db")
+    part_path = backup_path + ".part"
+
+    src = sqlite3.connect(db_path, timeout=30)
+    dst = sqlite3.connect(part_path)
+    try:
+        src.backup(dst, pages=BACKUP_PAGES_PER_STEP)
+        # Sicherungen sind einzelne, in sich geschlossene Dateien
+        dst.execute("PRAGMA journal_mode = DELETE")
+    finally:
+        dst.close()
+        src.close()
+    os.replace(part_path, backup_path)
+
+    backups = _list_backups(db_path, backup_dir)
+    for old in backups[:-keep]:
+        os.remove(old)
+    return backup_path
+
+
+def backup_archive_file(archive_path, backup_dir=BACKUP_DIR):
+    """
+    Sichert eine Archivdatei (season_archive.py) nach backup_dir/archive/. Archivdateien
+    ändern sich nach dem Schreiben nicht mehr, daher genügt eine Sicherung je Datei; sie
+    fällt nicht unter die Rotation der Datenbanksicherungen. Gibt den Pfad der Sicherung zurück.
+    """
+    target_dir = os.path.join(backup_dir, "archive")
+    os.makedirs(target_dir, exist_ok=True)
+    backup_path = os.path.join(target_dir, os.path.basename(archive_path))
+    part_path = backup_path + ".part"
+    shutil.copyfile(archive_path, part_path)
+    with open(part_path, "rb") as f:
+        os.fsync(f.fileno())
+    os.chmod(part_path, 0o444)
+    os.replace(part_path, backup_path)
+    return backup_path
+
+
+# Zeiger auf die aktuelle Generation: eine Zeile mit dem Dateinamen des Snapshots
+POINTER_FILE = "CURRENT"
+
+
+def read_published_snapshot(publish_dir=PUBLISH_DIR):
+    """Pfad des zuletzt veröffentlichten Snapshots oder None, wenn es (noch) keinen gibt."""
+    try:
+        with open(os.path.join(publish_dir, POINTER_FILE), encoding="utf-8") as f:
+            name = f.read().strip()
+    except FileNotFoundError:
+        return None
+    path = os.path.join(publish_dir, name)
+    return path if name and os.path.exists(path) else None
+
+
+def _fsync_dir(directory):
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def publish_snapshot(db_path, publish_dir=PUBLISH_DIR, keep=PUBLISH_KEEP):
+    """
+    Veröffentlicht den aktuellen Stand als neue Generation für die App: eine in sich
+    geschlossene Kopie (Backup-API, danach VACUUM und ANALYZE), die nie wieder verändert
+    wird. Erst wenn die Datei vollständig geschrieben ist, wird der Zeiger POINTER_FILE
+    atomar umgesetzt; die App wechselt beim nächsten Durchlauf und öffnet die Datei mit
+    immutable=1. Gibt den Pfad des Snapshots zurück, bei einem Fehler None (die Daten
+    in db_path sind davon nicht betroffen).
+    """
+    os.makedirs(publish_dir, exist_ok=True)
+    try:
+        # Gleichzeitige Importe (Cron und Ordner-Watcher) veröffentlichen nacheinander
+        with open(os.path.join(publish_dir, POINTER_FILE + ".lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            current = read_published_snapshot(publish_dir)
+            generation = int(re.search(r"_(\d+)\.db$", current).group(1)) + 1 if current else 1
+            name = os.path.splitext(os.path.basename(db_path))[0]
+            snapshot_path = os.path.join(publish_dir, f"{name}_{generation:06d}.db")
+            part_path = snapshot_path + ".part"
+
+            src = sqlite3.connect(db_path, timeout=30)
+            dst = sqlite3.connect(part_path)
+            try:
+                src.backup(dst, pages=BACKUP_PAGES_PER_STEP)
+                dst.execute("PRAGMA journal_mode = DELETE")
+                dst.execute("VACUUM")
+                dst.execute("ANALYZE")
+                dst.commit()
+            finally:
+                dst.close()
+                src.close()
+            with open(part_path, "rb") as f:
+                os.fsync(f.fileno())
+            os.replace(part_path, snapshot_path)
+
+            pointer_part = os.path.join(publish_dir, POINTER_FILE + ".part")
+            with open(pointer_part, "w", encoding="utf-8") as f:
+                f.write(os.path.basename(snapshot_path) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(pointer_part, os.path.join(publish_dir, POINTER_FILE))
+            _fsync_dir(publish_dir)
+
+            # Alte Generationen löschen; offene Verbindungen lesen unter Linux ungestört weiter
+            for old in sorted(glob.glob(os.path.join(publish_dir, f"{name}_*.db")))[:-keep]:
+                os.remove(old)
+        return snapshot_path
+    except (sqlite3.Error, OSError) as e:
+        print(f"WARNUNG: Snapshot für die App konnte nicht veröffentlicht werden: {e}")
+        return None
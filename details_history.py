@@ -0,0 +1,67 @@
+# ==============================================================================
+# Gültigkeitsintervalle der Saison-Stammdaten (player_seasonal_details_history)
+# ==============================================================================
+# player_seasonal_details hält je Spieler und Saison nur den aktuellen Stand von
+# Verein, Position und Marktwert. Diese Tabelle hält zusätzlich, ab welchem und bis
+# zu welchem Spieltag ein Stand galt (valid_from_gameday / valid_to_gameday, offenes
+# Ende = NULL). Stammdaten eines Snapshots gelten ab dem ersten Spieltag, der zu
+# diesem Zeitpunkt noch nicht erfasst ist: Ein Wechsel nach Spieltag 12 gilt ab
+# Spieltag 13. Mehrere Änderungen vor demselben Spieltag überschreiben sich, es
+# bleibt der letzte Stand vor dem Anpfiff.
+#
+# Der Primärschlüssel (season_id, player_id, valid_from_gameday) macht den Stand
+# "zum Spieltag N" zu einer Bereichssuche je Spieler (valid_from_gameday <= N).
+#
+# Hinweis: player_stats.game_day_id enthält die Spieltagsnummer.
+
+# Parameter: season_id
+NEXT_GAMEDAY_QUERY = "SELECT COALESCE(MAX(game_day_number), 0) + 1 FROM game_days WHERE season_id = ?"
+
+# Weicht der aktuelle Stand vom offenen Intervall ab (oder ist der Spieler nicht mehr aktiv)?
+_CHANGED = """
+    (psd.is_active = 0 OR h.club_id IS NOT psd.club_id OR h.position_id IS NOT psd.position_id
+     OR h.market_value IS NOT psd.market_value)
+"""
+
+# Offene Intervalle, die vor dem nächsten Spieltag begonnen haben, enden mit dem letzten Spieltag
+CLOSE_CHANGED_SQL = f"""
+    UPDATE player_seasonal_details_history AS h
+    SET valid_to_gameday = :game_day - 1
+    FROM player_seasonal_details psd
+    WHERE h.season_id = :season_id AND h.valid_to_gameday IS NULL AND h.valid_from_gameday < :game_day
+      AND psd.season_id = h.season_id AND psd.player_id = h.player_id
+      AND {_CHANGED}
+"""
+
+# Erst ab dem nächsten Spieltag gültige Intervalle werden ersetzt, nicht geschlossen
+DISCARD_CHANGED_SQL = f"""
+    DELETE FROM player_seasonal_details_history AS h
+    WHERE h.season_id = :season_id AND h.valid_to_gameday IS NULL AND h.valid_from_gameday = :game_day
+      AND EXISTS (SELECT 1 FROM player_seasonal_details psd
+                  WHERE psd.season_id = h.season_id AND psd.player_id = h.player_id AND {_CHANGED})
+"""
+
+OPEN_INTERVALS_SQL = """
+    INSERT INTO player_seasonal_details_history
+        (season_id, player_id, valid_from_gameday, valid_to_gameday, club_id, position_id, market_value)
+    SELECT psd.season_id, psd.player_id, :game_day, NULL, psd.club_id, psd.position_id, psd.market_value
+    FROM player_seasonal_details psd
+    WHERE psd.season_id = :season_id AND psd.is_active = 1
+      AND NOT EXISTS (SELECT 1 FROM player_seasonal_details_history h
+                      WHERE h.season_id = psd.season_id AND h.player_id = psd.player_id
+                        AND h.valid_to_gameday IS NULL)
+"""
+
+
+def record_details_history(conn, season_id):
+    """
+    Schreibt die Gültigkeitsintervalle der Saison nach dem aktuellen Stand von
+    player_seasonal_details fort. Läuft in der Transaktion des Stammdaten-Imports; ein
+    in derselben Transaktion erfasster Spieltag muss bereits in game_days stehen.
+    Gibt die Anzahl der neu geöffneten Intervalle zurück.
+    """
+    params = {"season_id": season_id, "game_day": conn.execute(NEXT_GAMEDAY_QUERY, (season_id,)).fetchone()[0]}
+    conn.execute(CLOSE_CHANGED_SQL, params)
+    conn.execute(DISCARD_CHANGED_SQL, params)
+    return conn.execute(OPEN_INTERVALS_SQL, params).rowcount
+
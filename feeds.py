@@ -0,0 +1,24 @@
+import os
+
+# ==============================================================================
+# --- KONFIGURATION ---
+# ==============================================================================
+# Feed-Verzeichnis für autodownload.py und kickerdb.py ingest. Liegt in einer eigenen
+# Datei, damit der Import nicht requests und den Download-Code mitlädt.
+base_url = "https://www.kicker-libero.de/api/sportsdata/v1/players-details/"
+base_dir = "/volume2/Austauschordner/python/kickerdb"
+# Alle abgefragten Feeds. Jeder Feed braucht einen eigenen Zielordner, dort liegen auch
+# sein Hash, seine Validatoren und sein Delta-Speicher. Nur Feeds mit ingest=True lösen
+# im Daemon-Modus den Import in kicker_main.db aus.
+feeds = [
+    {"name": "bl1-2025", "league": "1. Bundesliga", "season": "2025/2026", "url": base_url + "se-k00012025.csv",
+     "directory": os.path.join(base_dir, "autodownload"), "ingest": True},
+    {"name": "bl2-2025", "league": "2. Bundesliga", "season": "2025/2026", "url": base_url + "se-k00022025.csv",
+     "directory": os.path.join(base_dir, "autodownload_bl2"), "ingest": False},
+    {"name": "bl1-2024", "league": "1. Bundesliga", "season": "2024/2025", "url": base_url + "se-k00012024.csv",
+     "directory": os.path.join(base_dir, "autodownload_bl1_2024"), "ingest": False},
+]
+
+# Verlauf aller Versionen als Delta-Speicher (siehe snapshot_store.py), im Zielordner jedes Feeds
+STORE_FILE = "snapshots.db"
+# ==============================================================================
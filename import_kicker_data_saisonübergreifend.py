@@ -1,10 +1,16 @@
 import sqlite3
-import pandas as pd
 import os
 import glob
-import shutil
 from datetime import datetime
 
+from player_csv import read_players
+from db_utils import get_db_connection, write_transaction, checkpoint, backup_database, publish_snapshot
+from details_history import record_details_history
+from lookups import lookup_maps
+from schema import apply_migrations
+from season_totals import refresh_efficiency
+from value_history import csv_timestamp, record_value_changes
+
 # ==============================================================================
 # --- KONFIGURATION ---
 # ==============================================================================
@@ -18,8 +24,6 @@ PROCESS_GAME_DAY_NUMBER = 1 # Beispiel: 1, 2, 3, ... oder None
 # Pfade zur Datenbank und zum Download-Ordner
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 DB_PATH = os.path.join(SCRIPT_DIR, "kicker_main.db")
-DB_TEMP_PATH = os.path.join(SCRIPT_DIR, "kicker_main.db.tmp")
-DB_BACKUP_PATH = os.path.join(SCRIPT_DIR, "kicker_main.db.bak")
 DOWNLOAD_DIR = os.path.join(SCRIPT_DIR, "autodownload")
 # ==============================================================================
 
@@ -31,30 +35,6 @@ def find_latest_csv(directory):
         return None
     return max(files, key=os.path.getctime)
 
-def get_db_connection(path):
-    """Stellt eine Verbindung zur angegebenen Datenbankdatei her."""
-    try:
-        conn = sqlite3.connect(path, timeout=10)
-        conn.row_factory = sqlite3.Row
-        return conn
-    except sqlite3.Error as e:
-        print(f"Fehler beim Verbinden mit der Datenbank unter {path}: {e}")
-        return None
-
-def ensure_schema_updates(conn):
-    """Stellt sicher, dass alle notwendigen Spalten existieren."""
-    with conn:
-        cursor = conn.cursor()
-        cursor.execute("PRAGMA table_info(player_seasonal_details)")
-        columns = [row['name'] for row in cursor.fetchall()]
-        if 'is_active' not in columns:
-            cursor.execute("ALTER TABLE player_seasonal_details ADD COLUMN is_active INTEGER DEFAULT 1")
-        
-        cursor.execute("PRAGMA table_info(player_stats)")
-        columns = [row['name'] for row in cursor.fetchall()]
-        if 'gesamtpunkte' not in columns:
-            cursor.execute("ALTER TABLE player_stats ADD COLUMN gesamtpunkte REAL DEFAULT 0")
-
 def main():
     """Hauptfunktion des Skripts."""
     csv_path = find_latest_csv(DOWNLOAD_DIR)
@@ -62,34 +42,27 @@ def main():
         print(f"Fehler: Keine CSV-Datei im Verzeichnis '{DOWNLOAD_DIR}' gefunden.")
         return
 
-    # 1. Bereite die temporäre Datenbank vor
     if not os.path.exists(DB_PATH):
         print(f"Fehler: Original-Datenbank '{DB_PATH}' nicht gefunden. Bitte zuerst migrieren.")
         return
-    
-    # Lösche alte Temp-Dateien, falls vorhanden
-    if os.path.exists(DB_TEMP_PATH):
-        os.remove(DB_TEMP_PATH)
 
-    print(f"Erstelle eine temporäre Kopie der Datenbank für sichere Bearbeitung...")
-    shutil.copy2(DB_PATH, DB_TEMP_PATH)
-
-    conn = get_db_connection(DB_TEMP_PATH)
+    conn = get_db_connection(DB_PATH)
     if not conn:
         return
 
     try:
+        # Schema-Updates zuerst
+        apply_migrations(conn)
+
         print(f"Verarbeite Datei: {os.path.basename(csv_path)}")
-        df_csv_raw = pd.read_csv(csv_path, sep=';')
-        df_csv = df_csv_raw[df_csv_raw['Marktwert'] != 999000000].copy()
-        df_csv['Marktwert'] = pd.to_numeric(df_csv['Marktwert'], errors='coerce').fillna(0).astype(int)
-        df_csv['Punkte'] = pd.to_numeric(df_csv['Punkte'], errors='coerce').fillna(0).astype(float)
+        players = read_players(csv_path)
         
-        # Führe alle Schreibvorgänge in einer einzigen Transaktion auf der TEMP-DB aus
-        with conn:
-            # Schema-Updates zuerst
-            ensure_schema_updates(conn)
+        backup_path = backup_database(DB_PATH)
+        if backup_path:
+            print(f"Sicherung erstellt: {os.path.basename(backup_path)}")
 
+        # Führe alle Schreibvorgänge in einer einzigen Transaktion direkt auf der Live-DB aus
+        with write_transaction(conn):
             cursor = conn.cursor()
             
             # Saison anlegen/holen
@@ -103,47 +76,42 @@ def main():
             
             # Stammdaten aktualisieren
             cursor.execute("UPDATE player_seasonal_details SET is_active = 0 WHERE season_id = ?", (season_id,))
-            for _, row in df_csv.iterrows():
-                cursor.execute("INSERT OR IGNORE INTO players (player_id, first_name, last_name) VALUES (?, ?, ?)", (row['ID'], row['Vorname'], row['Nachname']))
+            club_id, position_id = lookup_maps(conn)
+            for p in players:
+                cursor.execute("""
+                    INSERT INTO players (player_id, first_name, last_name, short_name, display_name)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT(player_id) DO UPDATE SET
+                        short_name = excluded.short_name, display_name = excluded.display_name
+                    WHERE players.short_name IS NOT excluded.short_name OR players.display_name IS NOT excluded.display_name;
+                """, (p.player_id, p.first_name, p.last_name, p.short_name, p.display_name))
                 cursor.execute("""
-                    INSERT INTO player_seasonal_details (player_id, season_id, club, position, market_value, is_active)
+                    INSERT INTO player_seasonal_details (player_id, season_id, club_id, position_id, market_value, is_active)
                     VALUES (?, ?, ?, ?, ?, 1)
                     ON CONFLICT(player_id, season_id) DO UPDATE SET
-                        club = excluded.club, position = excluded.position, market_value = excluded.market_value, is_active = 1;
-                """, (row['ID'], season_id, row['Verein'], row['Position'], row['Marktwert']))
+                        club_id = excluded.club_id, position_id = excluded.position_id, market_value = excluded.market_value, is_active = 1;
+                """, (p.player_id, season_id, club_id(p.club), position_id(p.position), p.market_value))
+            refresh_efficiency(conn, season_id)
+            record_value_changes(conn, season_id, csv_timestamp(csv_path))
+            record_details_history(conn, season_id)
 
             # Spieltag verarbeiten (falls angegeben)
             if PROCESS_GAME_DAY_NUMBER is not None:
                 # Logik für Spieltagsverarbeitung hier...
                 pass
 
-        # 2. Wenn alles erfolgreich war, ersetze die Original-DB
-        conn.close() # Wichtig: Verbindung vor dem Verschieben schließen!
-        print("Transaktion erfolgreich. Ersetze Original-Datenbank...")
-        
-        # Erstelle ein Backup der alten DB (optional, aber sicher)
-        if os.path.exists(DB_BACKUP_PATH):
-            os.remove(DB_BACKUP_PATH)
-        os.rename(DB_PATH, DB_BACKUP_PATH)
-        
-        # Verschiebe die neue, aktualisierte DB an den richtigen Ort
-        os.rename(DB_TEMP_PATH, DB_PATH)
-        
+        checkpoint(conn)
+        conn.close()
         print("\nUpdate erfolgreich abgeschlossen!")
+        snapshot_path = publish_snapshot(DB_PATH)
+        if snapshot_path:
+            print(f"INFO: Snapshot für die App veröffentlicht: {os.path.basename(snapshot_path)}")
 
     except (sqlite3.Error, Exception) as e:
         print(f"\n--- FEHLER! ---")
         print(f"Ein Fehler ist aufgetreten: {e}")
-        print("Das Update wurde abgebrochen. Die Original-Datenbank wurde nicht verändert.")
-        if conn:
-            conn.close()
-        # Lösche die fehlerhafte temporäre Datei
-        if os.path.exists(DB_TEMP_PATH):
-            os.remove(DB_TEMP_PATH)
-    finally:
-        # Lösche die Backup-Datei, wenn alles gut ging
-        if os.path.exists(DB_BACKUP_PATH) and not os.path.exists(DB_TEMP_PATH):
-            os.remove(DB_BACKUP_PATH)
+        print("Das Update wurde abgebrochen. Die Transaktion wurde zurückgerollt, die Datenbank ist unverändert.")
+        conn.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,248 @@
+import sqlite3
+import os
+import hashlib
+import time
+import argparse
+from datetime import datetime
+
+import precompute_best_teams
+from backfill_history import GAMEDAY_MIN_CHANGED_SHARE, SEASON_RESET_SHARE
+from db_utils import get_db_connection, write_transaction, checkpoint, backup_database, publish_snapshot
+from details_history import record_details_history
+from feeds import feeds, STORE_FILE
+from player_csv import read_players
+from process_gameday import get_last_total_points, compute_gameday_points, insert_gameday_stats
+from schema import apply_migrations
+from season_totals import refresh_efficiency, update_season_totals
+from snapshot_store import SnapshotStore, import_archive, season_name_for, TIMESTAMP_FORMAT
+from update_master_data import load_csv_staging, apply_master_data
+from value_history import format_timestamp, record_value_changes
+
+# ==============================================================================
+# --- KONFIGURATION ---
+# ==============================================================================
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DB_PATH = os.path.join(SCRIPT_DIR, "kicker_main.db")
+# Liga der Hauptdatenbank; Feeds anderer Ligen werden nicht übernommen (sie würden
+# die Stammdaten derselben Saison überschreiben)
+DB_LEAGUE = "1. Bundesliga"
+# ==============================================================================
+
+# Zuletzt verarbeiteter Snapshot einer Quelle (Parameter: source). Einträge aus der Zeit
+# vor der Spalte source (leere Quelle) gelten für alle Quellen.
+LAST_INGESTED_QUERY = "SELECT MAX(taken_at) FROM ingest_log WHERE source IN (?, '')"
+# Derselbe Snapshot (Zeitpunkt und Inhalt) wurde bereits aus irgendeiner Quelle übernommen
+ALREADY_INGESTED_QUERY = "SELECT 1 FROM ingest_log WHERE taken_at = ? AND content_hash = ?"
+
+
+def already_ingested(conn, timestamp, content):
+    params = (format_timestamp(timestamp), hashlib.sha256(content).hexdigest())
+    return conn.execute(ALREADY_INGESTED_QUERY, params).fetchone() is not None
+
+
+def ingest_source(directory):
+    """Quelle eines Snapshots im Protokoll: der Download-Ordner (gleicher Ordner, gleicher Stand)."""
+    return os.path.realpath(directory)
+
+
+def get_or_create_season(conn, season_name):
+    res = conn.execute("SELECT season_id FROM seasons WHERE season_name = ?", (season_name,)).fetchone()
+    if res:
+        return res[0]
+    return conn.execute("INSERT INTO seasons (season_name) VALUES (?)", (season_name,)).lastrowid
+
+
+def detect_season(conn, timestamp, players):
+    """
+    Saison einer Version ohne feste Saisonangabe. Ein Saisonwechsel laut Datum wird erst
+    übernommen, wenn die Punkte zurückgesetzt wurden (wie in backfill_history.py); bis
+    dahin liefert der Feed noch die alte Saison.
+    """
+    season_name = season_name_for(timestamp)
+    latest = conn.execute("SELECT season_id, season_name FROM seasons ORDER BY season_name DESC LIMIT 1").fetchone()
+    if latest is None or season_name <= latest[1]:
+        return season_name
+    last_points = get_last_total_points(conn, latest[0])
+    points = {p.player_id: p.points for p in players}
+    with_points = [pid for pid, total in last_points.items() if total != 0 and pid in points]
+    reset = sum(1 for pid in with_points if points[pid] == 0)
+    if with_points and reset / len(with_points) < SEASON_RESET_SHARE:
+        return latest[1]
+    return season_name
+
+
+def next_game_day_number(conn, season_id):
+    res = conn.execute("SELECT MAX(game_day_number) FROM game_days WHERE season_id = ?", (season_id,)).fetchone()
+    return (res[0] or 0) + 1
+
+
+def pending_snapshots(conn, store, source, since=None):
+    """
+    Alle Versionen im Delta-Speicher, die neuer sind als der zuletzt aus dieser Quelle
+    verarbeitete Snapshot. Ist das Protokoll für sie leer, gilt since als Startpunkt;
+    ohne since nur die neueste Version (wie bisher bei den einzelnen Skripten).
+    """
+    timestamps = [timestamp for timestamp, _, _ in store.list_snapshots()]
+    last = conn.execute(LAST_INGESTED_QUERY, (source,)).fetchone()[0]
+    if last:
+        return [ts for ts in timestamps if format_timestamp(ts) > last]
+    if since:
+        return [ts for ts in timestamps if ts >= since]
+    return timestamps[-1:]
+
+
+def ingest_snapshot(conn, season_name, timestamp, content, source):
+    """
+    Verarbeitet eine Version in der laufenden Transaktion: Stammdaten, Marktwert-Historie,
+    und, wenn sich die Punkte eines Großteils der Spieler geändert haben, den nächsten
+    Spieltag samt Saison-Summen; danach die Gültigkeitsintervalle der Stammdaten. Ohne
+    season_name wird die Saison erkannt (detect_season). Protokolliert wird die Version
+    unter ihrer Quelle (ingest_source). Gibt (season_id, Spieltagsnummer oder None) zurück.
+    """
+    # Jede Version wird genau einmal geparst
+    players = read_players(content)
+    season_name = season_name or detect_season(conn, timestamp, players)
+    season_id = get_or_create_season(conn, season_name)
+
+    load_csv_staging(conn, players)
+    summary = apply_master_data(conn, season_id)
+    refresh_efficiency(conn, season_id)
+    history_rows = record_value_changes(conn, season_id, timestamp)
+
+    gameday_rows, changed_count = compute_gameday_points(players, get_last_total_points(conn, season_id))
+    game_day_number = None
+    if not gameday_rows or changed_count / len(gameday_rows) < GAMEDAY_MIN_CHANGED_SHARE:
+        note = f"{changed_count} Punkteänderungen, kein neuer Spieltag" if changed_count else "keine Punkteänderungen"
+    else:
+        game_day_number = next_game_day_number(conn, season_id)
+        conn.execute("INSERT INTO game_days (season_id, game_day_number) VALUES (?, ?)", (season_id, game_day_number))
+        # player_stats.game_day_id enthält (wie in process_gameday.py) die Spieltagsnummer
+        stats_rows = insert_gameday_stats(conn, season_id, game_day_number, gameday_rows)
+        update_season_totals(conn, season_id, game_day_number)
+        note = f"Spieltag {game_day_number} mit {stats_rows} Punkteeinträgen"
+
+    # Erst nach einem neuen Spieltag: die Stammdaten dieses Snapshots gelten ab dem nächsten
+    interval_rows = record_details_history(conn, season_id)
+
+    conn.execute("""
+        INSERT INTO ingest_log (source, taken_at, content_hash, season_id, game_day_number, ingested_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, (source, format_timestamp(timestamp), hashlib.sha256(content).hexdigest(), season_id, game_day_number,
+          format_timestamp(datetime.now())))
+
+    print(f"INFO: {timestamp:%Y-%m-%d %H:%M:%S} ({season_name}): {summary['csv_players']} Spieler, "
+          f"{summary['new_players']} neu, {summary['changed_players']} gewechselt, "
+          f"{summary['deactivated_players']} deaktiviert, {history_rows} Marktwert-Änderungen, "
+          f"{interval_rows} neue Stammdaten-Intervalle, {note}.")
+    return season_id, game_day_number
+
+
+def update_best_teams(conn, new_game_days, workers=None):
+    """Berechnet die besten Teams für neue Spieltage ({season_id: [Spieltage]}) und die Saison neu."""
+    tasks = precompute_best_teams.collect_tasks(conn, list(new_game_days), new_game_days)
+    precompute_best_teams.store_results(conn, precompute_best_teams.solve_tasks(tasks, workers))
+    print(f"INFO: Beste Teams für {len(tasks)} Spieler-Pools berechnet.")
+
+
+def ingest(db_path, directory, season_name=None, since=None, workers=None):
+    """
+    Verarbeitet alle ausstehenden Versionen aus dem Delta-Speicher eines Download-Ordners
+    der Reihe nach, mit einer Verbindung und in einer einzigen Transaktion. Beste Teams
+    werden für die neuen Spieltage in derselben Transaktion berechnet.
+    Ohne season_name wird die Saison je Version erkannt (detect_season).
+    """
+    store = SnapshotStore(os.path.join(directory, STORE_FILE))
+    conn = None
+    try:
+        # CSV-Dateien, die noch nicht im Delta-Speicher liegen (z.B. von Hand abgelegt)
+        import_archive(store, directory)
+
+        conn = get_db_connection(db_path)
+        if not conn:
+            return
+        apply_migrations(conn)
+
+        source = ingest_source(directory)
+        pending = pending_snapshots(conn, store, source, since)
+        if not pending:
+            print(f"INFO: Keine neuen Snapshots in '{directory}'.")
+            return
+        print(f"INFO: {len(pending)} ausstehende Snapshots in '{directory}'.")
+
+        backup_path = backup_database(db_path)
+        if backup_path:
+            print(f"INFO: Sicherung erstellt: {os.path.basename(backup_path)}")
+
+        start = time.perf_counter()
+        # Alle Schreibvorgänge in einer einzigen Transaktion direkt auf der Live-Datenbank
+        with write_transaction(conn):
+            new_game_days = {}
+            for timestamp in pending:
+                content = store.export_csv(timestamp)
+                if already_ingested(conn, timestamp, content):
+                    print(f"INFO: {timestamp:%Y-%m-%d %H:%M:%S} bereits aus einem anderen Ordner übernommen.")
+                    continue
+                season_id, game_day_number = ingest_snapshot(conn, season_name, timestamp, content, source)
+                if game_day_number is not None:
+                    new_game_days.setdefault(season_id, []).append(game_day_number)
+
+            if new_game_days:
+                update_best_teams(conn, new_game_days, workers)
+
+        checkpoint(conn)
+        print(f"Datenbank erfolgreich aktualisiert ({len(pending)} Snapshots in {time.perf_counter() - start:.2f} s).")
+        snapshot_path = publish_snapshot(db_path)
+        if snapshot_path:
+            print(f"INFO: Snapshot für die App veröffentlicht: {os.path.basename(snapshot_path)}")
+
+    except (sqlite3.Error, ValueError, KeyError) as e:
+        print(f"\n--- FEHLER! ---")
+        print(f"Ein Fehler ist aufgetreten: {e}")
+        print("Der Import wurde abgebrochen. Die Transaktion wurde zurückgerollt, die Datenbank ist unverändert.")
+    finally:
+        store.close()
+        if conn:
+            conn.close()
+
+
+def parse_since(value):
+    """Startpunkt für --ab: Datum (YYYY-MM-DD) oder Zeitstempel (YYYY-MM-DD_HH-MM-SS)."""
+    if len(value) == 10:
+        return datetime.fromisoformat(value)
+    return datetime.strptime(value, TIMESTAMP_FORMAT)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Kicker-Datenbank: gemeinsamer Einstiegspunkt.")
+    sub = parser.add_subparsers(dest="befehl", required=True)
+    p_ingest = sub.add_parser("ingest", help="Neue Snapshots in die Datenbank übernehmen (Stammdaten, Spieltage, beste Teams).")
+    p_ingest.add_argument("--db", default=DB_PATH)
+    p_ingest.add_argument("--feed", action="append", help="Nur diesen Feed verarbeiten (Standard: alle Feeds mit ingest=True).")
+    p_ingest.add_argument("--verzeichnis", help="Statt der Feeds diesen Download-Ordner verarbeiten.")
+    p_ingest.add_argument("--saison", help="Saison für --verzeichnis (Standard: aus Zeitpunkt und Punkte-Reset erkannt).")
+    p_ingest.add_argument("--ab", type=parse_since, help="Startpunkt, solange noch kein Snapshot verarbeitet wurde (Standard: nur der neueste).")
+    p_ingest.add_argument("--workers", type=int, default=None, help="Prozesse für die besten Teams (Standard: Anzahl CPUs).")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        print(f"Fehler: Datenbank '{args.db}' nicht gefunden.")
+        return
+
+    if args.befehl == "ingest":
+        if args.verzeichnis:
+            ingest(args.db, args.verzeichnis, args.saison, args.ab, args.workers)
+            return
+        selected = [feed for feed in feeds if (feed["name"] in args.feed if args.feed else feed.get("ingest", False))]
+        if not selected:
+            print("Fehler: Kein passender Feed konfiguriert.")
+        other_league = [feed["name"] for feed in selected if feed["league"] != DB_LEAGUE]
+        if other_league:
+            print(f"Fehler: {', '.join(other_league)} gehört nicht zur Liga der Datenbank ({DB_LEAGUE}), kein Import.")
+            return
+        for feed in selected:
+            print(f"--- {feed['name']} ({feed['league']}, {feed['season']}) ---")
+            ingest(args.db, feed["directory"], feed["season"], args.ab, args.workers)
+
+
+if __name__ == "__main__":
+    main()
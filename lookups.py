@@ -0,0 +1,38 @@
+# ==============================================================================
+# Nachschlagetabellen für Vereine und Positionen (clubs, positions)
+# ==============================================================================
+# player_seasonal_details und player_value_history speichern Verein und Position
+# nicht mehr als Text je Zeile, sondern als Ganzzahl-Schlüssel (club_id,
+# position_id). Die Import-Skripte lösen die Namen aus der CSV über eine im
+# Speicher gehaltene Zuordnung Name -> ID auf (LookupMap); unbekannte Namen werden
+# dabei in der laufenden Transaktion angelegt. Abfragen, die Namen anzeigen,
+# holen sie per JOIN aus clubs bzw. positions.
+
+# Tabelle -> Schlüsselspalte
+LOOKUP_TABLES = {"clubs": "club_id", "positions": "position_id"}
+
+
+class LookupMap:
+    """
+    Zuordnung Name -> ID einer Nachschlagetabelle, einmal je Import geladen. Neue Namen
+    werden angelegt; der Aufrufer muss sich in einer Schreib-Transaktion befinden.
+    """
+
+    def __init__(self, conn, table):
+        self.conn = conn
+        self.table = table
+        self.ids = dict(conn.execute(f"SELECT name, {LOOKUP_TABLES[table]} FROM {table}"))
+
+    def __call__(self, name):
+        """ID zum Namen (None bleibt None)."""
+        if name is None:
+            return None
+        if name not in self.ids:
+            self.ids[name] = self.conn.execute(f"INSERT INTO {self.table} (name) VALUES (?)", (name,)).lastrowid
+        return self.ids[name]
+
+
+def lookup_maps(conn):
+    """(Vereine, Positionen) als LookupMap für einen Import."""
+    return LookupMap(conn, "clubs"), LookupMap(conn, "positions")
+
@@ -1,5 +1,6 @@
 import sqlite3
-import pandas as pd
+
+from schema import apply_migrations
 
 # --- KONFIGURATION ---
 OLD_DB_PATH = 'kicker-data.sqlite'
@@ -12,6 +13,17 @@ def create_new_schema(conn):
     cursor = conn.cursor()
     print("Erstelle neues Datenbankschema...")
 
+    cursor.execute('DROP TABLE IF EXISTS season_archives')
+    cursor.execute('DROP TABLE IF EXISTS player_seasonal_details_history')
+    cursor.execute('DROP TABLE IF EXISTS player_search')
+    cursor.execute('DROP TABLE IF EXISTS clubs')
+    cursor.execute('DROP TABLE IF EXISTS positions')
+    cursor.execute('DROP TABLE IF EXISTS ingest_jobs')
+    cursor.execute('DROP TABLE IF EXISTS ingest_log')
+    cursor.execute('DROP TABLE IF EXISTS player_value_history')
+    cursor.execute('DROP TABLE IF EXISTS player_season_totals')
+    cursor.execute('DROP TABLE IF EXISTS best_team_players')
+    cursor.execute('DROP TABLE IF EXISTS best_teams')
     cursor.execute('DROP TABLE IF EXISTS player_stats')
     cursor.execute('DROP TABLE IF EXISTS game_days')
     cursor.execute('DROP TABLE IF EXISTS player_seasonal_details')
@@ -63,12 +75,17 @@ def create_new_schema(conn):
             FOREIGN KEY (game_day_id) REFERENCES game_days (game_day_id)
         )
     ''')
+    # Basis-Schema (Version 0); alles Weitere erledigen die Migrationen aus schema.py
+    cursor.execute('PRAGMA user_version = 0')
     conn.commit()
     print("Neues Schema erfolgreich erstellt.")
 
 # --- 2. DATEN MIGRATION ---
 def migrate_data():
     """Liest Daten aus der alten 3-Tabellen-DB und schreibt sie in die neue 5-Tabellen-DB."""
+    # pandas erst hier laden: create_new_schema() wird auch von den Import-Skripten genutzt
+    import pandas as pd
+
     try:
         conn_old = sqlite3.connect(OLD_DB_PATH)
         conn_new = sqlite3.connect(NEW_DB_PATH)
@@ -131,6 +148,7 @@ def migrate_data():
                 """, (seasonal_details_id, new_game_day_id, row['spieltagspunkte'], row['gesamtpunkte']))
 
     conn_new.commit()
+    apply_migrations(conn_new)
     conn_old.close()
     conn_new.close()
     print("\nDatenmigration erfolgreich abgeschlossen!")
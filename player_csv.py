@@ -0,0 +1,77 @@
+import csv
+import io
+from collections import namedtuple
+
+# ==============================================================================
+# Schlanker CSV-Leser für die Spieler-CSVs des Kicker-Feeds
+# ==============================================================================
+# Ersetzt pd.read_csv in den per Cron gestarteten Skripten: Der Import von pandas
+# dauert auf dem NAS länger als die eigentliche Arbeit mit ~600 Zeilen. Die Werte
+# werden wie bisher umgewandelt (nicht lesbare Zahlen -> 0, leere Texte -> None),
+# Spieler mit Platzhalter-Marktwert werden übersprungen und bei doppelten IDs
+# gewinnt die letzte Zeile.
+
+# Platzhalter-Marktwert für Spieler, die nicht mehr im Spiel sind
+PLACEHOLDER_MARKET_VALUE = 999000000
+
+# Spalte in der CSV -> Feld
+COLUMNS = {
+    "ID": "player_id",
+    "Vorname": "first_name",
+    "Nachname": "last_name",
+    "Angezeigter Name (kurz)": "short_name",
+    "Angezeigter Name": "display_name",
+    "Verein": "club",
+    "Position": "position",
+    "Marktwert": "market_value",
+    "Punkte": "points",
+    "Notendurchschnitt": "grade",
+}
+
+PlayerRow = namedtuple("PlayerRow", COLUMNS.values())
+
+
+def to_int(value):
+    try:
+        return int(value)
+    except ValueError:
+        try:
+            return int(float(value))
+        except ValueError:
+            return 0
+
+
+def to_float(value):
+    try:
+        return float(value)
+    except ValueError:
+        return 0.0
+
+
+def iter_players(lines):
+    """Liest die Zeilen einer Spieler-CSV (Semikolon-getrennt) und liefert je Spieler eine PlayerRow."""
+    reader = csv.reader(lines, delimiter=";")
+    header = [column.strip() for column in next(reader)]
+    positions = [header.index(column) if column in header else None for column in COLUMNS]
+    for fields in reader:
+        if not fields:
+            continue
+        values = [fields[i] if i is not None and i < len(fields) else "" for i in positions]
+        market_value = to_int(values[7])
+        if market_value == PLACEHOLDER_MARKET_VALUE:
+            continue
+        yield PlayerRow(values[0], *(value or None for value in values[1:7]),
+                        market_value, to_float(values[8]), to_float(values[9]))
+
+
+def read_players(source):
+    """
+    Alle gültigen Spieler einer CSV-Datei (Pfad) oder eines Dateiinhalts (bytes) als Liste,
+    ohne doppelte IDs (die letzte Zeile gewinnt).
+    """
+    if isinstance(source, bytes):
+        players = {row.player_id: row for row in iter_players(io.StringIO(source.decode("utf-8"), newline=""))}
+    else:
+        with open(source, newline="", encoding="utf-8") as f:
+            players = {row.player_id: row for row in iter_players(f)}
+    return list(players.values())
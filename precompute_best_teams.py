@@ -0,0 +1,133 @@
+import sqlite3
+import os
+import time
+import argparse
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+from best_team import FORMATIONS, KADER_SIZE, BUDGET_LIMIT, load_player_pool, solve_best_team
+from db_utils import get_db_connection, write_transaction
+from schema import apply_migrations
+from season_archive import archived_season_ids
+import queries
+
+# ==============================================================================
+# --- KONFIGURATION ---
+# ==============================================================================
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DB_PATH = os.path.join(SCRIPT_DIR, "kicker_main.db")
+
+# Spieltagsnummer, unter der das Team der gesamten Saison abgelegt wird
+SEASON_GAME_DAY = 0
+# ==============================================================================
+
+
+def solve_all_formations(task):
+    """Worker: löst alle Formationen für einen Spieler-Pool (Saison oder Spieltag)."""
+    season_id, game_day_number, pool = task
+    results = []
+    for name, counts in FORMATIONS.items():
+        try:
+            result = solve_best_team(pool['player_ids'], pool['positions'], pool['market_values'], pool['points'],
+                                     counts, KADER_SIZE, BUDGET_LIMIT)
+        except ValueError:
+            continue
+        lookup = dict(zip(pool['player_ids'], zip(pool['points'], pool['market_values'])))
+        players = [(pid, 1, float(lookup[pid][0]), int(lookup[pid][1])) for pid in result['starter_ids']]
+        players += [(pid, 0, 0.0, int(lookup[pid][1])) for pid in result['bench_ids']]
+        results.append((name, result['total_points'], result['total_cost'], players))
+    return season_id, game_day_number, results
+
+
+def get_game_day_numbers(conn, season_id):
+    """Alle bereits verarbeiteten Spieltage einer Saison."""
+    return [r[0] for r in conn.execute(queries.GAMEDAYS_QUERY, (season_id,))]
+
+
+def collect_tasks(conn, season_ids, game_day_numbers=None):
+    """
+    Spieler-Pools für das Saison-Team und die Spieltage jeder Saison. Ohne
+    game_day_numbers ({season_id: [Spieltage]}) werden alle Spieltage berechnet.
+    """
+    tasks = []
+    for season_id in season_ids:
+        tasks.append((season_id, SEASON_GAME_DAY, load_player_pool(conn, season_id)))
+        numbers = get_game_day_numbers(conn, season_id) if game_day_numbers is None else game_day_numbers[season_id]
+        for gd in numbers:
+            tasks.append((season_id, gd, load_player_pool(conn, season_id, gd)))
+    return tasks
+
+
+def solve_tasks(tasks, workers=None):
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(solve_all_formations, tasks))
+
+
+def store_results(conn, solved):
+    """Ersetzt die gespeicherten Teams; läuft in der Transaktion des Aufrufers."""
+    computed_at = datetime.now().isoformat(timespec='seconds')
+    for season_id, game_day_number, results in solved:
+        conn.execute("DELETE FROM best_teams WHERE season_id = ? AND game_day_number = ?", (season_id, game_day_number))
+        conn.execute("DELETE FROM best_team_players WHERE season_id = ? AND game_day_number = ?", (season_id, game_day_number))
+        for name, total_points, total_cost, players in results:
+            conn.execute("""
+                INSERT INTO best_teams (season_id, game_day_number, formation, total_points, total_cost, computed_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (season_id, game_day_number, name, total_points, total_cost, computed_at))
+            conn.executemany("""
+                INSERT INTO best_team_players (season_id, game_day_number, formation, player_id, is_starter, points, market_value)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, [(season_id, game_day_number, name, *player) for player in players])
+
+
+def run(db_path=DB_PATH, season_ids=None, workers=None):
+    """
+    Berechnet das beste Team für jede Formation, jeden Spieltag und die gesamte
+    Saison und speichert die Ergebnisse in best_teams / best_team_players.
+    """
+    conn = get_db_connection(db_path)
+    try:
+        apply_migrations(conn)
+        if season_ids is None:
+            season_ids = [r[0] for r in conn.execute("SELECT season_id FROM seasons")]
+        # Archivierte Saisons sind abgeschlossen, ihre Ergebnisse liegen in der Archivdatei
+        archived = archived_season_ids(conn)
+        if archived & set(season_ids):
+            print(f"INFO: {len(archived & set(season_ids))} archivierte Saison(s) übersprungen.")
+            season_ids = [s for s in season_ids if s not in archived]
+
+        tasks = collect_tasks(conn, season_ids)
+        start = time.perf_counter()
+        solved = solve_tasks(tasks, workers)
+        duration = time.perf_counter() - start
+
+        with write_transaction(conn):
+            store_results(conn, solved)
+
+        print(f"INFO: {len(tasks)} Spieler-Pools x {len(FORMATIONS)} Formationen in {duration:.2f} s berechnet.")
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Berechnet 'Bestes Team' für alle Formationen und Spieltage vor.")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--saison", help="Nur diese Saison berechnen (z.B. 2025/2026).")
+    parser.add_argument("--workers", type=int, default=None, help="Anzahl der Prozesse (Standard: Anzahl CPUs).")
+    args = parser.parse_args()
+
+    season_ids = None
+    if args.saison:
+        conn = sqlite3.connect(args.db)
+        res = conn.execute("SELECT season_id FROM seasons WHERE season_name = ?", (args.saison,)).fetchone()
+        conn.close()
+        if not res:
+            print(f"Fehler: Saison '{args.saison}' nicht gefunden.")
+            return
+        season_ids = [res[0]]
+
+    run(args.db, season_ids, args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,14 @@
 import sqlite3
-import pandas as pd
 import os
 import glob
 import shutil
 
+import precompute_best_teams
+from player_csv import read_players
+from db_utils import get_db_connection, write_transaction, checkpoint, backup_database, publish_snapshot
+from schema import apply_migrations
+from season_totals import LAST_TOTAL_POINTS_QUERY, update_season_totals
+
 # ==============================================================================
 # --- KONFIGURATION ---
 # ==============================================================================
@@ -20,15 +25,6 @@ PROCESS_DIR = os.path.join(SCRIPT_DIR, "process_gameday")
 DONE_DIR = os.path.join(PROCESS_DIR, "done")
 # ==============================================================================
 
-def get_db_connection(path):
-    try:
-        conn = sqlite3.connect(path, timeout=10)
-        conn.row_factory = sqlite3.Row
-        return conn
-    except sqlite3.Error as e:
-        print(f"Fehler beim Verbinden mit der Datenbank unter {path}: {e}")
-        return None
-
 def find_latest_csv(directory):
     search_pattern = os.path.join(directory, 'data_*.csv')
     files = glob.glob(search_pattern)
@@ -38,19 +34,40 @@ def get_last_total_points(conn, season_id):
     """Holt die letzten bekannten Gesamtpunkte für jeden Spieler in der aktuellen Saison."""
     if not season_id:
         return {}
-    query = """
-        WITH LastStats AS (
-            SELECT psd.player_id, ps.gesamtpunkte,
-                   ROW_NUMBER() OVER(PARTITION BY psd.player_id ORDER BY gd.game_day_number DESC) as rn
-            FROM player_stats ps
-            JOIN player_seasonal_details psd ON ps.player_seasonal_details_id = psd.id
-            JOIN game_days gd ON ps.game_day_id = gd.game_day_id
-            WHERE psd.season_id = ?
-        )
-        SELECT player_id, gesamtpunkte FROM LastStats WHERE rn = 1;
+    return {player_id: total for player_id, total in conn.execute(LAST_TOTAL_POINTS_QUERY, (season_id,))}
+
+def compute_gameday_points(players, last_points_map):
+    """
+    Berechnet die Spieltagspunkte als Differenz zum letzten Gesamtpunktestand.
+    Gibt die Zeilen (ID, Spieltagspunkte, Note, Gesamtpunkte) und die Anzahl der
+    Spieler mit Punkteveränderung zurück.
     """
-    df = pd.read_sql_query(query, conn, params=(season_id,))
-    return pd.Series(df.gesamtpunkte.values, index=df.player_id).to_dict()
+    rows = [(p.player_id, p.points - float(last_points_map.get(p.player_id) or 0.0), p.grade, p.points)
+            for p in players]
+    changed_count = sum(1 for row in rows if row[1] != 0)
+    return rows, changed_count
+
+def insert_gameday_stats(conn, season_id, game_day_id, rows):
+    """Schreibt alle Spieltagspunkte über eine Staging-Tabelle mit einem einzigen INSERT ... SELECT."""
+    conn.execute("DROP TABLE IF EXISTS temp.gameday_staging")
+    conn.execute("""
+        CREATE TEMP TABLE gameday_staging (
+            player_id TEXT PRIMARY KEY,
+            points REAL,
+            grade REAL,
+            gesamtpunkte REAL
+        )
+    """)
+    conn.executemany("INSERT INTO gameday_staging VALUES (?, ?, ?, ?)", rows)
+    cursor = conn.execute("""
+        INSERT INTO player_stats (player_seasonal_details_id, game_day_id, points, grade, gesamtpunkte)
+        SELECT psd.id, ?, s.points, s.grade, s.gesamtpunkte
+        FROM gameday_staging s
+        JOIN player_seasonal_details psd ON psd.player_id = s.player_id AND psd.season_id = ?
+    """, (game_day_id, season_id))
+    inserted = cursor.rowcount
+    conn.execute("DROP TABLE temp.gameday_staging")
+    return inserted
 
 def main():
     if PROCESS_GAME_DAY_NUMBER is None:
@@ -69,91 +86,77 @@ def main():
     
     print(f"INFO: Verarbeite Datei: {os.path.basename(csv_path)}")
 
-    DB_TEMP_PATH = DB_PATH + ".tmp"
     if not os.path.exists(DB_PATH):
         print(f"Fehler: Original-Datenbank '{DB_PATH}' nicht gefunden.")
         return
     
-    conn_read = get_db_connection(DB_PATH)
-    if not conn_read: return
+    conn = get_db_connection(DB_PATH)
+    if not conn: return
 
     try:
-        cursor_read = conn_read.cursor()
-        cursor_read.execute("SELECT season_id FROM seasons WHERE season_name = ?", (CURRENT_SEASON_NAME,))
-        res = cursor_read.fetchone()
+        apply_migrations(conn)
+
+        cursor = conn.cursor()
+        cursor.execute("SELECT season_id FROM seasons WHERE season_name = ?", (CURRENT_SEASON_NAME,))
+        res = cursor.fetchone()
         if not res:
             raise ValueError(f"Saison '{CURRENT_SEASON_NAME}' nicht gefunden. Bitte zuerst das Stammdaten-Skript ausführen.")
         season_id = res['season_id']
 
-        last_points_map = get_last_total_points(conn_read, season_id)
-        conn_read.close()
+        last_points_map = get_last_total_points(conn, season_id)
 
-        df_csv_raw = pd.read_csv(csv_path, sep=';')
-        df_csv = df_csv_raw[df_csv_raw['Marktwert'] != 999000000].copy()
-        df_csv['Punkte'] = pd.to_numeric(df_csv['Punkte'], errors='coerce').fillna(0).astype(float)
-        df_csv['Notendurchschnitt'] = pd.to_numeric(df_csv['Notendurchschnitt'], errors='coerce').fillna(0.0).astype(float)
-
-
-        any_points_changed = False
-        for _, row in df_csv.iterrows():
-            last_total = last_points_map.get(row['ID'], 0.0)
-            if row['Punkte'] != last_total:
-                any_points_changed = True
-                break
-        
-        if not any_points_changed:
+        players = read_players(csv_path)
+        gameday_rows, changed_count = compute_gameday_points(players, last_points_map)
+        if changed_count == 0:
             print("INFO: Keine Punkteveränderungen in der CSV-Datei festgestellt. Es wird kein neuer Spieltag angelegt.")
+            conn.close()
             return
-        
-        shutil.copy2(DB_PATH, DB_TEMP_PATH)
-        conn_write = get_db_connection(DB_TEMP_PATH)
-        if not conn_write: return
+        print(f"INFO: {changed_count} Spieler mit Punkteveränderung gefunden.")
 
-        with conn_write:
-            cursor_write = conn_write.cursor()
-            
+        backup_path = backup_database(DB_PATH)
+        if backup_path:
+            print(f"INFO: Sicherung erstellt: {os.path.basename(backup_path)}")
+        
+        # Alle Schreibvorgänge in einer einzigen Transaktion direkt auf der Live-Datenbank
+        with write_transaction(conn):
             # KORREKTUR: 'id' wurde zu 'game_day_id' geändert
-            cursor_write.execute("SELECT game_day_id FROM game_days WHERE season_id = ? AND game_day_number = ?", (season_id, PROCESS_GAME_DAY_NUMBER))
-            if cursor_write.fetchone():
+            cursor.execute("SELECT game_day_id FROM game_days WHERE season_id = ? AND game_day_number = ?", (season_id, PROCESS_GAME_DAY_NUMBER))
+            if cursor.fetchone():
                 raise sqlite3.IntegrityError(f"Spieltag {PROCESS_GAME_DAY_NUMBER} wurde bereits verarbeitet.")
 
-            cursor_write.execute("INSERT INTO game_days (season_id, game_day_number) VALUES (?, ?)", (season_id, PROCESS_GAME_DAY_NUMBER))
+            cursor.execute("INSERT INTO game_days (season_id, game_day_number) VALUES (?, ?)", (season_id, PROCESS_GAME_DAY_NUMBER))
             # HINWEIS: game_day_id ist jetzt die Spieltagsnummer selbst, nicht mehr lastrowid
             game_day_id = PROCESS_GAME_DAY_NUMBER
             
-            points_processed_count = 0
-            for _, row in df_csv.iterrows():
-                cursor_write.execute("SELECT id FROM player_seasonal_details WHERE player_id = ? AND season_id = ?", (row['ID'], season_id))
-                res_details = cursor_write.fetchone()
-                if not res_details: continue
-                
-                seasonal_details_id = res_details['id']
-                last_total = last_points_map.get(row['ID'], 0.0)
-                spieltagspunkte = row['Punkte'] - last_total
-                
-                cursor_write.execute("""
-                    INSERT INTO player_stats (player_seasonal_details_id, game_day_id, points, grade, gesamtpunkte)
-                    VALUES (?, ?, ?, ?, ?)
-                """, (seasonal_details_id, game_day_id, spieltagspunkte, row['Notendurchschnitt'], row['Punkte']))
-                points_processed_count += 1
+            points_processed_count = insert_gameday_stats(conn, season_id, game_day_id, gameday_rows)
+            update_season_totals(conn, season_id, game_day_id)
 
             print(f"\nSpieltag {PROCESS_GAME_DAY_NUMBER} erfolgreich verarbeitet.")
             print(f"Es wurden Punkteeinträge für {points_processed_count} Spieler gespeichert.")
 
-        conn_write.close()
-        os.replace(DB_TEMP_PATH, DB_PATH)
+        checkpoint(conn)
+        conn.close()
         print("Datenbank erfolgreich aktualisiert.")
 
         shutil.move(csv_path, os.path.join(DONE_DIR, os.path.basename(csv_path)))
         print(f"Datei '{os.path.basename(csv_path)}' wurde in den 'done' Ordner verschoben.")
 
+        # "Bestes Team" für alle Formationen und Spieltage der Saison vorberechnen
+        try:
+            precompute_best_teams.run(DB_PATH, [season_id])
+            print("INFO: Beste Teams wurden neu berechnet.")
+        except Exception as e:
+            print(f"WARNUNG: Vorberechnung der besten Teams fehlgeschlagen: {e}")
+
+        snapshot_path = publish_snapshot(DB_PATH)
+        if snapshot_path:
+            print(f"INFO: Snapshot für die App veröffentlicht: {os.path.basename(snapshot_path)}")
+
     except (sqlite3.Error, FileNotFoundError, ValueError, Exception) as e:
         print(f"\n--- FEHLER! ---")
         print(f"Ein Fehler ist aufgetreten: {e}")
-        print("Das Update wurde abgebrochen. Die Original-Datenbank wurde nicht verändert.")
-        if 'conn_read' in locals() and conn_read: conn_read.close()
-        if 'conn_write' in locals() and conn_write: conn_write.close()
-        if os.path.exists(DB_TEMP_PATH): os.remove(DB_TEMP_PATH)
+        print("Das Update wurde abgebrochen. Die Transaktion wurde zurückgerollt, die Datenbank ist unverändert.")
+        conn.close()
 
 if __name__ == "__main__":
     main()
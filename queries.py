@@ -0,0 +1,167 @@
+# ==============================================================================
+# SQL-Abfragen der Streamlit-App
+# ==============================================================================
+# Alle Abfragen sind parametrisiert (keine f-Strings mit Werten), damit SQLite die
+# Statements cachen kann. test_query_plans.py prüft mit EXPLAIN QUERY PLAN, dass
+# sie die Indizes aus schema.py verwenden. Saison-Analyse und Bestes Team lesen eine
+# Saison einmal je Datenstand über season_cache.py.
+
+import re
+
+SEASONS_QUERY = "SELECT season_name, season_id FROM seasons ORDER BY season_name DESC"
+
+
+def fts_search_expression(text):
+    """Suchausdruck für player_search: jedes eingegebene Wort als Präfix, alle Wörter müssen vorkommen."""
+    return " ".join(f'"{word}"*' for word in re.findall(r"\w+", text))
+
+
+def player_search_query(fts, by_text, by_club, by_position):
+    """
+    Spielersuche der Spieler-Analyse: Spieler-ID, Name sowie Verein und Position der
+    letzten Saison. Der Text wird mit fts=True im Volltextindex player_search über alle
+    Namen gesucht (sortiert nach Relevanz), in nicht migrierten Datenbanken per LIKE.
+    Verein und Position beziehen sich auf irgendeine Saison des Spielers; ihre Namen werden
+    einmal in IDs übersetzt, gefiltert wird über die Ganzzahl-Schlüssel.
+    Parameter: [Suchausdruck], [club], [position], limit
+    """
+    conditions = []
+    if by_text and fts:
+        source = "player_search JOIN players p ON p.player_id = player_search.player_id"
+        conditions.append("player_search MATCH ?")
+        order = "rank"
+    else:
+        source = "players p"
+        if by_text:
+            conditions.append("p.first_name || ' ' || p.last_name LIKE ?")
+        order = "player_name"
+    season_conditions = [condition for condition, selected in (
+        ("f.club_id = (SELECT club_id FROM clubs WHERE name = ?)", by_club),
+        ("f.position_id = (SELECT position_id FROM positions WHERE name = ?)", by_position),
+    ) if selected]
+    if season_conditions:
+        conditions.append(f"""EXISTS (SELECT 1 FROM player_seasonal_details f
+                                      WHERE f.player_id = p.player_id AND {' AND '.join(season_conditions)})""")
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return f"""
+    SELECT
+        p.player_id,
+        p.first_name || ' ' || p.last_name AS player_name,
+        c.name AS club,
+        pos.name AS position
+    FROM
+        {source}
+    JOIN
+        player_seasonal_details latest ON latest.player_id = p.player_id
+        AND latest.season_id = (SELECT MAX(season_id) FROM player_seasonal_details WHERE player_id = p.player_id)
+    LEFT JOIN
+        clubs c ON c.club_id = latest.club_id
+    LEFT JOIN
+        positions pos ON pos.position_id = latest.position_id
+    {where}
+    ORDER BY
+        {order}
+    LIMIT ?
+    """
+
+
+CLUBS_QUERY = "SELECT name AS club FROM clubs ORDER BY name"
+
+# Parameter: player_id
+# Die Zeilen des Spielers werden zuerst gesammelt (MATERIALIZED) und erst danach
+# gruppiert: Sind archivierte Saisons angehängt (season_archive.attach_archives), sind
+# player_seasonal_details und player_stats UNION-ALL-Views, und eine Gruppierung direkt
+# über dem Join würde player_stats aller Saisons vollständig lesen.
+PLAYER_SEASONAL_OVERVIEW_QUERY = """
+    WITH player_points AS MATERIALIZED (
+        SELECT
+            s.season_name,
+            c.name AS club,
+            pos.name AS position,
+            psd.market_value AS market_value_eur,
+            ps.gesamtpunkte
+        FROM
+            player_seasonal_details psd
+        JOIN
+            player_stats ps ON psd.id = ps.player_seasonal_details_id
+        JOIN
+            seasons s ON psd.season_id = s.season_id
+        LEFT JOIN
+            clubs c ON c.club_id = psd.club_id
+        LEFT JOIN
+            positions pos ON pos.position_id = psd.position_id
+        WHERE
+            psd.player_id = ?
+    )
+    SELECT season_name, club, position, market_value_eur, MAX(gesamtpunkte) AS points
+    FROM player_points
+    GROUP BY season_name, club, position, market_value_eur
+    ORDER BY season_name
+"""
+
+# Parameter: player_id
+PLAYER_VALUE_HISTORY_QUERY = """
+    SELECT
+        h.valid_from,
+        s.season_name,
+        c.name AS club,
+        pos.name AS position,
+        h.market_value AS market_value_eur
+    FROM
+        player_value_history h
+    LEFT JOIN
+        seasons s ON h.season_id = s.season_id
+    LEFT JOIN
+        clubs c ON c.club_id = h.club_id
+    LEFT JOIN
+        positions pos ON pos.position_id = h.position_id
+    WHERE
+        h.player_id = ?
+    ORDER BY
+        h.valid_from
+"""
+
+# Parameter: season_id
+GAMEDAYS_QUERY = """
+    SELECT game_day_number AS game_day_id FROM game_days
+    WHERE season_id = ?
+    ORDER BY game_day_number
+"""
+
+# Parameter: Tabellenname
+TABLE_EXISTS_QUERY = "SELECT name FROM sqlite_master WHERE type = 'table' AND name = ?"
+
+# Parameter: season_id, game_day_number, formation
+BEST_TEAM_SUMMARY_QUERY = """
+    SELECT total_points, total_cost FROM best_teams
+    WHERE season_id = ? AND game_day_number = ? AND formation = ?
+"""
+
+# Verein und Position wie zum Spieltag gültig (für die ganze Saison der aktuelle Stand)
+# Parameter: season_id, game_day_number, formation
+BEST_TEAM_PLAYERS_QUERY = """
+    SELECT
+        btp.player_id,
+        p.first_name || ' ' || p.last_name AS player_name,
+        c.name AS club,
+        pos.name AS position,
+        btp.market_value AS market_value_eur,
+        btp.points,
+        btp.is_starter
+    FROM
+        best_team_players btp
+    JOIN
+        players p ON btp.player_id = p.player_id
+    JOIN
+        player_seasonal_details psd ON psd.player_id = btp.player_id AND psd.season_id = btp.season_id
+    LEFT JOIN
+        player_seasonal_details_history h ON h.season_id = btp.season_id AND h.player_id = btp.player_id
+            AND h.valid_from_gameday <= btp.game_day_number
+            AND (h.valid_to_gameday IS NULL OR h.valid_to_gameday >= btp.game_day_number)
+    LEFT JOIN
+        clubs c ON c.club_id = COALESCE(h.club_id, psd.club_id)
+    LEFT JOIN
+        positions pos ON pos.position_id = COALESCE(h.position_id, psd.position_id)
+    WHERE
+        btp.season_id = ? AND btp.game_day_number = ? AND btp.formation = ?
+"""
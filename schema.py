@@ -0,0 +1,398 @@
+from db_utils import write_transaction
+from lookups import LOOKUP_TABLES
+from season_totals import rebuild_season_totals
+from value_history import format_timestamp, season_start
+
+# ==============================================================================
+# Versionierte Schema-Migrationen
+# ==============================================================================
+# Die aktuelle Schema-Version steht in PRAGMA user_version. Jedes Import-Skript
+# ruft beim Start apply_migrations() auf; noch nicht angewendete Schritte laufen
+# jeweils in einer eigenen Transaktion. Neue Schritte werden nur hinten angehängt,
+# bestehende Schritte werden nie verändert.
+
+
+def _add_missing_columns(conn):
+    """Spalten, die früher von ensure_schema_updates() nachgerüstet wurden."""
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(player_seasonal_details)")]
+    if 'is_active' not in columns:
+        conn.execute("ALTER TABLE player_seasonal_details ADD COLUMN is_active INTEGER DEFAULT 1")
+
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(player_stats)")]
+    if 'gesamtpunkte' not in columns:
+        conn.execute("ALTER TABLE player_stats ADD COLUMN gesamtpunkte REAL DEFAULT 0")
+
+
+def _create_best_team_tables(conn):
+    """Tabellen für die von precompute_best_teams.py vorberechneten Teams."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS best_teams (
+            season_id INTEGER,
+            game_day_number INTEGER,
+            formation TEXT,
+            total_points REAL,
+            total_cost INTEGER,
+            computed_at TEXT,
+            PRIMARY KEY (season_id, game_day_number, formation)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS best_team_players (
+            season_id INTEGER,
+            game_day_number INTEGER,
+            formation TEXT,
+            player_id TEXT,
+            is_starter INTEGER,
+            points REAL,
+            market_value INTEGER,
+            PRIMARY KEY (season_id, game_day_number, formation, player_id)
+        )
+    """)
+
+
+def _add_indexes_and_cluster_player_stats(conn):
+    """
+    Baut player_stats als WITHOUT ROWID-Tabelle mit dem Primärschlüssel
+    (player_seasonal_details_id, game_day_id) neu auf, damit alle Statistiken eines
+    Spielers physisch zusammen liegen, und legt die fehlenden Indizes an.
+    """
+    conn.execute("""
+        CREATE TABLE player_stats_new (
+            player_seasonal_details_id INTEGER NOT NULL,
+            game_day_id INTEGER NOT NULL,
+            points INTEGER,
+            grade REAL,
+            gesamtpunkte REAL DEFAULT 0,
+            PRIMARY KEY (player_seasonal_details_id, game_day_id),
+            FOREIGN KEY (player_seasonal_details_id) REFERENCES player_seasonal_details (id),
+            FOREIGN KEY (game_day_id) REFERENCES game_days (game_day_id)
+        ) WITHOUT ROWID
+    """)
+    # Bei doppelten Einträgen gewinnt der zuletzt eingefügte
+    conn.execute("""
+        INSERT OR REPLACE INTO player_stats_new (player_seasonal_details_id, game_day_id, points, grade, gesamtpunkte)
+        SELECT player_seasonal_details_id, game_day_id, points, grade, gesamtpunkte
+        FROM player_stats
+        WHERE player_seasonal_details_id IS NOT NULL AND game_day_id IS NOT NULL
+        ORDER BY rowid
+    """)
+    conn.execute("DROP TABLE player_stats")
+    conn.execute("ALTER TABLE player_stats_new RENAME TO player_stats")
+
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_psd_season
+        ON player_seasonal_details (season_id, player_id, club, position, market_value)
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_game_days_season ON game_days (season_id, game_day_number)")
+
+
+def _create_season_totals(conn):
+    """Materialisierte Saison-Summen (siehe season_totals.py), befüllt aus player_stats."""
+    conn.execute("""
+        CREATE TABLE player_season_totals (
+            season_id INTEGER NOT NULL,
+            player_id TEXT NOT NULL,
+            player_seasonal_details_id INTEGER NOT NULL,
+            gesamtpunkte REAL,
+            last_game_day_number INTEGER,
+            points_per_million REAL,
+            PRIMARY KEY (season_id, player_id)
+        ) WITHOUT ROWID
+    """)
+    for (season_id,) in conn.execute("SELECT season_id FROM seasons").fetchall():
+        rebuild_season_totals(conn, season_id)
+
+
+def _create_value_history(conn):
+    """
+    Änderungshistorie von Marktwert, Verein und Position (siehe value_history.py).
+    Der heutige Stand jeder Saison wird als erster Eintrag ab Saisonbeginn übernommen.
+    """
+    conn.execute("""
+        CREATE TABLE player_value_history (
+            player_id TEXT NOT NULL,
+            valid_from TEXT NOT NULL,
+            season_id INTEGER,
+            club TEXT,
+            position TEXT,
+            market_value INTEGER,
+            PRIMARY KEY (player_id, valid_from)
+        ) WITHOUT ROWID
+    """)
+    for season_id, season_name in conn.execute("SELECT season_id, season_name FROM seasons").fetchall():
+        conn.execute("""
+            INSERT INTO player_value_history (player_id, valid_from, season_id, club, position, market_value)
+            SELECT player_id, ?, season_id, club, position, market_value
+            FROM player_seasonal_details WHERE season_id = ?
+        """, (format_timestamp(season_start(season_name)), season_id))
+
+
+def _create_ingest_log(conn):
+    """Protokoll der von kickerdb.py ingest verarbeiteten Snapshots (einer pro Zeile)."""
+    conn.execute("""
+        CREATE TABLE ingest_log (
+            taken_at TEXT PRIMARY KEY,
+            content_hash TEXT NOT NULL,
+            season_id INTEGER,
+            game_day_number INTEGER,
+            ingested_at TEXT
+        ) WITHOUT ROWID
+    """)
+
+
+def _create_ingest_jobs(conn):
+    """Warteschlange des Ordner-Watchers (watch_folder.py), eine Zeile pro Datei."""
+    conn.execute("""
+        CREATE TABLE ingest_jobs (
+            path TEXT PRIMARY KEY,
+            taken_at TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            enqueued_at TEXT,
+            finished_at TEXT,
+            error TEXT
+        )
+    """)
+    conn.execute("CREATE INDEX idx_ingest_jobs_status ON ingest_jobs (status, taken_at)")
+
+
+def _create_player_search(conn):
+    """
+    Angezeigte Namen aus der CSV und die Volltextsuche über alle Namen (FTS5) für die
+    Spielersuche der App. Trigger halten den Suchindex bei jeder Änderung an players aktuell.
+    """
+    conn.execute("ALTER TABLE players ADD COLUMN short_name TEXT")
+    conn.execute("ALTER TABLE players ADD COLUMN display_name TEXT")
+    conn.execute("""
+        CREATE VIRTUAL TABLE player_search USING fts5(
+            player_id UNINDEXED, first_name, last_name, short_name, display_name,
+            tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+        )
+    """)
+    conn.execute("""
+        INSERT INTO player_search (player_id, first_name, last_name, short_name, display_name)
+        SELECT player_id, first_name, last_name, short_name, display_name FROM players
+    """)
+    conn.execute("""
+        CREATE TRIGGER players_search_insert AFTER INSERT ON players BEGIN
+            INSERT INTO player_search (player_id, first_name, last_name, short_name, display_name)
+            VALUES (new.player_id, new.first_name, new.last_name, new.short_name, new.display_name);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER players_search_update AFTER UPDATE OF first_name, last_name, short_name, display_name ON players BEGIN
+            DELETE FROM player_search WHERE player_id = old.player_id;
+            INSERT INTO player_search (player_id, first_name, last_name, short_name, display_name)
+            VALUES (new.player_id, new.first_name, new.last_name, new.short_name, new.display_name);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER players_search_delete AFTER DELETE ON players BEGIN
+            DELETE FROM player_search WHERE player_id = old.player_id;
+        END
+    """)
+
+
+
+def _create_lookup_tables(conn):
+    """
+    Nachschlagetabellen clubs und positions (siehe lookups.py): Verein und Position werden in
+    player_seasonal_details und player_value_history durch Ganzzahl-Schlüssel ersetzt.
+    """
+    for table, key in LOOKUP_TABLES.items():
+        conn.execute(f"CREATE TABLE {table} ({key} INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE)")
+    for table, column in (("clubs", "club"), ("positions", "position")):
+        conn.execute(f"""
+            INSERT INTO {table} (name)
+            SELECT {column} FROM player_seasonal_details WHERE {column} IS NOT NULL
+            UNION SELECT {column} FROM player_value_history WHERE {column} IS NOT NULL
+            ORDER BY 1
+        """)
+
+    # Spalten im Index können nicht entfernt werden; der Index wird mit den Schlüsseln neu angelegt
+    conn.execute("DROP INDEX idx_psd_season")
+    for table in ("player_seasonal_details", "player_value_history"):
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN club_id INTEGER REFERENCES clubs (club_id)")
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN position_id INTEGER REFERENCES positions (position_id)")
+        conn.execute(f"""
+            UPDATE {table} SET
+                club_id = (SELECT club_id FROM clubs WHERE name = {table}.club),
+                position_id = (SELECT position_id FROM positions WHERE name = {table}.position)
+        """)
+        conn.execute(f"ALTER TABLE {table} DROP COLUMN club")
+        conn.execute(f"ALTER TABLE {table} DROP COLUMN position")
+    conn.execute("""
+        CREATE INDEX idx_psd_season
+        ON player_seasonal_details (season_id, player_id, club_id, position_id, market_value)
+    """)
+
+
+def _create_details_history(conn):
+    """
+    Gültigkeitsintervalle von Verein, Position und Marktwert je Spieltag (siehe
+    details_history.py). Frühere Stände sind nicht bekannt; der heutige Stand gilt
+    als offenes Intervall ab Spieltag 1.
+    """
+    conn.execute("""
+        CREATE TABLE player_seasonal_details_history (
+            season_id INTEGER NOT NULL REFERENCES seasons (season_id),
+            player_id TEXT NOT NULL REFERENCES players (player_id),
+            valid_from_gameday INTEGER NOT NULL,
+            valid_to_gameday INTEGER,
+            club_id INTEGER REFERENCES clubs (club_id),
+            position_id INTEGER REFERENCES positions (position_id),
+            market_value INTEGER,
+            PRIMARY KEY (season_id, player_id, valid_from_gameday)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        INSERT INTO player_seasonal_details_history
+            (season_id, player_id, valid_from_gameday, valid_to_gameday, club_id, position_id, market_value)
+        SELECT season_id, player_id, 1, NULL, club_id, position_id, market_value
+        FROM player_seasonal_details
+    """)
+
+
+def _create_season_archives(conn):
+    """
+    Verzeichnis der in eigene Dateien verschobenen Saisons (siehe season_archive.py).
+    Trigger verhindern, dass ein Import neue Stammdaten oder Spieltage in eine
+    archivierte Saison schreibt (sie lägen sonst neben der Archivdatei in der Hauptdatenbank).
+    """
+    conn.execute("""
+        CREATE TABLE season_archives (
+            season_id INTEGER PRIMARY KEY REFERENCES seasons (season_id),
+            file_name TEXT NOT NULL UNIQUE,
+            archived_at TEXT,
+            row_count INTEGER
+        )
+    """)
+    for table in ("player_seasonal_details", "game_days"):
+        conn.execute(f"""
+            CREATE TRIGGER {table}_archived_season BEFORE INSERT ON {table}
+            WHEN EXISTS (SELECT 1 FROM season_archives WHERE season_id = new.season_id)
+            BEGIN
+                SELECT RAISE(ABORT, 'Saison ist archiviert (season_archive.py)');
+            END
+        """)
+
+
+def _add_ingest_log_source(conn):
+    """
+    Baut ingest_log mit der Quelle (Download-Ordner) im Primärschlüssel neu auf, damit
+    jeder Ordner seinen eigenen Verarbeitungsstand hat. Bisherige Einträge erhalten die
+    leere Quelle und gelten weiterhin für alle Ordner (siehe kickerdb.LAST_INGESTED_QUERY).
+    """
+    conn.execute("""
+        CREATE TABLE ingest_log_new (
+            source TEXT NOT NULL,
+            taken_at TEXT NOT NULL,
+            content_hash TEXT NOT NULL,
+            season_id INTEGER,
+            game_day_number INTEGER,
+            ingested_at TEXT,
+            PRIMARY KEY (source, taken_at)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        INSERT INTO ingest_log_new (source, taken_at, content_hash, season_id, game_day_number, ingested_at)
+        SELECT '', taken_at, content_hash, season_id, game_day_number, ingested_at FROM ingest_log
+    """)
+    conn.execute("DROP TABLE ingest_log")
+    conn.execute("ALTER TABLE ingest_log_new RENAME TO ingest_log")
+
+# (Version, Beschreibung, Funktion)
+MIGRATIONS = [
+    (1, "Spalten is_active und gesamtpunkte", _add_missing_columns),
+    (2, "Tabellen für vorberechnete beste Teams", _create_best_team_tables),
+    (3, "Indizes und geclusterte player_stats (WITHOUT ROWID)", _add_indexes_and_cluster_player_stats),
+    (4, "Materialisierte Saison-Summen (player_season_totals)", _create_season_totals),
+    (5, "Änderungshistorie von Marktwert, Verein und Position", _create_value_history),
+    (6, "Protokoll der verarbeiteten Snapshots (ingest_log)", _create_ingest_log),
+    (7, "Warteschlange für den Ordner-Watcher (ingest_jobs)", _create_ingest_jobs),
+    (8, "Angezeigte Namen und Volltextsuche über Spieler (player_search)", _create_player_search),
+    (9, "Nachschlagetabellen für Vereine und Positionen (clubs, positions)", _create_lookup_tables),
+    (10, "Gültigkeitsintervalle der Saison-Stammdaten je Spieltag", _create_details_history),
+    (11, "Verzeichnis archivierter Saisons (season_archives)", _create_season_archives),
+    (12, "Quelle im Protokoll der verarbeiteten Snapshots (ingest_log.source)", _add_ingest_log_source),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def apply_migrations(conn):
+    """
+    Wendet alle noch fehlenden Migrationen an und aktualisiert danach die
+    Statistiken des Query-Planers (ANALYZE). Gibt die angewendeten Versionen zurück.
+    """
+    current = get_schema_version(conn)
+    applied = []
+    for version, description, migrate in MIGRATIONS:
+        if version <= current:
+            continue
+        with write_transaction(conn):
+            migrate(conn)
+            conn.execute(f"PRAGMA user_version = {version}")
+        print(f"INFO: Schema-Migration {version} angewendet: {description}")
+        applied.append(version)
+
+    if applied:
+        conn.execute("ANALYZE")
+        conn.commit()
+    return applied
+
+
+# Nicht migrierte Datenbanken bilden das aktuelle Schema über TEMP-Views nach.
+# TEMP-Objekte verdecken gleichnamige Tabellen der Hauptdatenbank, daher gelten
+# dieselben Abfragen für beide Schemata. (Version, ab der die Tabellen existieren, Views)
+_COMPAT_VIEWS = [
+    # Verein und Position noch als Text
+    (9, [
+        """
+        CREATE TEMP VIEW clubs AS
+        SELECT ROW_NUMBER() OVER (ORDER BY club) AS club_id, club AS name
+        FROM (SELECT DISTINCT club FROM main.player_seasonal_details WHERE club IS NOT NULL)
+        """,
+        """
+        CREATE TEMP VIEW positions AS
+        SELECT ROW_NUMBER() OVER (ORDER BY position) AS position_id, position AS name
+        FROM (SELECT DISTINCT position FROM main.player_seasonal_details WHERE position IS NOT NULL)
+        """,
+        """
+        CREATE TEMP VIEW player_seasonal_details AS
+        SELECT d.id, d.player_id, d.season_id, d.market_value, d.is_active, c.club_id, p.position_id
+        FROM main.player_seasonal_details d
+        LEFT JOIN clubs c ON c.name = d.club
+        LEFT JOIN positions p ON p.name = d.position
+        """,
+    ]),
+    # Ohne Intervalle gilt der heutige Stand ab Spieltag 1 (wie _create_details_history)
+    (10, [
+        """
+        CREATE TEMP VIEW player_seasonal_details_history AS
+        SELECT season_id, player_id, 1 AS valid_from_gameday, NULL AS valid_to_gameday,
+               club_id, position_id, market_value
+        FROM player_seasonal_details
+        """,
+    ]),
+]
+
+
+def create_compat_views(conn):
+    """
+    Legt für eine noch nicht migrierte Datenbank die TEMP-Views an, damit eine
+    schreibgeschützte Verbindung (die App) sie mit den aktuellen Abfragen lesen kann.
+    Gibt die Versionen zurück, für die Views angelegt wurden.
+    """
+    current = get_schema_version(conn)
+    created = []
+    for version, views in _COMPAT_VIEWS:
+        if version <= current:
+            continue
+        for sql in views:
+            conn.execute(sql)
+        created.append(version)
+    return created
@@ -0,0 +1,245 @@
+import sqlite3
+import os
+import argparse
+from datetime import datetime
+
+from db_utils import (get_db_connection, write_transaction, checkpoint, backup_database, backup_archive_file,
+                      publish_snapshot, ARCHIVE_DIR, BACKUP_DIR)
+from schema import apply_migrations
+from value_history import format_timestamp
+
+# ==============================================================================
+# Archivierung abgeschlossener Saisons in eigene Datenbankdateien
+# ==============================================================================
+# Eine abgeschlossene Saison (es gibt eine neuere) wird mit allen Zeilen der
+# saisonbezogenen Tabellen in eine eigene Datei archive/season_JJJJ-JJJJ.db
+# verschoben. Die Datei wird danach nie mehr verändert (schreibgeschützt, von der
+# App mit immutable=1 geöffnet); VACUUM, Sicherungen und veröffentlichte Snapshots
+# der Hauptdatenbank betreffen nur noch die laufenden Saisons. Jede Archivdatei wird
+# deshalb beim Archivieren einmal nach backups/archive/ gesichert, bevor die Zeilen
+# aus der Hauptdatenbank gelöscht werden. Eine vorhandene Archivdatei wird nie
+# überschrieben. Spieler, Saisons, Vereine, Positionen und die Marktwert-Historie
+# bleiben in der Hauptdatenbank.
+#
+# Die Tabelle season_archives verzeichnet die Dateien. Leser hängen sie mit
+# attach_archives() an und sehen über TEMP-Views (gleichnamig, sie verdecken die
+# Tabellen der Hauptdatenbank) alle Saisons wie zuvor in einer Datenbank. Die
+# Import-Skripte schreiben nur in die laufende Saison; Trigger verhindern neue
+# Stammdaten und Spieltage für eine archivierte Saison.
+
+# ==============================================================================
+# --- KONFIGURATION ---
+# ==============================================================================
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DB_PATH = os.path.join(SCRIPT_DIR, "kicker_main.db")
+# ==============================================================================
+
+# Saisonbezogene Tabellen und ihre Zeilen einer Saison (Parameter: season_id).
+# player_stats steht vor player_seasonal_details, da es über dessen IDs ausgewählt wird.
+ARCHIVED_TABLES = [
+    ("player_stats", "player_seasonal_details_id IN (SELECT id FROM main.player_seasonal_details WHERE season_id = ?)"),
+    ("player_seasonal_details", "season_id = ?"),
+    ("player_seasonal_details_history", "season_id = ?"),
+    ("game_days", "season_id = ?"),
+    ("player_season_totals", "season_id = ?"),
+    ("best_teams", "season_id = ?"),
+    ("best_team_players", "season_id = ?"),
+]
+
+ARCHIVES_QUERY = "SELECT season_id, file_name FROM season_archives ORDER BY season_id"
+
+# Schema-Name einer angehängten Archivdatei
+ARCHIVE_SCHEMA = "archive_{season_id}"
+
+
+def archive_file_name(season_name):
+    """Dateiname der Archivdatei ('2024/2025' -> 'season_2024-2025.db')."""
+    return f"season_{season_name.replace('/', '-')}.db"
+
+
+def archived_season_ids(conn):
+    """IDs der archivierten Saisons (leer, wenn die Datenbank noch keine Archive kennt)."""
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'season_archives'").fetchone():
+        return set()
+    return {season_id for season_id, _ in conn.execute(ARCHIVES_QUERY)}
+
+
+def _table_columns(conn, schema, table):
+    return [row[1] for row in conn.execute(f"PRAGMA {schema}.table_info({table})")]
+
+
+def _write_archive(conn, season_id, part_path):
+    """
+    Legt die Archivdatei mit denselben Tabellen und Indizes wie die Hauptdatenbank an und
+    kopiert die Zeilen der Saison hinein. Gibt die Zeilenzahl je Tabelle zurück.
+    """
+    schema_sql = [sql for table, _ in ARCHIVED_TABLES for (sql,) in conn.execute(
+        "SELECT sql FROM sqlite_master WHERE tbl_name = ? AND type IN ('table', 'index') AND sql IS NOT NULL "
+        "ORDER BY type DESC", (table,))]
+    target = sqlite3.connect(part_path)
+    try:
+        for sql in schema_sql:
+            target.execute(sql)
+        target.commit()
+    finally:
+        target.close()
+
+    counts = {}
+    conn.execute("ATTACH DATABASE ? AS archive_new", (part_path,))
+    try:
+        with write_transaction(conn):
+            for table, condition in ARCHIVED_TABLES:
+                columns = ", ".join(_table_columns(conn, "main", table))
+                counts[table] = conn.execute(f"""
+                    INSERT INTO archive_new.{table} ({columns})
+                    SELECT {columns} FROM main.{table} WHERE {condition}
+                """, (season_id,)).rowcount
+    finally:
+        conn.execute("DETACH DATABASE archive_new")
+
+    target = sqlite3.connect(part_path)
+    try:
+        target.execute("ANALYZE")
+        target.commit()
+        target.execute("VACUUM")
+    finally:
+        target.close()
+    with open(part_path, "rb") as f:
+        os.fsync(f.fileno())
+    return counts
+
+
+def archive_season(conn, season_name, archive_dir=ARCHIVE_DIR, backup_dir=BACKUP_DIR):
+    """
+    Verschiebt eine abgeschlossene Saison in ihre Archivdatei. Erst wenn die Datei
+    vollständig geschrieben und gesichert ist, werden die Zeilen in einer Transaktion aus
+    der Hauptdatenbank gelöscht und die Datei in season_archives eingetragen. Gibt die
+    Zeilenzahl je Tabelle zurück.
+    """
+    res = conn.execute("SELECT season_id FROM seasons WHERE season_name = ?", (season_name,)).fetchone()
+    if not res:
+        raise ValueError(f"Saison '{season_name}' nicht gefunden.")
+    season_id = res[0]
+    if season_id in archived_season_ids(conn):
+        raise ValueError(f"Saison '{season_name}' ist bereits archiviert.")
+    latest = conn.execute("SELECT MAX(season_name) FROM seasons").fetchone()[0]
+    if season_name >= latest:
+        raise ValueError(f"Saison '{season_name}' ist die laufende Saison und kann nicht archiviert werden.")
+
+    os.makedirs(archive_dir, exist_ok=True)
+    file_name = archive_file_name(season_name)
+    archive_path = os.path.join(archive_dir, file_name)
+    part_path = archive_path + ".part"
+    # Eine unvollständige Datei eines abgebrochenen Laufs wird ersetzt. Eine fertige Datei
+    # ohne Eintrag in season_archives wird nicht gelöscht, sondern umbenannt.
+    if os.path.exists(part_path):
+        os.remove(part_path)
+    if os.path.exists(archive_path):
+        kept_path = f"{archive_path}.{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.alt"
+        os.rename(archive_path, kept_path)
+        print(f"WARNUNG: Vorhandene Archivdatei {file_name} nach {os.path.basename(kept_path)} umbenannt.")
+
+    counts = _write_archive(conn, season_id, part_path)
+    os.chmod(part_path, 0o444)
+    os.replace(part_path, archive_path)
+    backup_archive_file(archive_path, backup_dir)
+
+    with write_transaction(conn):
+        conn.execute("""
+            INSERT INTO season_archives (season_id, file_name, archived_at, row_count)
+            VALUES (?, ?, ?, ?)
+        """, (season_id, file_name, format_timestamp(datetime.now()), sum(counts.values())))
+        for table, condition in ARCHIVED_TABLES:
+            deleted = conn.execute(f"DELETE FROM main.{table} WHERE {condition}", (season_id,)).rowcount
+            if deleted != counts[table]:
+                raise sqlite3.IntegrityError(f"{table}: {deleted} Zeilen gelöscht, aber {counts[table]} archiviert.")
+    return counts
+
+
+def attach_archives(conn, archive_dir=ARCHIVE_DIR):
+    """
+    Hängt alle archivierten Saisons schreibgeschützt an (immutable=1, die Verbindung muss
+    mit uri=True geöffnet sein) und legt für jede saisonbezogene Tabelle eine gleichnamige
+    TEMP-View über Hauptdatenbank und Archive an. Fehlende Dateien werden übersprungen.
+    Gibt die IDs der angehängten Saisons zurück.
+    """
+    if not archived_season_ids(conn):
+        return []
+    limit = conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+    attached = []
+    for season_id, file_name in conn.execute(ARCHIVES_QUERY).fetchall():
+        path = os.path.join(archive_dir, file_name)
+        if not os.path.exists(path):
+            print(f"WARNUNG: Archivdatei {file_name} fehlt, die Saison wird nicht angezeigt.")
+            continue
+        if len(attached) == limit:
+            print(f"WARNUNG: Höchstens {limit} Archivdateien können angehängt werden, {file_name} fehlt.")
+            continue
+        conn.execute(f"ATTACH DATABASE ? AS {ARCHIVE_SCHEMA.format(season_id=season_id)}", (f"file:{path}?immutable=1",))
+        attached.append(season_id)
+    if not attached:
+        return []
+
+    for table, _ in ARCHIVED_TABLES:
+        columns = _table_columns(conn, "main", table)
+        selects = [f"SELECT {', '.join(columns)} FROM main.{table}"]
+        for season_id in attached:
+            schema = ARCHIVE_SCHEMA.format(season_id=season_id)
+            # Spalten, die erst nach der Archivierung hinzukamen, sind im Archiv NULL
+            present = set(_table_columns(conn, schema, table))
+            select_list = ", ".join(c if c in present else f"NULL AS {c}" for c in columns)
+            selects.append(f"SELECT {select_list} FROM {schema}.{table}")
+        conn.execute(f"CREATE TEMP VIEW {table} AS " + " UNION ALL ".join(selects))
+    return attached
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verschiebt eine abgeschlossene Saison in eine eigene, schreibgeschützte Datenbankdatei.")
+    parser.add_argument("saison", nargs="?", help="Zu archivierende Saison (z.B. 2024/2025). Ohne Angabe: Übersicht.")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--verzeichnis", default=ARCHIVE_DIR, help="Ordner der Archivdateien.")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        print(f"Fehler: Datenbank '{args.db}' nicht gefunden.")
+        return
+    conn = get_db_connection(args.db)
+    if not conn: return
+
+    try:
+        apply_migrations(conn)
+        if not args.saison:
+            archived = dict(conn.execute("SELECT season_id, file_name FROM season_archives"))
+            for season_id, season_name in conn.execute("SELECT season_id, season_name FROM seasons ORDER BY season_name"):
+                print(f"{season_name}: {archived.get(season_id, 'in der Hauptdatenbank')}")
+            conn.close()
+            return
+
+        checkpoint(conn)
+        size_before = os.path.getsize(args.db)
+        backup_path = backup_database(args.db)
+        if backup_path:
+            print(f"INFO: Sicherung erstellt: {os.path.basename(backup_path)}")
+
+        counts = archive_season(conn, args.saison, args.verzeichnis)
+        for table, count in counts.items():
+            print(f"INFO: {table}: {count} Zeilen archiviert.")
+        # Freigewordene Seiten zurückgeben, damit die Hauptdatenbank tatsächlich schrumpft
+        checkpoint(conn)
+        conn.execute("VACUUM")
+        conn.close()
+        print(f"Saison {args.saison} archiviert: {os.path.join(args.verzeichnis, archive_file_name(args.saison))}")
+        print(f"Hauptdatenbank: {size_before / 1e6:.1f} MB -> {os.path.getsize(args.db) / 1e6:.1f} MB")
+
+        snapshot_path = publish_snapshot(args.db)
+        if snapshot_path:
+            print(f"INFO: Snapshot für die App veröffentlicht: {os.path.basename(snapshot_path)}")
+
+    except (sqlite3.Error, ValueError, OSError) as e:
+        print(f"\n--- FEHLER! ---")
+        print(f"Ein Fehler ist aufgetreten: {e}")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
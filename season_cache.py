@@ -0,0 +1,271 @@
+import numpy as np
+
+# ==============================================================================
+# Kompakter Saison-Cache für die App (Saison-Analyse und Bestes Team)
+# ==============================================================================
+# Eine Saison wird einmal je Datenstand aus der Datenbank gelesen und als NumPy-
+# Arrays gehalten: ein strukturiertes Array mit einer Zeile je Spieler (Verein und
+# Position als kleine Ganzzahl-Codes, Marktwert, Gesamtpunkte, Effizienz) sowie
+# zwei Matrizen Spieler x Spieltag (Punkte und kumulierte Gesamtpunkte, NaN ohne
+# Eintrag), dazu die Gültigkeitsintervalle von Verein, Position und Marktwert je
+# Spieltag (player_seasonal_details_history) für Auswertungen einzelner Spieltage.
+# Filter, Sortierung, Seiten und die Eingaben für solve_best_team sind damit
+# Index-Operationen auf diesen Arrays. Alle Arrays sind schreibgeschützt, da die
+# App ein Objekt für alle Sitzungen teilt (st.cache_resource).
+#
+# Hinweis: player_stats.game_day_id enthält die Spieltagsnummer.
+
+# Reihenfolge der Positionen in der Spieler-Übersicht (Sturm, Mittelfeld, Abwehr, Torwart)
+POSITION_ORDER = ['FORWARD', 'MIDFIELDER', 'DEFENDER', 'GOALKEEPER']
+
+PLAYER_DTYPE = np.dtype([
+    ('club', np.int16),             # Index in SeasonCache.clubs
+    ('position', np.int8),          # Index in SeasonCache.positions
+    ('market_value', np.int64),     # 0 ohne Marktwert
+    ('has_market_value', np.bool_),
+    ('points', np.float64),         # letzter Gesamtpunktestand der Saison
+    ('has_points', np.bool_),       # Spieler mit Gesamtpunkten (wie player_season_totals)
+    ('efficiency', np.float64),     # Punkte pro Million Marktwert, 0 ohne Marktwert
+])
+
+# Offenes Ende eines Gültigkeitsintervalls (valid_to_gameday IS NULL)
+OPEN_END = np.iinfo(np.int16).max
+
+INTERVAL_DTYPE = np.dtype([
+    ('row', np.int32),              # Zeile in SeasonCache.players
+    ('valid_from', np.int16),
+    ('valid_to', np.int16),         # OPEN_END bei offenem Intervall
+    ('club', np.int16),
+    ('position', np.int8),
+    ('market_value', np.int64),
+    ('has_market_value', np.bool_),
+])
+
+# Parameter: season_id
+PLAYERS_QUERY = """
+    SELECT psd.id, psd.player_id, p.first_name || ' ' || p.last_name, c.name, pos.name, psd.market_value
+    FROM player_seasonal_details psd
+    JOIN players p ON psd.player_id = p.player_id
+    LEFT JOIN clubs c ON c.club_id = psd.club_id
+    LEFT JOIN positions pos ON pos.position_id = psd.position_id
+    WHERE psd.season_id = ?
+"""
+
+# Parameter: season_id
+STATS_QUERY = """
+    SELECT ps.player_seasonal_details_id, ps.game_day_id, ps.points, ps.gesamtpunkte
+    FROM player_seasonal_details psd
+    JOIN player_stats ps ON ps.player_seasonal_details_id = psd.id
+    WHERE psd.season_id = ?
+"""
+
+# Parameter: season_id
+HISTORY_QUERY = """
+    SELECT h.player_id, h.valid_from_gameday, h.valid_to_gameday, c.name, pos.name, h.market_value
+    FROM player_seasonal_details_history h
+    LEFT JOIN clubs c ON c.club_id = h.club_id
+    LEFT JOIN positions pos ON pos.position_id = h.position_id
+    WHERE h.season_id = ?
+"""
+
+
+def _encode(values):
+    """Wörterbuch-Kodierung: (sortierte Kategorien, Code je Wert). None wird als eigene Kategorie geführt."""
+    categories = sorted({value for value in values if value is not None})
+    if any(value is None for value in values):
+        categories.append(None)
+    codes = {value: code for code, value in enumerate(categories)}
+    return np.array(categories, dtype=object), [codes[value] for value in values]
+
+
+def _read_only(*arrays):
+    for array in arrays:
+        array.flags.writeable = False
+
+
+class SeasonCache:
+    """Spieler, Punkte und Spieltage einer Saison als NumPy-Arrays (siehe build_season_cache)."""
+
+    def __init__(self, player_ids, names, clubs, positions, players, gamedays, points, totals, intervals):
+        self.player_ids = player_ids    # Spieler-IDs (object)
+        self.names = names              # "Vorname Nachname" (object)
+        self.clubs = clubs              # Kategorien der Vereine
+        self.positions = positions      # Kategorien der Positionen
+        self.players = players          # strukturiertes Array (PLAYER_DTYPE)
+        self.gamedays = gamedays        # Spieltagsnummern der Matrix-Spalten
+        self.points = points            # Punkte je Spieler und Spieltag (float32, NaN ohne Eintrag)
+        self.totals = totals            # kumulierte Gesamtpunkte je Spieler und Spieltag
+        self.intervals = intervals      # Gültigkeitsintervalle (INTERVAL_DTYPE)
+        self.index = {player_id: i for i, player_id in enumerate(player_ids.tolist())}
+
+        # Sortierschlüssel für ranked(): Rang der Position und des Namens, einmal berechnet
+        position_rank = np.array([POSITION_ORDER.index(p) if p in POSITION_ORDER else len(POSITION_ORDER)
+                                  for p in positions.tolist()], dtype=np.int8)
+        self._position_rank = position_rank[players['position']]
+        self._name_rank = np.empty(len(names), dtype=np.int32)
+        self._name_rank[np.argsort(names.astype(str), kind='stable')] = np.arange(len(names), dtype=np.int32)
+        _read_only(self.player_ids, self.names, self.clubs, self.positions, self.players, self.gamedays,
+                   self.points, self.totals, self.intervals, self._position_rank, self._name_rank)
+
+    def __len__(self):
+        return len(self.players)
+
+    def code(self, categories, value):
+        """Code eines Vereins oder einer Position; -1, wenn der Wert in der Saison nicht vorkommt."""
+        matches = np.flatnonzero(categories == value)
+        return int(matches[0]) if len(matches) else -1
+
+    def filter_options(self):
+        """
+        Vereine, Positionen sowie Punkte- und Marktwert-Bereiche der Spieler mit Gesamtpunkten
+        als Dict: count, clubs, positions, min_points, max_points, min_market_value, max_market_value.
+        """
+        rated = self.players[self.players['has_points']]
+        valued = rated[rated['has_market_value']]
+        return {
+            'count': len(rated),
+            'clubs': [c for c in self.clubs[np.unique(rated['club'])].tolist() if c is not None],
+            'positions': [p for p in self.positions[np.unique(rated['position'])].tolist() if p is not None],
+            'min_points': float(rated['points'].min()) if len(rated) else 0.0,
+            'max_points': float(rated['points'].max()) if len(rated) else 0.0,
+            'min_market_value': int(valued['market_value'].min()) if len(valued) else 0,
+            'max_market_value': int(valued['market_value'].max()) if len(valued) else 0,
+        }
+
+    def select(self, club=None, position=None, min_points=0, market_value_range=None):
+        """
+        Zeilen der Spieler mit Gesamtpunkten, die den Filtern entsprechen (club/position None = alle),
+        sortiert wie die Spieler-Übersicht: Position, Gesamtpunkte absteigend, Name.
+        """
+        players = self.players
+        mask = players['has_points'] & (players['points'] >= min_points)
+        if club is not None:
+            mask &= players['club'] == self.code(self.clubs, club)
+        if position is not None:
+            mask &= players['position'] == self.code(self.positions, position)
+        if market_value_range is not None:
+            low, high = market_value_range
+            mask &= players['has_market_value'] & (players['market_value'] >= low) & (players['market_value'] <= high)
+        return self.ranked(np.flatnonzero(mask))
+
+    def ranked(self, rows):
+        """Sortiert Zeilen nach Position, Gesamtpunkten (absteigend) und Name."""
+        order = np.lexsort((self._name_rank[rows], -self.players['points'][rows], self._position_rank[rows]))
+        return rows[order]
+
+    def as_of(self, game_day_number):
+        """Index des am Spieltag gültigen Intervalls je Spielerzeile (-1: ohne Stand, nicht im Spiel)."""
+        intervals = self.intervals
+        valid = np.flatnonzero((intervals['valid_from'] <= game_day_number) & (intervals['valid_to'] >= game_day_number))
+        current = np.full(len(self.players), -1, dtype=np.intp)
+        current[intervals['row'][valid]] = valid
+        return current
+
+    def rows(self, rows, game_day_number=None):
+        """
+        Spalten für die Anzeige als Dict von Arrays (Spielernamen, Verein und Position als Text).
+        Mit game_day_number Verein, Position und Marktwert wie an diesem Spieltag gültig; die
+        Zeilen müssen dann aus pool() für denselben Spieltag stammen.
+        """
+        players = self.players[rows]
+        details = players if game_day_number is None else self.intervals[self.as_of(game_day_number)[rows]]
+        return {
+            'player_id': self.player_ids[rows],
+            'player_name': self.names[rows],
+            'club': self.clubs[details['club']],
+            'position': self.positions[details['position']],
+            'market_value_eur': np.where(details['has_market_value'], details['market_value'], np.nan),
+            'points': players['points'],
+            'efficiency_points_per_mil': players['efficiency'],
+        }
+
+    def cumulative(self, row):
+        """(Spieltage, kumulierte Gesamtpunkte) eines Spielers, nur Spieltage mit Eintrag."""
+        totals = self.totals[row]
+        present = ~np.isnan(totals)
+        return self.gamedays[present], totals[present]
+
+    def pool(self, game_day_number=None, default_market_value=0):
+        """
+        Eingaben für best_team.solve_best_team als (Zeilen, Dict): für die ganze Saison
+        (game_day_number=None) alle Spieler mit Gesamtpunkten, sonst alle Spieler mit einem an
+        diesem Spieltag gültigen Stand (Position und Marktwert von damals) und ihren Punkten
+        (0 ohne Eintrag). default_market_value ersetzt fehlende Marktwerte.
+        """
+        if game_day_number is None:
+            rows = np.flatnonzero(self.players['has_points'])
+            details = self.players[rows]
+            points = details['points']
+        else:
+            current = self.as_of(game_day_number)
+            rows = np.flatnonzero(current >= 0)
+            details = self.intervals[current[rows]]
+            column = np.flatnonzero(self.gamedays == game_day_number)
+            points = (np.nan_to_num(self.points[rows, column[0]]).astype(np.float64) if len(column)
+                      else np.zeros(len(rows)))
+        return rows, {
+            'player_ids': self.player_ids[rows],
+            'positions': self.positions[details['position']],
+            'market_values': np.where(details['has_market_value'], details['market_value'], default_market_value),
+            'points': points,
+        }
+
+
+def build_season_cache(conn, season_id):
+    """Liest eine Saison mit drei Abfragen und baut daraus den SeasonCache."""
+    details = conn.execute(PLAYERS_QUERY, (season_id,)).fetchall()
+    stats = conn.execute(STATS_QUERY, (season_id,)).fetchall()
+    history = conn.execute(HISTORY_QUERY, (season_id,)).fetchall()
+
+    # Eine Zeile je Spieler (player_id, season_id ist eindeutig)
+    row_of_detail = {detail[0]: row for row, detail in enumerate(details)}
+    row_of_player = {detail[1]: row for row, detail in enumerate(details)}
+    count = len(details)
+
+    player_ids = np.array([d[1] for d in details], dtype=object)
+    names = np.array([d[2] for d in details], dtype=object)
+    # Gemeinsame Kategorien für den aktuellen Stand und die Intervalle
+    history = [h for h in history if h[0] in row_of_player]
+    clubs, club_codes = _encode([d[3] for d in details] + [h[3] for h in history])
+    positions, position_codes = _encode([d[4] for d in details] + [h[4] for h in history])
+
+    players = np.zeros(count, dtype=PLAYER_DTYPE)
+    players['club'] = club_codes[:count]
+    players['position'] = position_codes[:count]
+    players['has_market_value'] = [d[5] is not None for d in details]
+    players['market_value'] = [d[5] or 0 for d in details]
+
+    # Matrizen Spieler x Spieltag aus den Statistikzeilen
+    stats = [s for s in stats if s[0] in row_of_detail and s[1] is not None]
+    gamedays = np.unique(np.array([s[1] for s in stats], dtype=np.int64))
+    rows = np.array([row_of_detail[s[0]] for s in stats], dtype=np.intp)
+    columns = np.searchsorted(gamedays, [s[1] for s in stats])
+    points = np.full((count, len(gamedays)), np.nan, dtype=np.float32)
+    totals = np.full((count, len(gamedays)), np.nan, dtype=np.float32)
+    points[rows, columns] = [np.nan if s[2] is None else s[2] for s in stats]
+    totals[rows, columns] = [np.nan if s[3] is None else s[3] for s in stats]
+
+    # Gesamtpunkte: Stand am letzten Spieltag mit Eintrag (wie player_season_totals)
+    has_stats = np.zeros((count, len(gamedays)), dtype=bool)
+    has_stats[rows, columns] = True
+    if len(gamedays):
+        last = len(gamedays) - 1 - np.argmax(has_stats[:, ::-1], axis=1)
+        latest = totals[np.arange(count), last].astype(np.float64)
+        players['has_points'] = has_stats.any(axis=1) & ~np.isnan(latest)
+        players['points'] = np.where(players['has_points'], latest, 0.0)
+    valued = players['market_value'] > 0
+    efficiency = np.divide(players['points'], players['market_value'] / 1_000_000.0,
+                           out=np.zeros(count), where=valued)
+    # Kaufmännisch runden wie ROUND() in SQLite (np.round rundet halbe Werte auf gerade Ziffern)
+    players['efficiency'] = np.sign(efficiency) * np.floor(np.abs(efficiency) * 100 + 0.5) / 100
+
+    intervals = np.zeros(len(history), dtype=INTERVAL_DTYPE)
+    intervals['row'] = [row_of_player[h[0]] for h in history]
+    intervals['valid_from'] = [h[1] for h in history]
+    intervals['valid_to'] = [OPEN_END if h[2] is None else h[2] for h in history]
+    intervals['club'] = club_codes[count:]
+    intervals['position'] = position_codes[count:]
+    intervals['has_market_value'] = [h[5] is not None for h in history]
+    intervals['market_value'] = [h[5] or 0 for h in history]
+
+    return SeasonCache(player_ids, names, clubs, positions, players, gamedays, points, totals, intervals)
@@ -0,0 +1,70 @@
+# ==============================================================================
+# Materialisierte Saison-Summen (player_season_totals)
+# ==============================================================================
+# Pro Spieler und Saison: letzter Gesamtpunktestand, zugehörige Spieltagsnummer
+# und Effizienz (Punkte pro Million Marktwert). Die Tabelle wird von den
+# Import-Skripten in derselben Transaktion wie player_stats gepflegt, damit App
+# und Importer nicht bei jedem Lauf über alle Spieltage aggregieren müssen.
+#
+# Hinweis: player_stats.game_day_id enthält die Spieltagsnummer.
+
+# Punkte pro Million Marktwert; 0 bei fehlendem Marktwert (wie bisher in der App)
+_EFFICIENCY_SQL = """
+    CASE WHEN psd.market_value > 0
+         THEN ROUND(ps.gesamtpunkte / (psd.market_value / 1000000.0), 2)
+         ELSE 0 END
+"""
+
+_UPSERT_SQL = f"""
+    INSERT INTO player_season_totals (season_id, player_id, player_seasonal_details_id,
+                                      gesamtpunkte, last_game_day_number, points_per_million)
+    SELECT psd.season_id, psd.player_id, psd.id, ps.gesamtpunkte, ps.game_day_id, {_EFFICIENCY_SQL}
+    FROM player_seasonal_details psd
+    JOIN player_stats ps ON ps.player_seasonal_details_id = psd.id
+    WHERE psd.season_id = ? AND ps.game_day_id = {{game_day}}
+    ON CONFLICT (season_id, player_id) DO UPDATE SET
+        player_seasonal_details_id = excluded.player_seasonal_details_id,
+        gesamtpunkte = excluded.gesamtpunkte,
+        last_game_day_number = excluded.last_game_day_number,
+        points_per_million = excluded.points_per_million
+    WHERE excluded.last_game_day_number >= player_season_totals.last_game_day_number
+"""
+
+# Parameter: season_id, game_day_number
+UPDATE_GAMEDAY_SQL = _UPSERT_SQL.format(game_day="?")
+
+# Parameter: season_id
+REBUILD_SEASON_SQL = _UPSERT_SQL.format(game_day="""(
+        SELECT MAX(ps2.game_day_id) FROM player_stats ps2
+        WHERE ps2.player_seasonal_details_id = psd.id
+    )""")
+
+# Parameter: season_id
+REFRESH_EFFICIENCY_SQL = """
+    UPDATE player_season_totals
+    SET points_per_million = CASE WHEN psd.market_value > 0
+                                  THEN ROUND(player_season_totals.gesamtpunkte / (psd.market_value / 1000000.0), 2)
+                                  ELSE 0 END
+    FROM player_seasonal_details psd
+    WHERE psd.id = player_season_totals.player_seasonal_details_id
+      AND player_season_totals.season_id = ?
+"""
+
+# Parameter: season_id
+LAST_TOTAL_POINTS_QUERY = "SELECT player_id, gesamtpunkte FROM player_season_totals WHERE season_id = ?"
+
+
+def update_season_totals(conn, season_id, game_day_number):
+    """Übernimmt die Gesamtpunkte eines gerade importierten Spieltags. Gibt die Anzahl der Zeilen zurück."""
+    return conn.execute(UPDATE_GAMEDAY_SQL, (season_id, game_day_number)).rowcount
+
+
+def rebuild_season_totals(conn, season_id):
+    """Berechnet die Summen einer Saison vollständig aus player_stats neu."""
+    conn.execute("DELETE FROM player_season_totals WHERE season_id = ?", (season_id,))
+    return conn.execute(REBUILD_SEASON_SQL, (season_id,)).rowcount
+
+
+def refresh_efficiency(conn, season_id):
+    """Aktualisiert die Effizienz nach geänderten Marktwerten (Stammdaten-Update)."""
+    return conn.execute(REFRESH_EFFICIENCY_SQL, (season_id,)).rowcount
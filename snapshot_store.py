@@ -0,0 +1,338 @@
+import sqlite3
+import os
+import re
+import sys
+import glob
+import time
+import zlib
+import hashlib
+import argparse
+from datetime import datetime
+
+# ==============================================================================
+# --- KONFIGURATION ---
+# ==============================================================================
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+STORE_PATH = os.path.join(SCRIPT_DIR, "dl-backup", "snapshots.db")
+ARCHIVE_DIR = os.path.join(SCRIPT_DIR, "dl-backup")
+# ==============================================================================
+
+# ==============================================================================
+# Delta-Speicher für die heruntergeladenen Spieler-CSVs
+# ==============================================================================
+# Statt jede geänderte CSV vollständig abzulegen, wird pro Saison ein vollständiger
+# Basis-Snapshot gespeichert und danach nur noch die geänderten Zeilen (Schlüssel:
+# Spieler-ID, Vergleich über einen Hash der Zeile). Entfernte Spieler werden mit
+# line = NULL vermerkt. Die Zeilen sind im Feed nach Spieler-ID sortiert; nur wenn
+# eine Datei davon abweicht, wird ihre ID-Reihenfolge komprimiert mit abgelegt.
+# Damit lässt sich jede Version Byte für Byte wiederherstellen (geprüft über content_hash).
+# Ergibt eine Datei aus ihren Zeilen nicht wieder denselben Inhalt (doppelte IDs, leere
+# Zeilen), wird sie zusätzlich vollständig und komprimiert abgelegt (raw_content).
+
+SNAPSHOT_PATTERN = re.compile(r"data_(\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2})\.csv$")
+TIMESTAMP_FORMAT = "%Y-%m-%d_%H-%M-%S"
+
+
+def season_name_for(timestamp):
+    """Saisonname zum Datum (Saisonwechsel im Juli)."""
+    year = timestamp.year if timestamp.month >= 7 else timestamp.year - 1
+    return f"{year}/{year + 1}"
+
+
+def row_hash(line):
+    """64-Bit-Hash einer CSV-Zeile (als SQLite-INTEGER speicherbar)."""
+    return int.from_bytes(hashlib.blake2b(line.encode("utf-8"), digest_size=8).digest(), "big", signed=True)
+
+
+def _strip_id(player_id, line):
+    """Die Spieler-ID steht bereits im Schlüssel und wird in der Zeile nicht wiederholt."""
+    return None if line is None else line[len(player_id) + 1:]
+
+
+def _with_id(player_id, rest):
+    return None if rest is None else f"{player_id};{rest}"
+
+
+def split_csv(content):
+    """Zerlegt den CSV-Inhalt in Kopfzeile, Zeilen je Spieler-ID und ID-Reihenfolge."""
+    text = content.decode("utf-8")
+    lines = text.split("\n")
+    trailing_newline = text.endswith("\n")
+    if trailing_newline:
+        lines.pop()
+    header, rows, order = lines[0], {}, []
+    for line in lines[1:]:
+        player_id = line.split(";", 1)[0]
+        rows[player_id] = line
+        order.append(player_id)
+    return header, rows, order, trailing_newline
+
+
+def join_csv(header, rows, order, trailing_newline):
+    text = "\n".join([header] + [rows[player_id] for player_id in order])
+    return (text + "\n" if trailing_newline else text).encode("utf-8")
+
+
+class SnapshotStore:
+    """Lesen und Schreiben des Delta-Speichers (eine SQLite-Datei)."""
+
+    def __init__(self, path=STORE_PATH):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS snapshots (
+                snapshot_id INTEGER PRIMARY KEY,
+                taken_at TEXT NOT NULL UNIQUE,
+                season TEXT NOT NULL,
+                is_base INTEGER NOT NULL,
+                header TEXT NOT NULL,
+                trailing_newline INTEGER NOT NULL,
+                id_order BLOB,
+                content_hash TEXT NOT NULL,
+                row_count INTEGER NOT NULL,
+                raw_content BLOB
+            );
+            CREATE TABLE IF NOT EXISTS snapshot_rows (
+                snapshot_id INTEGER NOT NULL,
+                player_id TEXT NOT NULL,
+                row_hash INTEGER,
+                line TEXT,
+                PRIMARY KEY (snapshot_id, player_id)
+            ) WITHOUT ROWID;
+        """)
+        # Speicher aus der Zeit vor raw_content
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(snapshots)")}
+        if "raw_content" not in columns:
+            self.conn.execute("ALTER TABLE snapshots ADD COLUMN raw_content BLOB")
+
+    def close(self):
+        self.conn.close()
+
+    # --- Lesen -----------------------------------------------------------------
+
+    def list_snapshots(self):
+        """Alle Snapshots als Liste von (Zeitstempel, Saison, is_base)."""
+        return [(datetime.strptime(taken_at, TIMESTAMP_FORMAT), season, bool(is_base))
+                for taken_at, season, is_base in self.conn.execute(
+                    "SELECT taken_at, season, is_base FROM snapshots ORDER BY snapshot_id")]
+
+    def latest_hash(self):
+        row = self.conn.execute("SELECT content_hash FROM snapshots ORDER BY snapshot_id DESC LIMIT 1").fetchone()
+        return row[0] if row else None
+
+    def header(self, timestamp):
+        """Kopfzeile der Version zum Zeitpunkt timestamp."""
+        snapshot = self._snapshot_row(timestamp)
+        return None if snapshot is None else snapshot[2]
+
+    def _snapshot_row(self, timestamp):
+        """Der letzte Snapshot mit taken_at <= timestamp."""
+        return self.conn.execute("""
+            SELECT snapshot_id, taken_at, header, trailing_newline, id_order, content_hash, raw_content
+            FROM snapshots WHERE taken_at <= ? ORDER BY taken_at DESC LIMIT 1
+        """, (timestamp.strftime(TIMESTAMP_FORMAT),)).fetchone()
+
+    def _base_id(self, snapshot_id):
+        return self.conn.execute(
+            "SELECT MAX(snapshot_id) FROM snapshots WHERE is_base = 1 AND snapshot_id <= ?", (snapshot_id,)).fetchone()[0]
+
+    def read_rows(self, timestamp):
+        """
+        Stellt die Tabelle zum Zeitpunkt timestamp wieder her ({Spieler-ID: CSV-Zeile}).
+        Gelesen wird nur der neueste Stand jedes Spielers zwischen Basis und Snapshot.
+        """
+        snapshot = self._snapshot_row(timestamp)
+        if snapshot is None:
+            return {}
+        rows = self.conn.execute("""
+            SELECT player_id, line, MAX(snapshot_id) FROM snapshot_rows
+            WHERE snapshot_id BETWEEN ? AND ?
+            GROUP BY player_id
+        """, (self._base_id(snapshot[0]), snapshot[0]))
+        return {player_id: _with_id(player_id, line) for player_id, line, _ in rows if line is not None}
+
+    def iter_deltas(self):
+        """
+        Liefert den Verlauf in zeitlicher Reihenfolge als
+        (Zeitstempel, is_base, {Spieler-ID: CSV-Zeile oder None für entfernt}).
+        """
+        snapshots = self.conn.execute(
+            "SELECT snapshot_id, taken_at, is_base FROM snapshots ORDER BY snapshot_id").fetchall()
+        rows = self.conn.execute(
+            "SELECT snapshot_id, player_id, line FROM snapshot_rows ORDER BY snapshot_id, player_id")
+        pending = next(rows, None)
+        for snapshot_id, taken_at, is_base in snapshots:
+            changes = {}
+            while pending is not None and pending[0] == snapshot_id:
+                changes[pending[1]] = _with_id(pending[1], pending[2])
+                pending = next(rows, None)
+            yield datetime.strptime(taken_at, TIMESTAMP_FORMAT), bool(is_base), changes
+
+    def iter_snapshots(self):
+        """Liefert nacheinander jede Version als (Zeitstempel, {Spieler-ID: CSV-Zeile})."""
+        state = {}
+        for timestamp, is_base, changes in self.iter_deltas():
+            if is_base:
+                state = {}
+            for player_id, line in changes.items():
+                if line is None:
+                    state.pop(player_id, None)
+                else:
+                    state[player_id] = line
+            yield timestamp, dict(state)
+
+    def export_csv(self, timestamp):
+        """Gibt den exakten Dateiinhalt der Version zum Zeitpunkt timestamp zurück (oder None)."""
+        snapshot = self._snapshot_row(timestamp)
+        if snapshot is None:
+            return None
+        _, _, header, trailing_newline, id_order, content_hash, raw_content = snapshot
+        if raw_content is not None:
+            content = zlib.decompress(raw_content)
+        else:
+            rows = self.read_rows(timestamp)
+            order = sorted(rows) if id_order is None else zlib.decompress(id_order).decode("utf-8").split("\n")
+            content = join_csv(header, rows, order, bool(trailing_newline))
+        if hashlib.sha256(content).hexdigest() != content_hash:
+            raise ValueError(f"Snapshot {timestamp} konnte nicht fehlerfrei wiederhergestellt werden.")
+        return content
+
+    # --- Schreiben -------------------------------------------------------------
+
+    def _current_state(self):
+        """Saison, Inhalts-Hash und Zeilen-Hashes des neuesten Snapshots (für die Delta-Berechnung)."""
+        last = self.conn.execute(
+            "SELECT snapshot_id, season, content_hash FROM snapshots ORDER BY snapshot_id DESC LIMIT 1").fetchone()
+        if last is None:
+            return None, None, {}
+        hashes = self.conn.execute("""
+            SELECT player_id, row_hash, MAX(snapshot_id) FROM snapshot_rows
+            WHERE snapshot_id BETWEEN ? AND ?
+            GROUP BY player_id
+        """, (self._base_id(last[0]), last[0]))
+        return last[1], last[2], {pid: h for pid, h, _ in hashes if h is not None}
+
+    def add(self, timestamp, content):
+        """
+        Nimmt eine heruntergeladene CSV auf. Gibt False zurück, wenn sich der Inhalt
+        gegenüber dem letzten Snapshot nicht geändert hat.
+        """
+        content_hash = hashlib.sha256(content).hexdigest()
+        last_season, last_hash, last_hashes = self._current_state()
+        if content_hash == last_hash:
+            return False
+
+        header, rows, order, trailing_newline = split_csv(content)
+        season = season_name_for(timestamp)
+        is_base = season != last_season
+        if is_base:
+            last_hashes = {}
+        changes = {pid: line for pid, line in rows.items() if last_hashes.get(pid) != row_hash(line)}
+        changes.update({pid: None for pid in last_hashes if pid not in rows})
+
+        id_order = None if order == sorted(rows) else zlib.compress("\n".join(order).encode("utf-8"), 9)
+        # Inhalt so, wie export_csv ihn aus den gespeicherten Zeilen wiederherstellen würde.
+        # Die Zeilen werden auch bei Abweichung abgelegt, damit spätere Deltas auf ihnen aufbauen.
+        restored = {pid: _with_id(pid, _strip_id(pid, line)) for pid, line in rows.items()}
+        raw_content = None
+        if join_csv(header, restored, order, trailing_newline) != content:
+            raw_content = zlib.compress(content, 9)
+        with self.conn:
+            snapshot_id = self.conn.execute("""
+                INSERT INTO snapshots (taken_at, season, is_base, header, trailing_newline, id_order, content_hash,
+                                       row_count, raw_content)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (timestamp.strftime(TIMESTAMP_FORMAT), season, int(is_base), header, int(trailing_newline),
+                  id_order, content_hash, len(rows), raw_content)).lastrowid
+            self.conn.executemany(
+                "INSERT INTO snapshot_rows (snapshot_id, player_id, row_hash, line) VALUES (?, ?, ?, ?)",
+                [(snapshot_id, pid, None if line is None else row_hash(line), _strip_id(pid, line))
+                 for pid, line in changes.items()])
+        return True
+
+
+def import_archive(store, directory):
+    """Übernimmt alle data_*.csv eines Ordners (z.B. dl-backup/) in zeitlicher Reihenfolge."""
+    known = {ts for ts, _, _ in store.list_snapshots()}
+    files = []
+    for path in glob.glob(os.path.join(directory, "data_*.csv")):
+        match = SNAPSHOT_PATTERN.search(os.path.basename(path))
+        if match:
+            files.append((datetime.strptime(match.group(1), TIMESTAMP_FORMAT), path))
+
+    added = 0
+    for timestamp, path in sorted(files):
+        if timestamp in known:
+            continue
+        with open(path, "rb") as f:
+            if store.add(timestamp, f.read()):
+                added += 1
+    return added, len(files)
+
+
+def compare_with_archive(store, directory):
+    """Vergleicht Größe und Lesezeit des Speichers mit den einzelnen CSV-Dateien."""
+    files = sorted(glob.glob(os.path.join(directory, "data_*.csv")))
+    csv_bytes = sum(os.path.getsize(path) for path in files)
+    start = time.perf_counter()
+    csv_rows = 0
+    for path in files:
+        with open(path, "rb") as f:
+            csv_rows += len(split_csv(f.read())[1])
+    csv_seconds = time.perf_counter() - start
+
+    store.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    store_bytes = os.path.getsize(store.path)
+    start = time.perf_counter()
+    count = sum(1 for _ in store.iter_snapshots())
+    snapshots_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    changed = sum(len(changes) for _, _, changes in store.iter_deltas())
+    deltas_seconds = time.perf_counter() - start
+
+    print(f"{'':<26}{'Versionen':>10}{'Zeilen':>9}{'Größe (KB)':>12}{'Lesen (ms)':>12}")
+    print(f"{'CSV-Dateien':<26}{len(files):>10}{csv_rows:>9}{csv_bytes / 1024:>12.0f}{csv_seconds * 1000:>12.1f}")
+    print(f"{'Delta-Speicher (Tabellen)':<26}{count:>10}{'':>9}{store_bytes / 1024:>12.0f}{snapshots_seconds * 1000:>12.1f}")
+    print(f"{'Delta-Speicher (Deltas)':<26}{count:>10}{changed:>9}{'':>12}{deltas_seconds * 1000:>12.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Delta-Speicher für die heruntergeladenen Spieler-CSVs.")
+    parser.add_argument("--speicher", default=STORE_PATH)
+    sub = parser.add_subparsers(dest="befehl", required=True)
+    p_import = sub.add_parser("import", help="CSV-Dateien eines Ordners übernehmen.")
+    p_import.add_argument("ordner", nargs="?", default=ARCHIVE_DIR)
+    p_export = sub.add_parser("export", help="Version zu einem Zeitpunkt als CSV ausgeben.")
+    p_export.add_argument("zeitpunkt", help="Format YYYY-MM-DD_HH-MM-SS")
+    p_export.add_argument("--datei", help="Zieldatei (Standard: Ausgabe auf stdout).")
+    sub.add_parser("liste", help="Alle gespeicherten Versionen anzeigen.")
+    p_stats = sub.add_parser("vergleich", help="Größe und Lesezeit mit den CSV-Dateien vergleichen.")
+    p_stats.add_argument("ordner", nargs="?", default=ARCHIVE_DIR)
+    args = parser.parse_args()
+
+    store = SnapshotStore(args.speicher)
+    try:
+        if args.befehl == "import":
+            added, total = import_archive(store, args.ordner)
+            print(f"{added} neue Versionen aus {total} Dateien übernommen.")
+        elif args.befehl == "export":
+            content = store.export_csv(datetime.strptime(args.zeitpunkt, TIMESTAMP_FORMAT))
+            if content is None:
+                print(f"Fehler: Keine Version vor {args.zeitpunkt} gefunden.")
+            elif args.datei:
+                with open(args.datei, "wb") as f:
+                    f.write(content)
+            else:
+                sys.stdout.buffer.write(content)
+        elif args.befehl == "liste":
+            for timestamp, season, is_base in store.list_snapshots():
+                print(f"{timestamp:%Y-%m-%d %H:%M:%S}  {season}  {'Basis' if is_base else 'Delta'}")
+        elif args.befehl == "vergleich":
+            compare_with_archive(store, args.ordner)
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+import os
+import glob
+import hashlib
+import shutil
+import sys
+import time
+import asyncio
+import tempfile
+import threading
+from collections import deque
+from datetime import datetime
+from email.utils import formatdate
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import autodownload
+
+# ==============================================================================
+# --- KONFIGURATION ---
+# ==============================================================================
+# Zwei echte Snapshots als Inhalt des lokalen Test-Servers
+SAMPLE_FILES = sorted(glob.glob("dl-backup/data_*.csv"))[-2:]
+# ==============================================================================
+
+
+class FeedHandler(BaseHTTPRequestHandler):
+    """Lokaler Ersatz für den Kicker-Feed mit ETag/Last-Modified und 304-Antworten."""
+    content = b""
+    last_modified = formatdate(usegmt=True)
+    requests_seen = []
+
+    def do_GET(self):
+        etag = '"' + hashlib.sha256(self.content).hexdigest()[:16] + '"'
+        FeedHandler.requests_seen.append(dict(self.headers))
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/csv")
+        self.send_header("Content-Length", str(len(self.content)))
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", self.last_modified)
+        self.end_headers()
+        self.wfile.write(self.content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_handler(content, delay):
+    """Eigener Feed-Server mit festem Inhalt und künstlicher Antwortzeit."""
+    def do_GET(self):
+        time.sleep(delay)
+        FeedHandler.do_GET(self)
+    return type("SlowFeedHandler", (FeedHandler,), {"content": content, "do_GET": do_GET})
+
+
+def make_feed(name, url, directory, ingest=False):
+    return {"name": name, "league": "Test", "season": "2025/2026", "url": url, "directory": directory, "ingest": ingest}
+
+
+def start_server(handler=FeedHandler):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/players.csv"
+
+
+def check(condition, success, failure):
+    print(f"✅ ERFOLG: {success}" if condition else f"❌ FEHLER: {failure}")
+    return condition
+
+
+def run_tests():
+    """Prüft den bedingten, gestreamten Download gegen einen lokalen HTTP-Server."""
+    print("Starte Tests für autodownload.py...")
+    server, url = start_server()
+    directory = tempfile.mkdtemp()
+    try:
+        with open(SAMPLE_FILES[0], "rb") as f:
+            FeedHandler.content = f.read()
+
+        print("\n--- Test 1: Erster Download wird gespeichert ---")
+        result = autodownload.poll_once(url, directory)
+        files = glob.glob(os.path.join(directory, "data_*.csv"))
+        check(result == 'neu' and len(files) == 1, "Neue Version abgelegt.", f"Ergebnis '{result}', {len(files)} Dateien.")
+        if files:
+            with open(files[0], "rb") as f:
+                check(f.read() == FeedHandler.content, "Dateiinhalt stimmt mit dem Server überein.", "Dateiinhalt weicht ab.")
+        check(autodownload.load_last_hash(directory) == hashlib.sha256(FeedHandler.content).hexdigest(),
+              "Inkrementell berechneter Hash ist korrekt.", "Gespeicherter Hash stimmt nicht.")
+
+        print("\n--- Test 2: Unveränderter Feed liefert 304 ---")
+        result = autodownload.poll_once(url, directory)
+        sent = FeedHandler.requests_seen[-1]
+        check(result == 'unverändert', "Keine neue Version.", f"Ergebnis '{result}'.")
+        check("If-None-Match" in sent and "If-Modified-Since" in sent,
+              "Validatoren wurden mitgeschickt.", f"Header fehlen: {sent}")
+        check(not os.path.exists(os.path.join(directory, "temp.csv")), "Keine temporäre Datei angelegt.", "temp.csv liegt noch im Ordner.")
+
+        print("\n--- Test 3: Geänderter Feed wird erkannt ---")
+        # Versionen werden sekundengenau abgelegt
+        time.sleep(1.1)
+        with open(SAMPLE_FILES[1], "rb") as f:
+            FeedHandler.content = f.read()
+        result = autodownload.poll_once(url, directory)
+        check(result == 'neu', "Geänderte Version abgelegt.", f"Ergebnis '{result}'.")
+        store = autodownload.SnapshotStore(os.path.join(directory, autodownload.STORE_FILE))
+        count = len(store.list_snapshots())
+        store.close()
+        check(count == 2, "Beide Versionen im Delta-Speicher.", f"{count} Versionen im Delta-Speicher.")
+
+        print("\n--- Test 4: Server ohne 304 (gleicher Inhalt) ---")
+        os.remove(os.path.join(directory, autodownload.VALIDATORS_FILE))
+        result = autodownload.poll_once(url, directory)
+        check(result == 'unverändert', "Gleicher Inhalt über den Hash erkannt.", f"Ergebnis '{result}'.")
+
+        print("\n--- Test 5: Adaptiver Zeitplan ---")
+        monday = datetime(2025, 1, 6, 10, 0)
+        saturday = datetime(2025, 1, 11, 16, 0)
+        autodownload.jitter = 0
+        check(autodownload.next_interval(deque([False] * 8), saturday) == autodownload.match_interval,
+              "In Spielzeiten gilt das kurze Intervall.", "Spielzeit nicht erkannt.")
+        check(autodownload.next_interval(deque([True]), monday) == autodownload.min_interval,
+              "Nach einer Änderung gilt das Basisintervall.", "Basisintervall falsch.")
+        check(autodownload.next_interval(deque([True, False, False]), monday) == autodownload.min_interval * 4,
+              "Unveränderte Abfragen verlängern das Intervall exponentiell.", "Backoff falsch.")
+        check(autodownload.next_interval(deque([False] * 8), monday) == autodownload.max_interval,
+              "Intervall ist nach oben begrenzt.", "Obergrenze überschritten.")
+        # Samstag 14:30, die Spielzeit beginnt um 15:00
+        before_window = datetime(2025, 1, 11, 14, 30)
+        check(autodownload.next_interval(deque([False] * 8), before_window) == 1800,
+              "Wartezeit endet mit dem Beginn der nächsten Spielzeit.",
+              f"Wartezeit {autodownload.next_interval(deque([False] * 8), before_window):.0f} s vor der Spielzeit.")
+        autodownload.jitter = 0.1
+        waits = [autodownload.next_interval(deque([False] * 8), before_window) for _ in range(100)]
+        check(max(waits) <= 1800, "Auch mit Jitter nie über den Beginn der Spielzeit hinaus.",
+              f"Längste Wartezeit {max(waits):.0f} s.")
+        waits = [autodownload.next_interval(deque([True]), monday) for _ in range(100)]
+        check(min(waits) >= 540 and max(waits) <= 660 and len(set(waits)) > 1,
+              "Jitter streut um +/- 10 %.", f"Jitter außerhalb: {min(waits):.0f}-{max(waits):.0f}")
+
+        print("\n--- Test 6: Daemon startet Import nach neuer Datei ---")
+        daemon_dir = tempfile.mkdtemp()
+        marker = os.path.join(daemon_dir, "ingest.txt")
+        command = [sys.executable, "-c", f"open({marker!r}, 'a').write('x')"]
+        autodownload.min_interval = autodownload.match_interval = 0.05
+        autodownload.match_windows = []
+        asyncio.run(autodownload.run_daemon([make_feed("daemon", url, daemon_dir, ingest=True)], command, max_polls=3))
+        with open(marker) as f:
+            runs = len(f.read())
+        check(runs == 1, "Import genau einmal gestartet (1 neue Datei, 2x 304).", f"Import {runs}x gestartet.")
+        shutil.rmtree(daemon_dir, ignore_errors=True)
+
+        print("\n--- Test 7: Fehler werden mit wachsender Wartezeit wiederholt ---")
+        daemon_dir = tempfile.mkdtemp()
+        autodownload.retry_delay = 0.05
+        start = time.perf_counter()
+        feed = make_feed("offline", "http://127.0.0.1:1/players.csv", daemon_dir, ingest=True)
+        asyncio.run(autodownload.run_daemon([feed], command, max_polls=3))
+        elapsed = time.perf_counter() - start
+        # Wartezeiten 0,05 s und 0,1 s (jeweils +/- 10 %)
+        check(0.13 <= elapsed < 5, f"Zwei Wiederholungen nach {elapsed:.2f} s.", f"Unerwartete Dauer {elapsed:.2f} s.")
+        check(not os.path.exists(marker), "Kein Import nach Fehlern.", "Import trotz Fehler gestartet.")
+        shutil.rmtree(daemon_dir, ignore_errors=True)
+
+        print("\n--- Test 8: Mehrere Feeds gleichzeitig ---")
+        delay = 0.3
+        servers = []
+        feed_list = []
+        feeds_dir = tempfile.mkdtemp()
+        for i, path in enumerate(SAMPLE_FILES * 2):
+            with open(path, "rb") as f:
+                feed_server, feed_url = start_server(make_handler(f.read(), delay))
+            servers.append(feed_server)
+            feed_list.append(make_feed(f"feed{i}", feed_url, os.path.join(feeds_dir, f"feed{i}")))
+        autodownload.max_connections = 4
+        start = time.perf_counter()
+        results = asyncio.run(autodownload.poll_all(feed_list))
+        elapsed = time.perf_counter() - start
+        check(set(results.values()) == {'neu'}, "Alle Feeds neu abgelegt.", f"Ergebnisse: {results}")
+        check(elapsed < 2 * delay, f"4 Feeds parallel in {elapsed:.2f} s (einzeln je {delay} s).",
+              f"Abfrage dauerte {elapsed:.2f} s, Feeds liefen nicht parallel.")
+        hashes = [autodownload.load_last_hash(feed["directory"]) for feed in feed_list]
+        check(hashes[0] == hashes[2] and hashes[0] != hashes[1], "Jeder Feed hat seinen eigenen Hash-Stand.", "Hash-Stände vermischt.")
+
+        autodownload.max_connections = 2
+        start = time.perf_counter()
+        results = asyncio.run(autodownload.poll_all(feed_list))
+        elapsed = time.perf_counter() - start
+        check(set(results.values()) == {'unverändert'}, "Zweiter Durchlauf: keine Änderung.", f"Ergebnisse: {results}")
+        check(elapsed >= 2 * delay, f"Mit 2 Verbindungen {elapsed:.2f} s (Pool begrenzt).",
+              f"Pool nicht begrenzt ({elapsed:.2f} s).")
+        check(autodownload.check_feeds(feed_list + [feed_list[0]]) is not None,
+              "Doppelte Feeds werden erkannt.", "Doppelte Feeds nicht erkannt.")
+        for feed_server in servers:
+            feed_server.shutdown()
+        shutil.rmtree(feeds_dir, ignore_errors=True)
+
+        print("\n--- Test 9: Schreibfehler beenden die Abfrage der anderen Feeds nicht ---")
+        broken_dir = tempfile.mkdtemp()
+        # Ein Ordner anstelle des Delta-Speichers: SQLite kann ihn nicht öffnen
+        os.makedirs(os.path.join(broken_dir, autodownload.STORE_FILE))
+        good_dir = tempfile.mkdtemp()
+        results = asyncio.run(autodownload.poll_all([make_feed("kaputt", url, broken_dir), make_feed("gut", url, good_dir)]))
+        check(results == {"kaputt": 'fehler', "gut": 'neu'}, "Fehler beim Speichern ergibt 'fehler', der andere Feed läuft weiter.",
+              f"Ergebnisse: {results}")
+        check(not os.path.exists(os.path.join(broken_dir, "temp.csv")) and autodownload.load_last_hash(broken_dir) is None
+              and not glob.glob(os.path.join(broken_dir, "data_*.csv")),
+              "temp.csv entfernt, kein Hash gespeichert.", "Reste des fehlgeschlagenen Downloads im Ordner.")
+        os.rmdir(os.path.join(broken_dir, autodownload.STORE_FILE))
+        result = autodownload.poll_once(url, broken_dir)
+        check(result == 'neu', "Nächster Versuch speichert die Version.", f"Ergebnis '{result}'.")
+        shutil.rmtree(broken_dir, ignore_errors=True)
+        shutil.rmtree(good_dir, ignore_errors=True)
+
+        print("\n--- Test 10: Abfragen laufen während eines Imports weiter ---")
+        contents = []
+        for path in SAMPLE_FILES:
+            with open(path, "rb") as f:
+                contents.append(f.read())
+        request_times = []
+
+        def do_GET(self):
+            # Erste Abfrage liefert die erste Version, alle weiteren die zweite
+            request_times.append(time.perf_counter())
+            self.content = contents[min(len(request_times) - 1, 1)]
+            FeedHandler.do_GET(self)
+        sequence_server, sequence_url = start_server(type("SequenceHandler", (FeedHandler,), {"do_GET": do_GET}))
+        daemon_dir = tempfile.mkdtemp()
+        marker = os.path.join(daemon_dir, "ingest.txt")
+        # Import dauert länger als zwei Abfrageintervalle und markiert Beginn und Ende
+        slow_command = [sys.executable, "-c",
+                        f"import time; open({marker!r}, 'a').write('s'); time.sleep(3); open({marker!r}, 'a').write('e')"]
+        # Versionen werden sekundengenau abgelegt, daher 1,1 s zwischen den Abfragen
+        autodownload.min_interval = 1.1
+        autodownload.jitter = 0
+        feed = make_feed("spieltag", sequence_url, os.path.join(daemon_dir, "feed"), ingest=True)
+        asyncio.run(autodownload.run_daemon([feed], slow_command, max_polls=3))
+        with open(marker) as f:
+            runs = f.read()
+        gaps = [b - a for a, b in zip(request_times, request_times[1:])]
+        check(len(gaps) == 2 and max(gaps) < 1.4, f"Abfragen im Abstand von {', '.join(f'{g:.2f}' for g in gaps)} s trotz laufendem Import.",
+              f"Abstände der Abfragen: {gaps}")
+        check(runs == "sese", "Neue Datei während des Imports: genau ein weiterer Import danach, nie zwei gleichzeitig.",
+              f"Import-Verlauf: '{runs}'")
+        autodownload.jitter = 0.1
+        sequence_server.shutdown()
+        shutil.rmtree(daemon_dir, ignore_errors=True)
+
+    except Exception as e:
+        print(f"\nEin unerwarteter Fehler ist während der Tests aufgetreten: {e}")
+    finally:
+        server.shutdown()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    run_tests()
@@ -0,0 +1,175 @@
+import os
+import sys
+import glob
+import shutil
+import sqlite3
+import tempfile
+import functools
+from datetime import datetime
+
+import db_utils
+import kickerdb
+import precompute_best_teams
+from schema import apply_migrations
+
+# ==============================================================================
+# --- KONFIGURATION ---
+# ==============================================================================
+REFERENCE_DB_PATH = "kicker_main.db"
+ARCHIVE_DIR = "dl-backup"
+# Die Saison 2025/2026 wird aus der Kopie entfernt und aus dem Archiv neu eingelesen.
+# Die Snapshots ab Juni enthalten noch Stände der alten Saison (Saisonerkennung).
+REPLAY_SEASON_NAME = "2025/2026"
+REPLAY_FROM = datetime(2025, 6, 1)
+# ==============================================================================
+
+STATS_QUERY = """
+    SELECT ps.game_day_id, psd.player_id, ps.gesamtpunkte
+    FROM player_stats ps
+    JOIN player_seasonal_details psd ON psd.id = ps.player_seasonal_details_id
+    JOIN seasons s ON s.season_id = psd.season_id
+    WHERE s.season_name = ?
+"""
+
+
+def check(condition, success, failure):
+    print(f"✅ ERFOLG: {success}" if condition else f"❌ FEHLER: {failure}")
+    return condition
+
+
+def remove_season(db_path, season_name):
+    """Entfernt eine Saison samt aller abhängigen Zeilen aus einer Datenbank-Kopie."""
+    conn = sqlite3.connect(db_path)
+    apply_migrations(conn)
+    season_id = conn.execute("SELECT season_id FROM seasons WHERE season_name = ?", (season_name,)).fetchone()[0]
+    with conn:
+        conn.execute("DELETE FROM player_stats WHERE player_seasonal_details_id IN "
+                     "(SELECT id FROM player_seasonal_details WHERE season_id = ?)", (season_id,))
+        for table in ("player_seasonal_details", "game_days", "player_season_totals", "player_value_history",
+                      "player_seasonal_details_history", "best_teams", "best_team_players"):
+            conn.execute(f"DELETE FROM {table} WHERE season_id = ?", (season_id,))
+        conn.execute("DELETE FROM seasons WHERE season_id = ?", (season_id,))
+    conn.close()
+
+
+def run_tests():
+    """Spielt die Snapshots ab Juni 2025 mit kickerdb.py ingest als Rückstand ein und vergleicht mit der Hauptdatenbank."""
+    print("Starte Tests für kickerdb.py ingest...")
+    directory = tempfile.mkdtemp()
+    try:
+        db_path = os.path.join(directory, "ingest.db")
+        download_dir = os.path.join(directory, "autodownload")
+        os.makedirs(download_dir)
+        shutil.copy(REFERENCE_DB_PATH, db_path)
+        remove_season(db_path, REPLAY_SEASON_NAME)
+        files = [path for path in sorted(glob.glob(os.path.join(ARCHIVE_DIR, "data_*.csv")))
+                 if os.path.basename(path) >= f"data_{REPLAY_FROM:%Y-%m-%d}"]
+        for path in files:
+            shutil.copy(path, download_dir)
+        # Sicherungen und veröffentlichte Snapshots im Testordner statt in backups/ und published/
+        publish_dir = os.path.join(directory, "published")
+        kickerdb.backup_database = functools.partial(db_utils.backup_database, backup_dir=os.path.join(directory, "backups"))
+        kickerdb.publish_snapshot = functools.partial(db_utils.publish_snapshot, publish_dir=publish_dir)
+
+        print(f"\n--- Test 1: Rückstand von {len(files)} Snapshots in einem Lauf ---")
+        kickerdb.ingest(db_path, download_dir, since=REPLAY_FROM, workers=1)
+        conn = sqlite3.connect(db_path)
+        logged = conn.execute("SELECT COUNT(*) FROM ingest_log").fetchone()[0]
+        check(logged > 0 and logged <= len(files), f"{logged} von {len(files)} Snapshots in zeitlicher Reihenfolge protokolliert.",
+              f"{logged} Einträge im Protokoll bei {len(files)} Dateien.")
+
+        print("\n--- Test 2: Saisonerkennung ---")
+        rows = conn.execute("""
+            SELECT s.season_name, COUNT(*), SUM(l.game_day_number IS NOT NULL) FROM ingest_log l
+            JOIN seasons s USING (season_id) GROUP BY s.season_name ORDER BY s.season_name
+        """).fetchall()
+        seasons = {name: (count, gamedays) for name, count, gamedays in rows}
+        check(seasons.get("2024/2025", (0, 1))[1] == 0 and seasons.get("2024/2025", (0, 0))[0] > 0,
+              "Snapshots vor dem Punkte-Reset bleiben in der alten Saison, ohne neuen Spieltag.",
+              f"Zuordnung: {seasons}")
+        old_gamedays = conn.execute("SELECT COUNT(*) FROM game_days g JOIN seasons s USING (season_id) "
+                                    "WHERE s.season_name = '2024/2025'").fetchone()[0]
+        check(old_gamedays == 34, "Alte Saison hat weiterhin 34 Spieltage.", f"Alte Saison hat {old_gamedays} Spieltage.")
+
+        print("\n--- Test 3: Spieltage und Gesamtpunkte wie in der Hauptdatenbank ---")
+        ours = {(gd, pid): total for gd, pid, total in conn.execute(STATS_QUERY, (REPLAY_SEASON_NAME,))}
+        reference_conn = sqlite3.connect(f"file:{REFERENCE_DB_PATH}?mode=ro", uri=True)
+        theirs = {(gd, pid): total for gd, pid, total in reference_conn.execute(STATS_QUERY, (REPLAY_SEASON_NAME,))}
+        reference_conn.close()
+        gamedays = sorted({gd for gd, _ in ours})
+        check(gamedays == [1], "Spieltag 1 erkannt (Teilergebnisse vom Freitag nicht als eigener Spieltag).",
+              f"Erkannte Spieltage: {gamedays}")
+        common = ours.keys() & theirs.keys()
+        differing = sum(1 for key in common if ours[key] != theirs[key])
+        check(len(common) > 500 and differing == 0, f"{len(common)} Gesamtpunktestände stimmen überein.",
+              f"{differing} von {len(common)} Gesamtpunkteständen weichen ab.")
+        totals = conn.execute("""
+            SELECT COUNT(*) FROM player_season_totals t JOIN seasons s USING (season_id)
+            WHERE s.season_name = ? AND t.last_game_day_number = 1
+        """, (REPLAY_SEASON_NAME,)).fetchone()[0]
+        check(totals == len(ours), "Saison-Summen in derselben Transaktion fortgeschrieben.",
+              f"{totals} Saison-Summen für {len(ours)} Punkteeinträge.")
+        teams = conn.execute("""
+            SELECT DISTINCT game_day_number FROM best_teams b JOIN seasons s USING (season_id)
+            WHERE s.season_name = ? ORDER BY 1
+        """, (REPLAY_SEASON_NAME,)).fetchall()
+        check([t[0] for t in teams] == [precompute_best_teams.SEASON_GAME_DAY, 1], "Beste Teams für Saison und Spieltag 1 berechnet.",
+              f"Beste Teams für: {teams}")
+
+        print("\n--- Test 4: Veröffentlichter Snapshot für die App ---")
+        snapshot_path = db_utils.read_published_snapshot(publish_dir)
+        check(snapshot_path is not None, f"Zeiger verweist auf {os.path.basename(snapshot_path or '')}.",
+              "Kein Snapshot veröffentlicht.")
+        snapshot = sqlite3.connect(f"file:{snapshot_path}?immutable=1", uri=True)
+        counts = [c.execute("SELECT COUNT(*) FROM player_stats").fetchone()[0] for c in (conn, snapshot)]
+        analyzed = snapshot.execute("SELECT COUNT(*) FROM sqlite_stat1").fetchone()[0]
+        journal = snapshot.execute("PRAGMA journal_mode").fetchone()[0]
+        snapshot.close()
+        check(counts[0] == counts[1] and analyzed > 0 and journal == "delete",
+              f"Snapshot mit immutable=1 lesbar, {counts[1]} Statistikzeilen, ANALYZE-Statistiken vorhanden.",
+              f"player_stats: {counts}, sqlite_stat1: {analyzed}, journal_mode: {journal}")
+
+        print("\n--- Test 5: Zweiter Lauf ohne neue Snapshots ---")
+        before = conn.execute("SELECT COUNT(*) FROM player_stats").fetchone()[0]
+        conn.close()
+        kickerdb.ingest(db_path, download_dir, workers=1)
+        conn = sqlite3.connect(db_path)
+        after = conn.execute("SELECT COUNT(*) FROM player_stats").fetchone()[0]
+        check(before == after, "Keine Änderung beim erneuten Lauf.", f"player_stats: {before} -> {after}")
+        check(db_utils.read_published_snapshot(publish_dir) == snapshot_path, "Keine neue Generation veröffentlicht.",
+              "Ohne Änderung wurde eine neue Generation veröffentlicht.")
+
+        print("\n--- Test 6: Zweiter Ordner mit eigenem Stand ---")
+        other_dir = os.path.join(directory, "process_gameday")
+        os.makedirs(other_dir)
+        # Gleicher Zeitpunkt wie ein bereits übernommener Snapshot, aber anderer Inhalt
+        with open(files[0], "rb") as f:
+            content = f.read()
+        with open(os.path.join(other_dir, os.path.basename(files[0])), "wb") as f:
+            f.write(content.replace(b"\n", b"\r\n", 1))
+        shutil.copy(files[1], other_dir)
+        before = conn.execute("SELECT COUNT(*) FROM ingest_log").fetchone()[0]
+        conn.close()
+        kickerdb.ingest(db_path, other_dir, since=REPLAY_FROM, workers=1)
+        conn = sqlite3.connect(db_path)
+        sources = conn.execute("SELECT COUNT(DISTINCT source), COUNT(*) FROM ingest_log").fetchone()
+        check(sources == (2, before + 1),
+              "Neuer Inhalt trotz älterem Zeitstempel übernommen, bereits übernommener Snapshot übersprungen.",
+              f"Quellen und Einträge: {sources}, vorher {before} Einträge.")
+
+        print("\n--- Test 7: Feed einer anderen Liga ---")
+        other_league = [feed["name"] for feed in kickerdb.feeds if feed["league"] != kickerdb.DB_LEAGUE]
+        sys.argv = ["kickerdb.py", "ingest", "--db", db_path, "--feed", other_league[0]]
+        kickerdb.main()
+        after = conn.execute("SELECT COUNT(*) FROM ingest_log").fetchone()[0]
+        check(after == before + 1, f"{other_league[0]} wird abgelehnt.", f"{after - before - 1} Snapshots übernommen.")
+        conn.close()
+
+    except Exception as e:
+        print(f"\nEin unerwarteter Fehler ist während der Tests aufgetreten: {e}")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    run_tests()
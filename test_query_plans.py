@@ -0,0 +1,206 @@
+import sqlite3
+import os
+import re
+import shutil
+import tempfile
+
+import queries
+from db_utils import write_transaction
+from player_csv import read_players
+from update_master_data import load_csv_staging, apply_master_data
+from best_team import GAMEDAY_POOL_QUERY, load_player_pool
+from details_history import record_details_history
+from season_totals import LAST_TOTAL_POINTS_QUERY
+from season_cache import (PLAYERS_QUERY as SEASON_CACHE_PLAYERS_QUERY, STATS_QUERY as SEASON_CACHE_STATS_QUERY,
+                          HISTORY_QUERY as SEASON_CACHE_HISTORY_QUERY)
+from value_history import VALUE_AS_OF_QUERY
+from schema import apply_migrations, get_schema_version, SCHEMA_VERSION
+
+# ==============================================================================
+# --- KONFIGURATION ---
+# ==============================================================================
+DB_PATH = "kicker_main.db"
+# Snapshot für die Spielersuche (angezeigte Namen aus der CSV)
+SEARCH_CSV = "dl-backup/data_2025-08-31_17-00-04.csv"
+SEARCH_SEASON_NAME = "2025/2026"
+# ==============================================================================
+
+# Ein vollständiger Durchlauf über player_stats darf in keiner Abfrage vorkommen
+FULL_SCAN_STATS = re.compile(r"^SCAN (ps|player_stats)\b")
+
+# (Name, SQL, Parameter, erwartete Indizes – mindestens einer muss im Plan auftauchen)
+# Die Spieler werden per ID gelesen, die Namenssuche läuft über den Volltextindex player_search.
+CHECKS = [
+    ("SEASON_CACHE_PLAYERS", SEASON_CACHE_PLAYERS_QUERY, (1,), ["idx_psd_season"]),
+    ("SEASON_CACHE_STATS", SEASON_CACHE_STATS_QUERY, (1,), ["PRIMARY KEY"]),
+    ("SEASON_CACHE_HISTORY", SEASON_CACHE_HISTORY_QUERY, (1,), ["PRIMARY KEY"]),
+    ("GAMEDAY_POOL", GAMEDAY_POOL_QUERY, {"season_id": 1, "game_day": 17}, ["valid_from_gameday<?"]),
+    ("PLAYER_SEARCH", queries.player_search_query(True, True, True, True), ('"kane"*', "FC Bayern", "FORWARD", 50), ["VIRTUAL TABLE"]),
+    ("PLAYER_SEARCH_FILTER", queries.player_search_query(True, False, True, False), ("FC Bayern", 50), ["sqlite_autoindex_player_seasonal_details_1"]),
+    ("PLAYER_SEASONAL_OVERVIEW", queries.PLAYER_SEASONAL_OVERVIEW_QUERY, ("pl-k00030669",), ["(player_id=?)", "AND player_id=?)"]),
+    ("GAMEDAYS", queries.GAMEDAYS_QUERY, (1,), ["idx_game_days_season"]),
+    ("BEST_TEAM_SUMMARY", queries.BEST_TEAM_SUMMARY_QUERY, (1, 0, "3-4-3"), ["sqlite_autoindex_best_teams_1"]),
+    ("BEST_TEAM_PLAYERS", queries.BEST_TEAM_PLAYERS_QUERY, (1, 0, "3-4-3"), ["sqlite_autoindex_best_team_players_1", "idx_psd_season"]),
+    ("LAST_TOTAL_POINTS", LAST_TOTAL_POINTS_QUERY, (1,), ["PRIMARY KEY"]),
+    ("PLAYER_VALUE_HISTORY", queries.PLAYER_VALUE_HISTORY_QUERY, ("pl-k00030669",), ["USING PRIMARY KEY (player_id=?"]),
+    ("VALUE_AS_OF", VALUE_AS_OF_QUERY, ("pl-k00030669", "2025-01-01 00:00:00"), ["PRIMARY KEY"]),
+]
+
+
+def check(condition, success, failure):
+    print(f"✅ ERFOLG: {success}" if condition else f"❌ FEHLER: {failure}")
+    return condition
+
+
+def explain(conn, sql, params):
+    return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+
+
+def run_tests():
+    """Prüft mit EXPLAIN QUERY PLAN, dass die Abfragen der App die Indizes nutzen."""
+    print("Starte Tests für die Abfragepläne...")
+
+    tmp_dir = tempfile.mkdtemp()
+    db_copy = os.path.join(tmp_dir, "kicker_plan_test.db")
+    shutil.copyfile(DB_PATH, db_copy)
+    conn = None
+    try:
+        conn = sqlite3.connect(db_copy)
+        conn.row_factory = sqlite3.Row
+
+        print("\n--- Test 1: Werden alle Migrationen angewendet? ---")
+        apply_migrations(conn)
+        version = get_schema_version(conn)
+        if version == SCHEMA_VERSION:
+            print(f"✅ ERFOLG: Schema-Version {version} erreicht.")
+        else:
+            print(f"❌ FEHLER: Schema-Version {version}, erwartet {SCHEMA_VERSION}.")
+            return
+
+        if apply_migrations(conn):
+            print("❌ FEHLER: Ein zweiter Lauf hat erneut Migrationen angewendet.")
+        else:
+            print("✅ ERFOLG: Ein zweiter Lauf ändert nichts.")
+
+        print("\n--- Test 2: Nutzen die Abfragen die Indizes? ---")
+        failures = 0
+        for name, sql, params, expected in CHECKS:
+            plan = explain(conn, sql, params)
+            full_scans = [step for step in plan if FULL_SCAN_STATS.match(step)]
+            missing = expected and not any(idx in step for step in plan for idx in expected)
+            if full_scans or missing:
+                failures += 1
+                print(f"❌ FEHLER: {name}")
+                for step in plan:
+                    print(f"      {step}")
+            else:
+                print(f"✅ {name}: {' | '.join(plan)}")
+
+        if failures:
+            print(f"\n❌ {failures} Abfrage(n) ohne passenden Index.")
+        else:
+            print("\n✅ Alle Abfragen verwenden die erwarteten Indizes.")
+
+        print("\n--- Test 3: Findet die Spielersuche (player_search) die richtigen Spieler? ---")
+        season_id = conn.execute("SELECT season_id FROM seasons WHERE season_name = ?", (SEARCH_SEASON_NAME,)).fetchone()[0]
+        with write_transaction(conn):
+            load_csv_staging(conn, read_players(SEARCH_CSV))
+            apply_master_data(conn, season_id)
+
+        def search(text, club=None, position=None):
+            expression = queries.fts_search_expression(text)
+            query = queries.player_search_query(True, True, club, position)
+            return [row[0] for row in conn.execute(query, [expression, *(v for v in (club, position) if v), 50])]
+
+        named = conn.execute("SELECT COUNT(*) FROM players WHERE display_name IS NOT NULL").fetchone()[0]
+        indexed = conn.execute("SELECT COUNT(*) FROM player_search").fetchone()[0]
+        players = conn.execute("SELECT COUNT(*) FROM players").fetchone()[0]
+        check(named > 500 and indexed == players, f"{named} angezeigte Namen übernommen, {indexed} Spieler im Suchindex.",
+              f"{named} angezeigte Namen, {indexed} von {players} Spielern im Suchindex.")
+        check(search("Luis Diaz")[:1] == ["pl-k00115737"], "'Luis Diaz' (angezeigter Name) findet Luis Fernando Diaz Marulanda.",
+              f"'Luis Diaz' liefert {search('Luis Diaz')}.")
+        check("pl-k00039317" in search("mul") and "pl-k00039317" in search("Thomas Mül"),
+              "Namensanfänge mit und ohne Umlaut finden Thomas Müller.", f"'mul' liefert {search('mul')}.")
+        check(search("kane", "Bayern München", "FORWARD") and not search("kane", "Bayern München", "GOALKEEPER"),
+              "Verein und Position schränken die Treffer ein.", "Filter nach Verein/Position wirken nicht.")
+        with write_transaction(conn):
+            conn.execute("UPDATE players SET display_name = 'Zyxwv' WHERE player_id = 'pl-k00030669'")
+        check(search("zyxwv") == ["pl-k00030669"] and search("neuer") == ["pl-k00030669"],
+              "Trigger halten den Suchindex bei Namensänderungen aktuell.", f"'zyxwv' liefert {search('zyxwv')}.")
+
+        print("\n--- Test 4: Verein und Position über die Nachschlagetabellen (clubs, positions) ---")
+        original = sqlite3.connect(f"file:{DB_PATH}?mode=ro", uri=True)
+        before = set(original.execute("SELECT player_id, season_id, club, position FROM player_seasonal_details"))
+        original.close()
+        after = set(map(tuple, conn.execute("""
+            SELECT psd.player_id, psd.season_id, c.name, p.name FROM player_seasonal_details psd
+            LEFT JOIN clubs c ON c.club_id = psd.club_id LEFT JOIN positions p ON p.position_id = psd.position_id
+            WHERE psd.season_id != ?
+        """, (season_id,))))
+        unchanged = {row for row in before if row[1] != season_id}
+        check(after == unchanged, f"{len(after)} Saisondaten nach der Migration mit denselben Vereinen und Positionen.",
+              f"{len(after ^ unchanged)} Abweichungen nach der Migration.")
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(player_seasonal_details)")]
+        check('club' not in columns and 'club_id' in columns, "Textspalten durch Ganzzahl-Schlüssel ersetzt.",
+              f"Spalten: {columns}")
+        players = read_players(SEARCH_CSV)[:3]
+        players = [players[0]._replace(club="Neuer Verein"), *players[1:]]
+        with write_transaction(conn):
+            load_csv_staging(conn, players)
+            apply_master_data(conn, season_id)
+        club = conn.execute("""
+            SELECT c.name FROM player_seasonal_details psd JOIN clubs c ON c.club_id = psd.club_id
+            WHERE psd.player_id = ? AND psd.season_id = ?
+        """, (players[0].player_id, season_id)).fetchone()[0]
+        check(club == "Neuer Verein", "Unbekannter Verein beim Import angelegt und zugeordnet.", f"Verein: {club}")
+
+        print("\n--- Test 5: Gültigkeitsintervalle der Stammdaten je Spieltag ---")
+        last_gameday = conn.execute("SELECT MAX(game_day_number) FROM game_days WHERE season_id = ?", (season_id,)).fetchone()[0]
+        players = read_players(SEARCH_CSV)
+        player = players[0]
+
+        def import_players(rows):
+            with write_transaction(conn):
+                load_csv_staging(conn, rows)
+                apply_master_data(conn, season_id)
+                record_details_history(conn, season_id)
+
+        def intervals():
+            return conn.execute("""
+                SELECT valid_from_gameday, valid_to_gameday, market_value FROM player_seasonal_details_history
+                WHERE season_id = ? AND player_id = ? ORDER BY valid_from_gameday
+            """, (season_id, player.player_id)).fetchall()
+
+        def pool_value(game_day_number):
+            pool = load_player_pool(conn, season_id, game_day_number)
+            values = dict(zip(pool['player_ids'], pool['market_values']))
+            return values.get(player.player_id)
+
+        import_players(players)
+        old_value = intervals()[-1][2]
+        import_players([player._replace(market_value=old_value + 1_000_000), *players[1:]])
+        import_players([player._replace(market_value=old_value + 2_000_000), *players[1:]])
+        spans = [tuple(row) for row in intervals()]
+        check(spans[-2:] == [(spans[-2][0], last_gameday, old_value), (last_gameday + 1, None, old_value + 2_000_000)],
+              f"Wechsel nach Spieltag {last_gameday} gilt ab Spieltag {last_gameday + 1}, zweite Änderung davor ersetzt die erste.",
+              f"Intervalle: {spans}")
+        with write_transaction(conn):
+            conn.execute("INSERT INTO game_days (season_id, game_day_number) VALUES (?, ?)", (season_id, last_gameday + 1))
+        check(pool_value(last_gameday) == old_value and pool_value(last_gameday + 1) == old_value + 2_000_000,
+              "Spieltags-Pool mit dem damals gültigen Marktwert.",
+              f"Marktwerte: {pool_value(last_gameday)}, {pool_value(last_gameday + 1)}")
+        import_players(players[1:])
+        spans = [tuple(row) for row in intervals()]
+        check(spans[-1][1] == last_gameday + 1 and pool_value(last_gameday + 2) is None,
+              "Spieler ohne Eintrag in der CSV: Intervall endet mit dem letzten Spieltag.", f"Intervalle: {spans}")
+
+    except Exception as e:
+        print(f"\nEin unerwarteter Fehler ist während der Tests aufgetreten: {e}")
+    finally:
+        if conn:
+            conn.close()
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    run_tests()
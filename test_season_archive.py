@@ -0,0 +1,133 @@
+import filecmp
+import glob
+import os
+import shutil
+import sqlite3
+import stat
+import tempfile
+
+import numpy as np
+
+import queries
+from schema import apply_migrations, create_compat_views
+from season_archive import ARCHIVED_TABLES, archive_season, attach_archives
+from season_cache import build_season_cache
+from test_query_plans import CHECKS, FULL_SCAN_STATS, explain
+
+# ==============================================================================
+# --- KONFIGURATION ---
+# ==============================================================================
+DB_PATH = "kicker_main.db"
+ARCHIVE_SEASON = "2024/2025"
+LATEST_SEASON = "2025/2026"
+# Spieler mit Einträgen in beiden Saisons (Spieler-Analyse)
+CHECK_PLAYER = "pl-k00030669"
+# ==============================================================================
+
+
+def check(condition, success, failure):
+    print(f"✅ ERFOLG: {success}" if condition else f"❌ FEHLER: {failure}")
+    return condition
+
+
+def cache_state(conn, season_ids):
+    """Vergleichbarer Inhalt der Saison-Caches (Spieler, Punktematrix, Intervalle)."""
+    state = {}
+    for season_id in season_ids:
+        cache = build_season_cache(conn, season_id)
+        state[season_id] = (cache.player_ids.tolist(), cache.gamedays.tolist(), cache.points, cache.intervals)
+    return state
+
+
+def same_caches(before, after):
+    return before.keys() == after.keys() and all(
+        b[0] == a[0] and b[1] == a[1] and np.array_equal(b[2], a[2], equal_nan=True) and np.array_equal(b[3], a[3])
+        for b, a in ((before[k], after[k]) for k in before))
+
+
+def run_tests():
+    """Archiviert eine Saison in einer Kopie der Datenbank und liest sie über angehängte Archive."""
+    print("Starte Tests für season_archive.py...")
+    tmp_dir = tempfile.mkdtemp()
+    db_copy = os.path.join(tmp_dir, "kicker_archive_test.db")
+    archive_dir = os.path.join(tmp_dir, "archive")
+    backup_dir = os.path.join(tmp_dir, "backups")
+    shutil.copyfile(DB_PATH, db_copy)
+    conn = reader = None
+    try:
+        conn = sqlite3.connect(db_copy)
+        apply_migrations(conn)
+        season_ids = [row[0] for row in conn.execute("SELECT season_id FROM seasons ORDER BY season_id")]
+        season_id = conn.execute("SELECT season_id FROM seasons WHERE season_name = ?", (ARCHIVE_SEASON,)).fetchone()[0]
+        caches_before = cache_state(conn, season_ids)
+        overview_before = conn.execute(queries.PLAYER_SEASONAL_OVERVIEW_QUERY, (CHECK_PLAYER,)).fetchall()
+
+        # Fertige Archivdatei eines abgebrochenen Laufs (ohne Eintrag in season_archives)
+        path = os.path.join(archive_dir, "season_2024-2025.db")
+        os.makedirs(archive_dir)
+        with open(path, "wb") as f:
+            f.write(b"alter Stand")
+
+        print("\n--- Test 1: Wird die Saison in ihre Archivdatei verschoben? ---")
+        counts = archive_season(conn, ARCHIVE_SEASON, archive_dir, backup_dir)
+        remaining = {table: conn.execute(f"SELECT COUNT(*) FROM {table} WHERE {condition}", (season_id,)).fetchone()[0]
+                     for table, condition in ARCHIVED_TABLES}
+        check(counts["player_stats"] > 0 and not any(remaining.values()),
+              f"{counts['player_stats']} Spieltagswerte und {counts['player_seasonal_details']} Stammdaten archiviert, "
+              "keine Zeilen der Saison mehr in der Hauptdatenbank.", f"Verbliebene Zeilen: {remaining}")
+        check(os.path.exists(path) and not os.stat(path).st_mode & stat.S_IWUSR,
+              "Archivdatei ist schreibgeschützt.", f"Archivdatei fehlt oder ist beschreibbar: {path}")
+        kept = glob.glob(path + ".*.alt")
+        check(len(kept) == 1 and open(kept[0], "rb").read() == b"alter Stand",
+              "Vorhandene Archivdatei wurde umbenannt statt gelöscht.", f"Umbenannte Dateien: {kept}")
+        backup_path = os.path.join(backup_dir, "archive", "season_2024-2025.db")
+        check(os.path.exists(backup_path) and filecmp.cmp(path, backup_path, shallow=False),
+              "Archivdatei ist gesichert.", f"Sicherung fehlt oder weicht ab: {backup_path}")
+
+        print("\n--- Test 2: Bleiben archivierte und laufende Saisons geschützt? ---")
+        try:
+            conn.execute("INSERT INTO game_days (season_id, game_day_number) VALUES (?, 35)", (season_id,))
+            check(False, "", "Neuer Spieltag für eine archivierte Saison wurde angelegt.")
+        except sqlite3.IntegrityError:
+            check(True, "Trigger verhindert neue Spieltage für die archivierte Saison.", "")
+        conn.rollback()
+        for season_name, reason in ((ARCHIVE_SEASON, "bereits archiviert"), (LATEST_SEASON, "laufende Saison")):
+            try:
+                archive_season(conn, season_name, archive_dir, backup_dir)
+                check(False, "", f"{season_name} ({reason}) wurde archiviert.")
+            except ValueError as e:
+                check(True, f"{season_name} wird abgelehnt: {e}", "")
+        conn.close()
+        conn = None
+
+        print("\n--- Test 3: Sieht die App mit angehängten Archiven alle Saisons wie zuvor? ---")
+        reader = sqlite3.connect(f"file:{db_copy}?mode=ro", uri=True)
+        create_compat_views(reader)
+        attached = attach_archives(reader, archive_dir)
+        check(attached == [season_id], f"Archiv der Saison {ARCHIVE_SEASON} angehängt.", f"Angehängt: {attached}")
+        check(same_caches(caches_before, cache_state(reader, season_ids)),
+              f"Saison-Caches aller {len(season_ids)} Saisons wie vor der Archivierung.", "Saison-Caches weichen ab.")
+        overview = reader.execute(queries.PLAYER_SEASONAL_OVERVIEW_QUERY, (CHECK_PLAYER,)).fetchall()
+        check(overview == overview_before, f"Saisonübersicht des Spielers unverändert ({len(overview)} Zeilen).",
+              f"Saisonübersicht: {overview} statt {overview_before}")
+
+        print("\n--- Test 4: Liest keine Abfrage player_stats aller Saisons vollständig? ---")
+        failures = [name for name, sql, params, _ in CHECKS
+                    if any(FULL_SCAN_STATS.match(step) for step in explain(reader, sql, params))]
+        check(not failures, f"Keine der {len(CHECKS)} Abfragen liest player_stats vollständig.",
+              f"Vollständiger Durchlauf über player_stats in: {failures}")
+
+    except Exception as e:
+        print(f"\nEin unerwarteter Fehler ist während der Tests aufgetreten: {e}")
+    finally:
+        for c in (conn, reader):
+            if c:
+                c.close()
+        for root, _, files in os.walk(tmp_dir):
+            for name in files:
+                os.chmod(os.path.join(root, name), 0o644)
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    run_tests()
@@ -0,0 +1,105 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+
+import numpy as np
+
+from best_team import load_player_pool, DEFAULT_MARKET_VALUE
+from schema import apply_migrations
+from season_cache import build_season_cache
+
+# ==============================================================================
+# --- KONFIGURATION ---
+# ==============================================================================
+DB_PATH = "kicker_main.db"
+# Stichproben für den Vergleich mit der Datenbank
+CHECK_GAMEDAYS = [1, 17, 34]
+CHECK_CLUB = "Bayern München"
+# ==============================================================================
+
+# Gesamtpunkte und Effizienz wie bisher in der Saison-Analyse (aus player_season_totals)
+TOTALS_QUERY = """
+    SELECT t.player_id, c.name, pos.name, psd.market_value, t.gesamtpunkte, t.points_per_million
+    FROM player_season_totals t
+    JOIN player_seasonal_details psd ON psd.id = t.player_seasonal_details_id
+    LEFT JOIN clubs c ON c.club_id = psd.club_id
+    LEFT JOIN positions pos ON pos.position_id = psd.position_id
+    JOIN players p ON p.player_id = t.player_id
+    WHERE t.season_id = ? AND t.gesamtpunkte IS NOT NULL
+"""
+
+
+def check(condition, success, failure):
+    print(f"✅ ERFOLG: {success}" if condition else f"❌ FEHLER: {failure}")
+    return condition
+
+
+def run_tests():
+    """Vergleicht den NumPy-Saison-Cache mit den bisherigen Abfragen auf einer migrierten Kopie."""
+    print("Starte Tests für season_cache.py...")
+    tmp_dir = tempfile.mkdtemp()
+    db_copy = os.path.join(tmp_dir, "kicker_cache_test.db")
+    shutil.copyfile(DB_PATH, db_copy)
+    conn = None
+    try:
+        conn = sqlite3.connect(db_copy)
+        apply_migrations(conn)
+        season_ids = [row[0] for row in conn.execute("SELECT season_id FROM seasons ORDER BY season_id")]
+
+        for season_id in season_ids:
+            cache = build_season_cache(conn, season_id)
+            print(f"\n--- Saison {season_id}: {len(cache)} Spieler, {len(cache.gamedays)} Spieltage ---")
+
+            totals = {row[0]: row[1:] for row in conn.execute(TOTALS_QUERY, (season_id,))}
+            selected = cache.select(min_points=-10**6)
+            ours = dict(zip(cache.player_ids[selected].tolist(), zip(*(
+                values.tolist() for values in (cache.rows(selected)[k] for k in
+                                               ('club', 'position', 'market_value_eur', 'points', 'efficiency_points_per_mil'))))))
+            check(ours == totals, f"{len(ours)} Gesamtpunkte und Effizienzwerte wie in player_season_totals.",
+                  f"{sum(1 for k in totals if ours.get(k) != totals[k])} von {len(totals)} Spielern weichen ab.")
+
+            rows = cache.select(CHECK_CLUB, 'FORWARD', 10, (1_000_000, 10_000_000))
+            data = cache.rows(rows)
+            expected = {k for k, v in totals.items()
+                        if v[:2] == (CHECK_CLUB, 'FORWARD') and 1_000_000 <= v[2] <= 10_000_000 and v[3] >= 10}
+            check(set(data['player_id']) == expected and list(data['points']) == sorted(data['points'], reverse=True),
+                  f"Filter nach Verein, Position, Punkten und Marktwert: {len(rows)} Spieler, absteigend sortiert.",
+                  f"Filterergebnis: {list(data['player_id'])}")
+
+            for game_day_number in [None] + CHECK_GAMEDAYS:
+                reference = load_player_pool(conn, season_id, game_day_number)
+                _, pool = cache.pool(game_day_number, DEFAULT_MARKET_VALUE)
+                same = all(
+                    dict(zip(reference['player_ids'], reference[key])) == dict(zip(pool['player_ids'], pool[key]))
+                    for key in ('positions', 'market_values', 'points'))
+                label = "Gesamte Saison" if game_day_number is None else f"Spieltag {game_day_number}"
+                check(same, f"{label}: Solver-Eingaben wie best_team.load_player_pool ({len(pool['player_ids'])} Spieler).",
+                      f"{label}: Solver-Eingaben weichen ab.")
+
+            check(not cache.players.flags.writeable and not cache.points.flags.writeable,
+                  "Arrays sind schreibgeschützt (von allen Sitzungen geteilt).", "Arrays sind beschreibbar.")
+
+        player_id = conn.execute("SELECT player_id FROM player_season_totals ORDER BY gesamtpunkte DESC LIMIT 1").fetchone()[0]
+        season_id = conn.execute("SELECT season_id FROM player_season_totals WHERE player_id = ? ORDER BY gesamtpunkte DESC LIMIT 1",
+                                 (player_id,)).fetchone()[0]
+        cache = build_season_cache(conn, season_id)
+        gamedays, cumulative = cache.cumulative(cache.index[player_id])
+        stats = conn.execute("""
+            SELECT ps.game_day_id, ps.gesamtpunkte FROM player_stats ps
+            JOIN player_seasonal_details psd ON psd.id = ps.player_seasonal_details_id
+            WHERE psd.season_id = ? AND psd.player_id = ? ORDER BY ps.game_day_id
+        """, (season_id, player_id)).fetchall()
+        check(np.array_equal(gamedays, [s[0] for s in stats]) and np.array_equal(cumulative, [s[1] for s in stats]),
+              f"Spielervergleich: {len(stats)} kumulierte Punktestände aus der Matrix.", "Kumulierte Punkte weichen ab.")
+
+    except Exception as e:
+        print(f"\nEin unerwarteter Fehler ist während der Tests aufgetreten: {e}")
+    finally:
+        if conn:
+            conn.close()
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    run_tests()
@@ -0,0 +1,67 @@
+import os
+import glob
+import shutil
+import tempfile
+from datetime import datetime
+
+from snapshot_store import SnapshotStore
+
+# ==============================================================================
+# --- KONFIGURATION ---
+# ==============================================================================
+# Zwei echte Snapshots als Grundlage der Testdateien
+SAMPLE_FILES = sorted(glob.glob("dl-backup/data_*.csv"))[-2:]
+# ==============================================================================
+
+
+def check(condition, success, failure):
+    print(f"✅ ERFOLG: {success}" if condition else f"❌ FEHLER: {failure}")
+    return condition
+
+
+def run_tests():
+    """Prüft, dass jede aufgenommene Version Byte für Byte wiederhergestellt wird."""
+    print("Starte Tests für snapshot_store.py...")
+    tmp_dir = tempfile.mkdtemp()
+    store = None
+    try:
+        contents = []
+        for path in SAMPLE_FILES:
+            with open(path, "rb") as f:
+                contents.append(f.read())
+        lines = contents[0].split(b"\n")
+        versions = [
+            ("Basis", contents[0]),
+            # Doppelte Spieler-ID: die zweite Zeile weicht ab und steht am Ende
+            ("Doppelte ID", contents[0] + lines[1].replace(b";", b";X", 1) + b"\n"),
+            ("Leere Zeilen", b"\n".join(lines[:5] + [b"", b""] + lines[5:]) + b"\n"),
+            ("Normale Version danach", contents[1]),
+        ]
+        store = SnapshotStore(os.path.join(tmp_dir, "snapshots.db"))
+        timestamps = [datetime(2025, 9, 1, 12, 0, i) for i in range(len(versions))]
+        for timestamp, (_, content) in zip(timestamps, versions):
+            store.add(timestamp, content)
+
+        print("\n--- Test 1: Wiederherstellung aller Versionen ---")
+        for timestamp, (label, content) in zip(timestamps, versions):
+            try:
+                exported = store.export_csv(timestamp)
+            except ValueError as e:
+                exported = str(e)
+            check(exported == content, f"{label}: Inhalt identisch wiederhergestellt.", f"{label}: {str(exported)[:80]}")
+
+        print("\n--- Test 2: Vollständige Ablage nur, wo nötig ---")
+        raw = [row[0] is not None for row in store.conn.execute("SELECT raw_content FROM snapshots ORDER BY snapshot_id")]
+        check(raw == [False, True, True, False], "Nur die beiden abweichenden Dateien sind vollständig abgelegt.",
+              f"raw_content je Version: {raw}")
+
+    except Exception as e:
+        print(f"\nEin unerwarteter Fehler ist während der Tests aufgetreten: {e}")
+    finally:
+        if store:
+            store.close()
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    run_tests()
@@ -1,8 +1,10 @@
 import sqlite3
-import pandas as pd
 import os
 import glob
 import time
+import random
+
+from player_csv import read_players
 
 # ==============================================================================
 # --- KONFIGURATION ---
@@ -43,9 +45,8 @@ def run_tests():
             print(f"❌ FEHLER: Keine CSV-Datei in '{DOWNLOAD_DIR}' gefunden.")
             return
         
-        df_csv_raw = pd.read_csv(latest_csv, sep=';')
-        df_csv = df_csv_raw[df_csv_raw['Marktwert'] != 999000000].copy()
-        print(f"Referenz-CSV für Tests: {os.path.basename(latest_csv)} ({len(df_csv)} gültige Spieler)")
+        players = read_players(latest_csv)
+        print(f"Referenz-CSV für Tests: {os.path.basename(latest_csv)} ({len(players)} gültige Spieler)")
 
         # --- Test 1: Existenz der neuen Saison ---
         print("\n--- Test 1: Wurde die neue Saison angelegt? ---")
@@ -62,7 +63,7 @@ def run_tests():
         print("\n--- Test 2: Stimmt die Anzahl der aktiven Spieler? ---")
         cursor.execute("SELECT COUNT(*) FROM player_seasonal_details WHERE season_id = ? AND is_active = 1", (season_id,))
         active_players_in_db = cursor.fetchone()[0]
-        players_in_csv = len(df_csv)
+        players_in_csv = len(players)
         print(f"Anzahl gültiger Spieler in CSV-Datei: {players_in_csv}")
         print(f"Anzahl als 'aktiv' markierter Spieler in DB: {active_players_in_db}")
         if players_in_csv == active_players_in_db:
@@ -72,15 +73,15 @@ def run_tests():
 
         # --- Test 3: Überprüfung eines Spielers, der die Liga verlassen hat ---
         print("\n--- Test 3: Wurden Spieler, die die Liga verlassen haben, korrekt deaktiviert? ---")
-        # Logik bleibt gleich, da sie auf Pandas DataFrames basiert, die wir sowieso benötigen
-        prev_season_id_df = pd.read_sql("SELECT season_id FROM seasons WHERE season_name = ?", conn, params=(PREVIOUS_SEASON_NAME,))
-        if prev_season_id_df.empty:
+        cursor.execute("SELECT season_id FROM seasons WHERE season_name = ?", (PREVIOUS_SEASON_NAME,))
+        prev_season_res = cursor.fetchone()
+        if prev_season_res is None:
             print("INFO: Vorherige Saison nicht gefunden, Test wird übersprungen.")
         else:
-            prev_season_id = prev_season_id_df.iloc[0, 0]
-            players_last_season_df = pd.read_sql("SELECT player_id FROM player_seasonal_details WHERE season_id = ?", conn, params=(prev_season_id,))
-            players_last_season = set(players_last_season_df['player_id'])
-            players_current_season = set(df_csv['ID'])
+            prev_season_id = prev_season_res[0]
+            cursor.execute("SELECT player_id FROM player_seasonal_details WHERE season_id = ?", (prev_season_id,))
+            players_last_season = {row[0] for row in cursor.fetchall()}
+            players_current_season = {p.player_id for p in players}
             leavers = players_last_season - players_current_season
             
             if not leavers:
@@ -99,14 +100,14 @@ def run_tests():
 
         # --- Test 4: Marktwert-Stichprobe ---
         print("\n--- Test 4: Stimmt der Marktwert eines zufälligen Spielers? ---")
-        if df_csv.empty:
+        if not players:
             print("INFO: Keine gültigen Spieler in der CSV, Test wird übersprungen.")
         else:
-            random_player_csv = df_csv.sample(1).iloc[0]
-            player_id = random_player_csv['ID']
-            market_value_csv = int(random_player_csv['Marktwert'])
+            random_player_csv = random.choice(players)
+            player_id = random_player_csv.player_id
+            market_value_csv = random_player_csv.market_value
             
-            print(f"Teste mit Spieler '{random_player_csv['Angezeigter Name']}' (ID: {player_id})")
+            print(f"Teste mit Spieler '{random_player_csv.display_name}' (ID: {player_id})")
             print(f"Marktwert laut CSV: {market_value_csv}")
 
             cursor.execute("SELECT market_value FROM player_seasonal_details WHERE player_id = ? AND season_id = ?", (player_id, season_id))
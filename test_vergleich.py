@@ -0,0 +1,78 @@
+import os
+import shutil
+import tempfile
+
+from vergleich_neu import load_snapshots, diff_snapshots
+
+# ==============================================================================
+# --- KONFIGURATION ---
+# ==============================================================================
+HEADER = "ID;Vorname;Nachname;Verein;Position;Marktwert;Punkte"
+# ==============================================================================
+
+
+def check(condition, success, failure):
+    print(f"✅ ERFOLG: {success}" if condition else f"❌ FEHLER: {failure}")
+    return condition
+
+
+def write_snapshot(directory, name, rows, trailing_newline=True):
+    path = os.path.join(directory, name)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join([HEADER] + rows) + ("\n" if trailing_newline else ""))
+    return path
+
+
+def changes_of(paths):
+    changes = diff_snapshots(load_snapshots(paths), len(paths))
+    return sorted((int(r.von), int(r.bis), r.ID, r.Änderungstyp, r.Feld if isinstance(r.Feld, str) else None)
+                  for r in changes.itertuples())
+
+
+def run_tests():
+    """Prüft die Zuordnung der Zeilen zu den Snapshots in vergleich_neu.load_snapshots."""
+    print("Starte Tests für vergleich_neu.py...")
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        a = write_snapshot(tmp_dir, "a.csv", ["1;Max;Muster;FCB;FORWARD;100;0", "2;Tom;Test;BVB;DEFENDER;200;0"])
+        empty = write_snapshot(tmp_dir, "b.csv", [])
+        c = write_snapshot(tmp_dir, "c.csv", ["", "1;Max;Muster;FCB;FORWARD;100;0", "2;Tom;Test;BVB;DEFENDER;300;0", ""])
+
+        print("\n--- Test 1: Datei nur mit Kopfzeile zwischen zwei Snapshots ---")
+        df = load_snapshots([a, empty, c])
+        check(sorted(df["snap"].tolist()) == [0, 0, 2, 2], "Zeilen von c gehören zu Snapshot 2, b liefert keine Zeilen.",
+              f"Snapshot-Nummern: {df['snap'].tolist()}")
+        expected = [(0, 1, 1, "Entfernt", None), (0, 1, 2, "Entfernt", None),
+                    (1, 2, 1, "Hinzugefügt", None), (1, 2, 2, "Hinzugefügt", None)]
+        found = changes_of([a, empty, c])
+        check(found == expected, "Alle Spieler fehlen in b und kommen in c zurück.", f"Änderungen: {found}")
+
+        print("\n--- Test 2: Leere Zeilen und fehlender Zeilenumbruch am Ende ---")
+        no_newline = write_snapshot(tmp_dir, "d.csv", ["1;Max;Muster;FCB;FORWARD;100;5"], trailing_newline=False)
+        found = changes_of([a, c, no_newline])
+        expected = [(0, 1, 2, "Geändert", "Marktwert"), (1, 2, 1, "Geändert", "Punkte"), (1, 2, 2, "Entfernt", None)]
+        check(found == expected, "Marktwertänderung 200 -> 300 erkannt, letzte Datei ohne Zeilenumbruch gelesen.",
+              f"Änderungen: {found}")
+        header_only = write_snapshot(tmp_dir, "e.csv", [], trailing_newline=False)
+        df = load_snapshots([a, header_only])
+        check(sorted(df["snap"].tolist()) == [0, 0], "Kopfzeile ohne Zeilenumbruch liefert keine Zeilen.",
+              f"Snapshot-Nummern: {df['snap'].tolist()}")
+
+        print("\n--- Test 3: Datei mit abweichender Kopfzeile ---")
+        other = os.path.join(tmp_dir, "f.csv")
+        with open(other, "w", encoding="utf-8") as f:
+            f.write(HEADER.replace("Marktwert;Punkte", "Punkte;Marktwert") + "\n1;Max;Muster;FCB;FORWARD;0;100\n")
+        try:
+            load_snapshots([a, other])
+            check(False, "", "Abweichende Kopfzeile wurde nicht erkannt.")
+        except ValueError as e:
+            check(True, f"Abweichende Kopfzeile abgelehnt: {e}", "")
+
+    except Exception as e:
+        print(f"\nEin unerwarteter Fehler ist während der Tests aufgetreten: {e}")
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    run_tests()
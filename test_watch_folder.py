@@ -0,0 +1,208 @@
+import os
+import glob
+import time
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+import functools
+
+import autodownload
+import db_utils
+import watch_folder
+from schema import apply_migrations
+from snapshot_store import SnapshotStore
+from value_history import csv_timestamp, format_timestamp
+from test_ingest import REFERENCE_DB_PATH, ARCHIVE_DIR, REPLAY_SEASON_NAME, REPLAY_FROM, STATS_QUERY, remove_season
+
+# ==============================================================================
+# --- KONFIGURATION ---
+# ==============================================================================
+# Diese Anzahl Dateien liegt schon vor dem Start im Ordner, der Rest kommt während des Laufs
+FILES_BEFORE_START = 3
+# Höchstens so lange (Sekunden) auf die Verarbeitung warten
+WAIT_LIMIT = 60
+# ==============================================================================
+
+
+def check(condition, success, failure):
+    print(f"✅ ERFOLG: {success}" if condition else f"❌ FEHLER: {failure}")
+    return condition
+
+
+def drop_file(source, directory):
+    """Legt eine Datei so ab wie autodownload.py: erst schreiben, dann umbenennen."""
+    temp_path = os.path.join(directory, "temp.csv")
+    shutil.copy(source, temp_path)
+    os.rename(temp_path, os.path.join(directory, os.path.basename(source)))
+
+
+def wait_for_jobs(db_path, count):
+    """Wartet, bis count Jobs abgeschlossen sind. Gibt die Wartezeit zurück (oder None)."""
+    start = time.perf_counter()
+    while time.perf_counter() - start < WAIT_LIMIT:
+        conn = sqlite3.connect(db_path)
+        try:
+            done = conn.execute("SELECT COUNT(*) FROM ingest_jobs WHERE status != 'pending'").fetchone()[0]
+        except sqlite3.OperationalError:
+            done = 0
+        conn.close()
+        if done >= count:
+            return time.perf_counter() - start
+        time.sleep(0.1)
+    return None
+
+
+def start_watcher(db_path, directories):
+    stop = threading.Event()
+    thread = threading.Thread(target=watch_folder.run, args=(db_path, directories, None, 1, stop))
+    thread.start()
+    return stop, thread
+
+
+def run_tests():
+    """Prüft den inotify-Watcher: jede Datei genau einmal, in zeitlicher Reihenfolge, danach in done/."""
+    print("Starte Tests für watch_folder.py...")
+    directory = tempfile.mkdtemp()
+    stop, thread = None, None
+    try:
+        db_path = os.path.join(directory, "watch.db")
+        download_dir = os.path.join(directory, "autodownload")
+        process_dir = os.path.join(directory, "process_gameday")
+        for path in (download_dir, process_dir):
+            os.makedirs(path)
+        shutil.copy(REFERENCE_DB_PATH, db_path)
+        remove_season(db_path, REPLAY_SEASON_NAME)
+        watch_folder.backup_database = functools.partial(db_utils.backup_database, backup_dir=os.path.join(directory, "backups"))
+        watch_folder.publish_snapshot = functools.partial(db_utils.publish_snapshot, publish_dir=os.path.join(directory, "published"))
+        files = [path for path in sorted(glob.glob(os.path.join(ARCHIVE_DIR, "data_*.csv")))
+                 if os.path.basename(path) >= f"data_{REPLAY_FROM:%Y-%m-%d}"]
+
+        print(f"\n--- Test 1: {FILES_BEFORE_START} Dateien liegen schon vor dem Start bereit ---")
+        for path in files[:FILES_BEFORE_START]:
+            shutil.copy(path, download_dir)
+        stop, thread = start_watcher(db_path, [download_dir, process_dir])
+        check(wait_for_jobs(db_path, FILES_BEFORE_START) is not None,
+              "Bestand beim Start verarbeitet.", "Bestand wurde nicht verarbeitet.")
+
+        print(f"\n--- Test 2: {len(files) - FILES_BEFORE_START} Dateien kommen in zufälliger Reihenfolge an ---")
+        remaining = files[FILES_BEFORE_START:]
+        random.seed(1)
+        random.shuffle(remaining)
+        for i, path in enumerate(remaining):
+            drop_file(path, process_dir if i % 5 == 0 else download_dir)
+        latency = wait_for_jobs(db_path, len(files))
+        check(latency is not None, f"Alle Dateien nach {latency or 0:.1f} s verarbeitet (ohne Ordner-Scan).",
+              "Nicht alle Dateien wurden verarbeitet.")
+
+        conn = sqlite3.connect(db_path)
+        # Die Reihenfolge zeigt sich an den Gesamtpunkteständen unten (falsche Reihenfolge = falsche Spieltage)
+        logged = sorted(row[0] for row in conn.execute("SELECT taken_at FROM ingest_log"))
+        expected = sorted(format_timestamp(csv_timestamp(path)) for path in files)
+        check(logged == expected, f"{len(logged)} Snapshots genau einmal übernommen.",
+              f"{len(logged)} Einträge im Protokoll bei {len(files)} Dateien.")
+        left = glob.glob(os.path.join(download_dir, "data_*.csv")) + glob.glob(os.path.join(process_dir, "data_*.csv"))
+        moved = glob.glob(os.path.join(download_dir, "done", "*.csv")) + glob.glob(os.path.join(process_dir, "done", "*.csv"))
+        check(not left and len(moved) == len(files), "Alle Dateien nach done/ verschoben.",
+              f"{len(left)} Dateien liegen noch im Ordner, {len(moved)} in done/.")
+
+        ours = {(gd, pid): total for gd, pid, total in conn.execute(STATS_QUERY, (REPLAY_SEASON_NAME,))}
+        reference_conn = sqlite3.connect(f"file:{REFERENCE_DB_PATH}?mode=ro", uri=True)
+        theirs = {(gd, pid): total for gd, pid, total in reference_conn.execute(STATS_QUERY, (REPLAY_SEASON_NAME,))}
+        reference_conn.close()
+        common = ours.keys() & theirs.keys()
+        differing = sum(1 for key in common if ours[key] != theirs[key])
+        check(len(common) > 500 and differing == 0, f"Spieltag 1: {len(common)} Gesamtpunktestände wie in der Hauptdatenbank.",
+              f"{differing} von {len(common)} Gesamtpunkteständen weichen ab.")
+
+        print("\n--- Test 3: Erneut abgelegte Datei wird nicht doppelt verarbeitet ---")
+        drop_file(files[-1], download_dir)
+        time.sleep(watch_folder.SETTLE_SECONDS + 1)
+        logged = conn.execute("SELECT COUNT(*) FROM ingest_log").fetchone()[0]
+        check(logged == len(files) and not glob.glob(os.path.join(download_dir, "data_*.csv")),
+              "Datei nur verschoben, kein zweiter Import.", f"{logged} Einträge im Protokoll.")
+        conn.close()
+
+        print("\n--- Test 4: Datei verarbeitet, aber vor dem Verschieben abgebrochen ---")
+        stop.set()
+        thread.join()
+        shutil.copy(files[-1], download_dir)
+        stop, thread = start_watcher(db_path, [download_dir, process_dir])
+        time.sleep(watch_folder.SETTLE_SECONDS + 1)
+        conn = sqlite3.connect(db_path)
+        logged = conn.execute("SELECT COUNT(*) FROM ingest_log").fetchone()[0]
+        conn.close()
+        check(logged == len(files) and not glob.glob(os.path.join(download_dir, "data_*.csv")),
+              "Beim Neustart nur das Verschieben nachgeholt.", f"{logged} Einträge im Protokoll.")
+
+        print("\n--- Test 5: Zweite Datei kommt an, bevor die erste verarbeitet ist ---")
+        stop.set()
+        thread.join()
+        stop = None
+        pruned_db_path = os.path.join(directory, "watch_pruned.db")
+        shutil.copy(REFERENCE_DB_PATH, pruned_db_path)
+        remove_season(pruned_db_path, REPLAY_SEASON_NAME)
+        feed_dir = os.path.join(directory, "autodownload_feed")
+        os.makedirs(os.path.join(feed_dir, watch_folder.DONE_SUBDIR))
+        conn = db_utils.get_db_connection(pruned_db_path)
+        apply_migrations(conn)
+        # Wie autodownload.py: erst in den Delta-Speicher, dann ablegen, dann aufräumen
+        store = SnapshotStore(os.path.join(feed_dir, autodownload.STORE_FILE))
+        queued = []
+        for source in files[:2]:
+            with open(source, "rb") as f:
+                store.add(csv_timestamp(source), f.read())
+            drop_file(source, feed_dir)
+            queued.append(os.path.join(feed_dir, os.path.basename(source)))
+            watch_folder.enqueue(conn, queued[-1])
+            autodownload.prune_csv_files(feed_dir)
+        store.close()
+        check(not os.path.exists(queued[0]), "Erste Datei vor der Verarbeitung aufgeräumt.", "Erste Datei liegt noch im Ordner.")
+        watch_folder.process_pending(conn, pruned_db_path, None, 1)
+        statuses = [row[0] for row in conn.execute("SELECT status FROM ingest_jobs ORDER BY taken_at")]
+        logged = conn.execute("SELECT COUNT(*) FROM ingest_log").fetchone()[0]
+        conn.close()
+        check(statuses == ['done', 'done'] and logged == 2,
+              "Aufgeräumte Datei aus dem Delta-Speicher verarbeitet, beide Snapshots genau einmal übernommen.",
+              f"Jobs: {statuses}, {logged} Einträge im Protokoll.")
+
+        print("\n--- Test 6: Überlauf der inotify-Warteschlange ---")
+        with watch_folder.Inotify() as inotify:
+            inotify.add_watch(feed_dir)
+            read_fd, write_fd = os.pipe()
+            os.close(inotify.fd)
+            inotify.fd = read_fd
+            os.write(write_fd, watch_folder.EVENT_HEADER.pack(-1, watch_folder.IN_Q_OVERFLOW, 0, 0))
+            os.close(write_fd)
+            result = inotify.read(1)
+        check(result == ([], True), "Überlauf (wd = -1) wird erkannt.", f"read() lieferte {result}.")
+
+        class LossyInotify(watch_folder.Inotify):
+            """Verliert alle Ereignisse und meldet stattdessen einen Überlauf."""
+            def read(self, timeout):
+                paths, overflow = super().read(timeout)
+                return [], overflow or bool(paths)
+
+        watch_folder.Inotify = LossyInotify
+        stop, thread = start_watcher(pruned_db_path, [feed_dir])
+        time.sleep(watch_folder.SETTLE_SECONDS)
+        drop_file(files[2], feed_dir)
+        waited = wait_for_jobs(pruned_db_path, 3)
+        conn = sqlite3.connect(pruned_db_path)
+        logged = conn.execute("SELECT COUNT(*) FROM ingest_log").fetchone()[0]
+        conn.close()
+        check(waited is not None and logged == 3, "Nach dem Überlauf wurde der Ordner neu gelesen und die Datei übernommen.",
+              f"{logged} Einträge im Protokoll, Datei nicht verarbeitet.")
+
+    except Exception as e:
+        print(f"\nEin unerwarteter Fehler ist während der Tests aufgetreten: {e}")
+    finally:
+        if stop:
+            stop.set()
+            thread.join()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    run_tests()
@@ -1,8 +1,14 @@
 import sqlite3
-import pandas as pd
 import os
 import glob
-import shutil
+
+from player_csv import read_players
+from db_utils import get_db_connection, write_transaction, checkpoint, backup_database, publish_snapshot
+from details_history import record_details_history
+from lookups import lookup_maps
+from schema import apply_migrations
+from season_totals import refresh_efficiency
+from value_history import csv_timestamp, record_value_changes
 
 # ==============================================================================
 # --- KONFIGURATION ---
@@ -14,56 +20,111 @@ DB_PATH = os.path.join(SCRIPT_DIR, "kicker_main.db")
 DOWNLOAD_DIR = os.path.join(SCRIPT_DIR, "autodownload")
 # ==============================================================================
 
-def get_db_connection(path):
-    try:
-        conn = sqlite3.connect(path, timeout=10)
-        conn.row_factory = sqlite3.Row
-        return conn
-    except sqlite3.Error as e:
-        print(f"Fehler beim Verbinden mit der Datenbank unter {path}: {e}")
-        return None
-
 def find_latest_csv(directory):
     search_pattern = os.path.join(directory, 'data_*.csv')
     files = glob.glob(search_pattern)
     return max(files, key=os.path.getctime) if files else None
 
-def get_current_state(conn, season_id):
-    """Holt den aktuellen Stand der Spielerdaten für die Saison aus der DB."""
-    if not season_id:
-        return {}
-    query = "SELECT player_id, club, position FROM player_seasonal_details WHERE season_id = ? AND is_active = 1"
-    df = pd.read_sql_query(query, conn, params=(season_id,))
-    return {row['player_id']: {'club': row['club'], 'position': row['position']} for _, row in df.iterrows()}
+def load_csv_staging(conn, players):
+    """
+    Lädt die gültigen CSV-Zeilen (player_csv.PlayerRow) per executemany in eine TEMP-Staging-Tabelle.
+    Verein und Position werden dabei über die Nachschlagetabellen in IDs übersetzt (lookups.py).
+    """
+    club_id, position_id = lookup_maps(conn)
+    conn.execute("DROP TABLE IF EXISTS temp.csv_staging")
+    conn.execute("""
+        CREATE TEMP TABLE csv_staging (
+            player_id TEXT PRIMARY KEY,
+            first_name TEXT,
+            last_name TEXT,
+            short_name TEXT,
+            display_name TEXT,
+            club_id INTEGER,
+            position_id INTEGER,
+            market_value INTEGER
+        )
+    """)
+    # Bei doppelten IDs gewinnt (wie bisher) die letzte Zeile der CSV
+    conn.executemany("INSERT OR REPLACE INTO csv_staging VALUES (?, ?, ?, ?, ?, ?, ?, ?)", [
+        (p.player_id, p.first_name, p.last_name, p.short_name, p.display_name, club_id(p.club), position_id(p.position), p.market_value)
+        for p in players
+    ])
+
+def apply_master_data(conn, season_id):
+    """
+    Überträgt die Staging-Tabelle mit wenigen mengenbasierten Statements in die
+    Stammdaten und liefert die Änderungs-Zusammenfassung zurück.
+    """
+    cursor = conn.cursor()
+
+    # Zusammenfassung gegen den Stand VOR dem Update (nur aktive Spieler der Saison)
+    cursor.execute("""
+        WITH active AS (
+            SELECT player_id, club_id, position_id FROM player_seasonal_details
+            WHERE season_id = ? AND is_active = 1
+        )
+        SELECT
+            (SELECT COUNT(*) FROM csv_staging) AS csv_players,
+            (SELECT COUNT(*) FROM csv_staging s WHERE s.player_id NOT IN (SELECT player_id FROM active)) AS new_players,
+            (SELECT COUNT(*) FROM csv_staging s JOIN active a ON a.player_id = s.player_id
+              WHERE a.club_id IS NOT s.club_id OR a.position_id IS NOT s.position_id) AS changed_players,
+            (SELECT COUNT(*) FROM active a WHERE a.player_id NOT IN (SELECT player_id FROM csv_staging)) AS deactivated_players
+    """, (season_id,))
+    summary = dict(cursor.fetchone())
+
+    # Vor- und Nachname bleiben wie beim ersten Import, die angezeigten Namen folgen der CSV
+    # (nur bei Änderung, damit der Suchindex player_search nicht unnötig neu geschrieben wird)
+    cursor.execute("""
+        INSERT INTO players (player_id, first_name, last_name, short_name, display_name)
+        SELECT player_id, first_name, last_name, short_name, display_name FROM csv_staging WHERE true
+        ON CONFLICT(player_id) DO UPDATE SET
+            short_name = excluded.short_name, display_name = excluded.display_name
+        WHERE players.short_name IS NOT excluded.short_name OR players.display_name IS NOT excluded.display_name
+    """)
+
+    cursor.execute("""
+        UPDATE player_seasonal_details SET is_active = 0
+        WHERE season_id = ? AND player_id NOT IN (SELECT player_id FROM csv_staging)
+    """, (season_id,))
+
+    cursor.execute("""
+        INSERT INTO player_seasonal_details (player_id, season_id, club_id, position_id, market_value, is_active)
+        SELECT player_id, ?, club_id, position_id, market_value, 1 FROM csv_staging WHERE true
+        ON CONFLICT(player_id, season_id) DO UPDATE SET
+            club_id = excluded.club_id, position_id = excluded.position_id, market_value = excluded.market_value, is_active = 1
+    """, (season_id,))
+
+    conn.execute("DROP TABLE temp.csv_staging")
+    return summary
 
 def main():
     print("Starte Skript zur Aktualisierung der Spieler-Stammdaten...")
     
-    DB_TEMP_PATH = DB_PATH + ".tmp"
     if not os.path.exists(DB_PATH):
         print(f"Fehler: Original-Datenbank '{DB_PATH}' nicht gefunden.")
         return
-    shutil.copy2(DB_PATH, DB_TEMP_PATH)
     
-    conn = get_db_connection(DB_TEMP_PATH)
+    conn = get_db_connection(DB_PATH)
     if not conn: return
 
     try:
+        apply_migrations(conn)
+
         csv_path = find_latest_csv(DOWNLOAD_DIR)
         if not csv_path:
             raise FileNotFoundError(f"Keine CSV-Datei im Verzeichnis '{DOWNLOAD_DIR}' gefunden.")
         
         print(f"INFO: Verwendete CSV-Datei: {os.path.basename(csv_path)}")
         
-        df_csv_raw = pd.read_csv(csv_path, sep=';')
-        print(f"INFO: CSV enthält insgesamt {len(df_csv_raw)} Spieler.")
-        
-        df_csv = df_csv_raw[df_csv_raw['Marktwert'] != 999000000].copy()
-        print(f"INFO: {len(df_csv_raw) - len(df_csv)} Spieler mit Platzhalter-Marktwert werden ignoriert.")
-        
-        df_csv['Marktwert'] = pd.to_numeric(df_csv['Marktwert'], errors='coerce').fillna(0).astype(int)
+        players = read_players(csv_path)
+        print(f"INFO: CSV enthält {len(players)} gültige Spieler (Platzhalter-Marktwerte werden ignoriert).")
         
-        with conn:
+        backup_path = backup_database(DB_PATH)
+        if backup_path:
+            print(f"INFO: Sicherung erstellt: {os.path.basename(backup_path)}")
+
+        # Alle Schreibvorgänge in einer einzigen Transaktion direkt auf der Live-Datenbank
+        with write_transaction(conn):
             cursor = conn.cursor()
             
             cursor.execute("SELECT season_id FROM seasons WHERE season_name = ?", (CURRENT_SEASON_NAME,))
@@ -73,55 +134,39 @@ def main():
                 cursor.execute("INSERT INTO seasons (season_name) VALUES (?)", (CURRENT_SEASON_NAME,))
                 season_id = cursor.lastrowid
 
-            state_before = get_current_state(conn, season_id)
-            ids_before = set(state_before.keys())
-            ids_csv = set(df_csv['ID'])
-
-            cursor.execute("UPDATE player_seasonal_details SET is_active = 0 WHERE season_id = ?", (season_id,))
-            
-            changed_club_or_pos = 0
-            for _, row in df_csv.iterrows():
-                player_id = row['ID']
-                
-                if player_id in state_before:
-                    if (state_before[player_id]['club'] != row['Verein'] or
-                        state_before[player_id]['position'] != row['Position']):
-                        changed_club_or_pos += 1
-                
-                cursor.execute("INSERT OR IGNORE INTO players (player_id, first_name, last_name) VALUES (?, ?, ?)", (row['ID'], row['Vorname'], row['Nachname']))
-                
-                cursor.execute("""
-                    INSERT INTO player_seasonal_details (player_id, season_id, club, position, market_value, is_active)
-                    VALUES (?, ?, ?, ?, ?, 1)
-                    ON CONFLICT(player_id, season_id) DO UPDATE SET
-                        club = excluded.club, position = excluded.position, market_value = excluded.market_value, is_active = 1;
-                """, (row['ID'], season_id, row['Verein'], row['Position'], row['Marktwert']))
-
-            newly_added_players = len(ids_csv - ids_before)
-            deactivated_players = len(ids_before - ids_csv)
+            load_csv_staging(conn, players)
+            summary = apply_master_data(conn, season_id)
+            # Geänderte Marktwerte in die Effizienz der Saison-Summen übernehmen
+            refresh_efficiency(conn, season_id)
+            history_rows = record_value_changes(conn, season_id, csv_timestamp(csv_path))
+            interval_rows = record_details_history(conn, season_id)
 
             print("\n--- Update-Zusammenfassung ---")
             print(f"Verarbeitete Saison: {CURRENT_SEASON_NAME}")
-            print(f"Anzahl gültiger Spieler in CSV: {len(ids_csv)}")
+            print(f"Anzahl gültiger Spieler in CSV: {summary['csv_players']}")
             print("-" * 30)
-            print(f"✅ Neu hinzugefügte Spieler: {newly_added_players}")
-            print(f"🔄 Spieler mit Vereins- oder Positionswechsel: {changed_club_or_pos}")
-            print(f"❌ Deaktivierte Spieler (Liga verlassen): {deactivated_players}")
+            print(f"✅ Neu hinzugefügte Spieler: {summary['new_players']}")
+            print(f"🔄 Spieler mit Vereins- oder Positionswechsel: {summary['changed_players']}")
+            print(f"❌ Deaktivierte Spieler (Liga verlassen): {summary['deactivated_players']}")
+            print(f"📈 Neue Einträge in der Marktwert-Historie: {history_rows}")
+            print(f"🗓️ Neue Stammdaten-Intervalle (gültig ab dem nächsten Spieltag): {interval_rows}")
             print("-" * 30)
             print("INFO: Es wurde nur eine Stammdaten-Aktualisierung durchgeführt.")
             print("INFO: Es wurden keine Spieltagspunkte berechnet oder gespeichert.")
             print("--- Ende der Zusammenfassung ---\n")
 
+        checkpoint(conn)
         conn.close()
-        os.replace(DB_TEMP_PATH, DB_PATH)
         print("Datenbank erfolgreich aktualisiert.")
+        snapshot_path = publish_snapshot(DB_PATH)
+        if snapshot_path:
+            print(f"INFO: Snapshot für die App veröffentlicht: {os.path.basename(snapshot_path)}")
 
     except (sqlite3.Error, FileNotFoundError, Exception) as e:
         print(f"\n--- FEHLER! ---")
         print(f"Ein Fehler ist aufgetreten: {e}")
-        print("Das Update wurde abgebrochen. Die Original-Datenbank wurde nicht verändert.")
-        if conn: conn.close()
-        if os.path.exists(DB_TEMP_PATH): os.remove(DB_TEMP_PATH)
+        print("Das Update wurde abgebrochen. Die Transaktion wurde zurückgerollt, die Datenbank ist unverändert.")
+        conn.close()
 
 if __name__ == "__main__":
     main()
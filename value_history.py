@@ -0,0 +1,85 @@
+import os
+from datetime import datetime
+
+from snapshot_store import SNAPSHOT_PATTERN, TIMESTAMP_FORMAT
+
+# ==============================================================================
+# Änderungshistorie von Marktwert, Verein und Position (player_value_history)
+# ==============================================================================
+# Die Tabelle wird nur fortgeschrieben: Eine neue Zeile entsteht ausschließlich,
+# wenn sich Marktwert, Verein, Position oder Saison eines Spielers gegenüber seinem
+# letzten Eintrag ändern (lauflängenkodiert). Eine Zeile gilt ab valid_from bis zum
+# nächsten Eintrag desselben Spielers. Der Primärschlüssel (player_id, valid_from)
+# dient zugleich als Index für Abfragen "Stand zum Zeitpunkt X".
+
+# Parameter: valid_from, season_id, valid_from
+RECORD_CHANGES_SQL = """
+    INSERT INTO player_value_history (player_id, valid_from, season_id, club_id, position_id, market_value)
+    SELECT psd.player_id, ?, psd.season_id, psd.club_id, psd.position_id, psd.market_value
+    FROM player_seasonal_details psd
+    LEFT JOIN player_value_history h
+        ON h.player_id = psd.player_id
+       AND h.valid_from = (SELECT MAX(valid_from) FROM player_value_history WHERE player_id = psd.player_id)
+    WHERE psd.season_id = ? AND psd.is_active = 1
+      AND (h.player_id IS NULL
+           OR (h.valid_from < ? AND (h.season_id IS NOT psd.season_id OR h.club_id IS NOT psd.club_id
+                                     OR h.position_id IS NOT psd.position_id OR h.market_value IS NOT psd.market_value)))
+"""
+
+# Parameter: player_id, Zeitpunkt
+VALUE_AS_OF_QUERY = """
+    SELECT h.valid_from, h.season_id, c.name AS club, p.name AS position, h.market_value
+    FROM player_value_history h
+    LEFT JOIN clubs c ON c.club_id = h.club_id
+    LEFT JOIN positions p ON p.position_id = h.position_id
+    WHERE h.player_id = ? AND h.valid_from <= ?
+    ORDER BY h.valid_from DESC
+    LIMIT 1
+"""
+
+# Parameter: Zeitpunkt
+VALUES_AS_OF_QUERY = """
+    SELECT h.player_id, h.valid_from, h.season_id, c.name AS club, p.name AS position, h.market_value
+    FROM player_value_history h
+    LEFT JOIN clubs c ON c.club_id = h.club_id
+    LEFT JOIN positions p ON p.position_id = h.position_id
+    WHERE h.valid_from = (SELECT MAX(valid_from) FROM player_value_history
+                          WHERE player_id = h.player_id AND valid_from <= ?)
+"""
+
+
+def format_timestamp(timestamp):
+    return timestamp.isoformat(sep=" ", timespec="seconds")
+
+
+def csv_timestamp(csv_path):
+    """Zeitpunkt einer heruntergeladenen CSV (aus dem Dateinamen, sonst Änderungsdatum)."""
+    match = SNAPSHOT_PATTERN.search(os.path.basename(csv_path))
+    if match:
+        return datetime.strptime(match.group(1), TIMESTAMP_FORMAT)
+    return datetime.fromtimestamp(os.path.getmtime(csv_path))
+
+
+def season_start(season_name):
+    """Beginn einer Saison ('2024/2025' -> 01.07.2024), für Einträge ohne genauen Zeitpunkt."""
+    return datetime(int(season_name.split("/")[0]), 7, 1)
+
+
+def record_value_changes(conn, season_id, valid_from):
+    """
+    Schreibt für alle aktiven Spieler der Saison eine Zeile, deren Stammdaten sich seit
+    dem letzten Eintrag geändert haben. Läuft in der Transaktion des Stammdaten-Imports.
+    Gibt die Anzahl der neuen Zeilen zurück.
+    """
+    ts = format_timestamp(valid_from)
+    return conn.execute(RECORD_CHANGES_SQL, (ts, season_id, ts)).rowcount
+
+
+def value_as_of(conn, player_id, timestamp):
+    """Stand eines Spielers zum Zeitpunkt timestamp (oder None)."""
+    return conn.execute(VALUE_AS_OF_QUERY, (player_id, format_timestamp(timestamp))).fetchone()
+
+
+def values_as_of(conn, timestamp):
+    """Stand aller Spieler zum Zeitpunkt timestamp."""
+    return conn.execute(VALUES_AS_OF_QUERY, (format_timestamp(timestamp),)).fetchall()
@@ -1,58 +1,169 @@
+import os
+import io
+import re
+import glob
+import time
+import argparse
+
+import numpy as np
 import pandas as pd
 
-# CSV-Dateien laden mit korrektem Separator
-original_file = "autodownload/data_2025-01-07_10-17-02.csv"  # Ursprungsdatenstand
-updated_file = "autodownload/data_2025-01-07_13-17-02.csv"   # Veränderte Daten
-
-# CSV-Dateien einlesen und sicherstellen, dass sie semicolon-getrennt sind
-df_original = pd.read_csv(original_file, sep=';')
-df_updated = pd.read_csv(updated_file, sep=';')
-
-# Spaltennamen bereinigen (z. B. Leerzeichen entfernen)
-df_original.columns = df_original.columns.str.strip()
-df_updated.columns = df_updated.columns.str.strip()
-
-# Spaltennamen prüfen
-if "ID" not in df_original.columns or "ID" not in df_updated.columns:
-    raise KeyError("Die Spalte 'ID' wurde in den Dateien nicht gefunden. Verfügbare Spalten sind:"
-                   f"\nOriginal: {df_original.columns}\nUpdate: {df_updated.columns}")
-
-# Vergleichskategorien definieren
-key_field = "ID"  # Primärschlüssel (z. B. Spieler-ID)
-compare_fields = ["Marktwert", "Punkte"]
-
-# Hinzugefügte Zeilen
-added_rows = df_updated[~df_updated[key_field].isin(df_original[key_field])]
-added_rows["Änderungstyp"] = "Hinzugefügt"
-
-# Entfernte Zeilen
-removed_rows = df_original[~df_original[key_field].isin(df_updated[key_field])]
-removed_rows["Änderungstyp"] = "Entfernt"
-
-# Geänderte Zeilen: Schnittmenge nach ID, Unterschiede in Vergleichsfeldern
-common_rows = df_original.merge(df_updated, on=key_field, suffixes=('_old', '_new'))
-changed_rows = common_rows[
-    (common_rows[[f"{field}_old" for field in compare_fields]] !=
-     common_rows[[f"{field}_new" for field in compare_fields]].values).any(axis=1)
-]
-
-# Wenn geänderte Zeilen gefunden, Differenzen berechnen
-if not changed_rows.empty:
-    for field in compare_fields:
-        changed_rows[f"{field}_Differenz"] = changed_rows[f"{field}_new"] - changed_rows[f"{field}_old"]
-    changed_rows["Änderungstyp"] = "Geändert"
-
-# Alle Unterschiede in einer Datei zusammenführen
-differences = pd.concat([added_rows, removed_rows, changed_rows], ignore_index=True)
-
-# Ergebnisse anzeigen
-print("Zusammenfassung der Unterschiede:")
-print(differences)
-
-# Exportiere alle Unterschiede in eine CSV-Datei
-differences.to_csv("alle_unterschiede.csv", index=False)
-
-# Optional: Separate Dateien für jeden Unterschiedstyp exportieren
-#added_rows.to_csv("added_rows.csv", index=False)
-#removed_rows.to_csv("removed_rows.csv", index=False)
-#changed_rows.to_csv("changed_rows.csv", index=False)
+from snapshot_store import SNAPSHOT_PATTERN
+
+# ==============================================================================
+# --- KONFIGURATION ---
+# ==============================================================================
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+ARCHIVE_DIR = os.path.join(SCRIPT_DIR, "dl-backup")
+OUTPUT_FILE = "alle_unterschiede.csv"
+
+# Primärschlüssel und verglichene Felder
+KEY_FIELD = "ID"
+COMPARE_FIELDS = ["Marktwert", "Punkte", "Verein", "Position"]
+NUMERIC_FIELDS = ["Marktwert", "Punkte"]
+# ==============================================================================
+
+# Anfang einer nicht leeren Datenzeile (hier wird die Snapshot-Nummer eingefügt)
+DATA_LINE = re.compile(r"^(?=[^\r\n])", re.MULTILINE)
+
+
+def select_snapshots(directory, von=None, bis=None):
+    """Alle data_*.csv eines Ordners in zeitlicher Reihenfolge, optional auf einen Zeitraum begrenzt."""
+    files = []
+    for path in glob.glob(os.path.join(directory, "data_*.csv")):
+        match = SNAPSHOT_PATTERN.search(os.path.basename(path))
+        if not match:
+            continue
+        stamp = match.group(1)
+        if (von is None or stamp >= von) and (bis is None or stamp <= bis):
+            files.append((stamp, path))
+    return [path for _, path in sorted(files)]
+
+
+def load_snapshots(paths):
+    """
+    Liest alle Snapshots in einen gemeinsamen DataFrame (Spalte 'snap' = Position in der
+    Liste), sortiert nach Spieler-ID und Snapshot. Alle Dateien werden in einem
+    einzigen read_csv eingelesen; jede Datenzeile erhält dazu ihre Snapshot-Nummer
+    als erste Spalte (leere Zeilen und Dateien ohne Daten liefern keine Zeilen). Alle
+    Dateien müssen dieselbe Kopfzeile haben, sonst wird ein ValueError ausgelöst.
+    """
+    buffer = io.StringIO()
+    header = None
+    counts = []
+    for snap, path in enumerate(paths):
+        with open(path, encoding="utf-8") as f:
+            first, _, rest = f.read().partition("\n")
+        header = header or first.strip()
+        if first.strip() != header:
+            raise ValueError(f"Kopfzeile von {path} weicht von der ersten Datei ab: '{first.strip()}' statt '{header}'.")
+        rest, count = DATA_LINE.subn(f"{snap};", rest)
+        buffer.write(rest.rstrip("\n") + "\n" if count else "")
+        counts.append(count)
+    buffer.seek(0)
+
+    columns = ["snap"] + [column.strip() for column in header.split(";")]
+    df = pd.read_csv(buffer, sep=";", names=columns, header=None) if sum(counts) else pd.DataFrame(columns=columns)
+    parsed = np.bincount(df["snap"].to_numpy(dtype=np.int64), minlength=len(paths))
+    if parsed.tolist() != counts:
+        raise ValueError(f"Zeilenzahl je Datei passt nicht: gelesen {parsed.tolist()}, erwartet {counts}.")
+    df = df.drop_duplicates(subset=[KEY_FIELD, "snap"], keep="last")
+    return df.sort_values([KEY_FIELD, "snap"], kind="stable").reset_index(drop=True)
+
+
+def diff_snapshots(df, num_snapshots):
+    """
+    Vergleicht alle aufeinanderfolgenden Snapshot-Paare in einem Durchlauf über die nach
+    ID sortierten Zeilen. Gibt einen Änderungsstrom im Langformat zurück:
+    je Änderung eine Zeile mit Paar (von/bis), ID, Änderungstyp, Feld, Alt, Neu, Differenz.
+    """
+    ids = df[KEY_FIELD].to_numpy()
+    snaps = df["snap"].to_numpy()
+
+    # Vorgänger-Zeile gehört zum selben Spieler und zum direkt vorherigen Snapshot?
+    same_prev = np.zeros(len(df), dtype=bool)
+    same_prev[1:] = (ids[1:] == ids[:-1]) & (snaps[1:] == snaps[:-1] + 1)
+    # Nachfolger-Zeile gehört zum selben Spieler und zum direkt folgenden Snapshot?
+    same_next = np.zeros(len(df), dtype=bool)
+    same_next[:-1] = same_prev[1:]
+
+    names = (df["Vorname"].fillna("") + " " + df["Nachname"].fillna("")).str.strip().to_numpy()
+    parts = []
+
+    added = ~same_prev & (snaps > 0)
+    parts.append(pd.DataFrame({
+        "von": snaps[added] - 1, "bis": snaps[added], KEY_FIELD: ids[added], "Spieler": names[added],
+        "Änderungstyp": "Hinzugefügt", "Feld": None, "Alt": None, "Neu": None,
+    }))
+    removed = ~same_next & (snaps < num_snapshots - 1)
+    parts.append(pd.DataFrame({
+        "von": snaps[removed], "bis": snaps[removed] + 1, KEY_FIELD: ids[removed], "Spieler": names[removed],
+        "Änderungstyp": "Entfernt", "Feld": None, "Alt": None, "Neu": None,
+    }))
+
+    rows = np.flatnonzero(same_prev)
+    for field in COMPARE_FIELDS:
+        values = df[field].to_numpy()
+        old, new = values[rows - 1], values[rows]
+        changed = ~((old == new) | (pd.isna(old) & pd.isna(new)))
+        idx = rows[changed]
+        parts.append(pd.DataFrame({
+            "von": snaps[idx] - 1, "bis": snaps[idx], KEY_FIELD: ids[idx], "Spieler": names[idx],
+            "Änderungstyp": "Geändert", "Feld": field, "Alt": old[changed], "Neu": new[changed],
+        }))
+
+    changes = pd.concat(parts, ignore_index=True)
+    numeric = changes["Feld"].isin(NUMERIC_FIELDS)
+    changes["Differenz"] = np.nan
+    changes.loc[numeric, "Differenz"] = (pd.to_numeric(changes.loc[numeric, "Neu"])
+                                         - pd.to_numeric(changes.loc[numeric, "Alt"]))
+    return changes.sort_values(["bis", KEY_FIELD, "Feld"], kind="stable", na_position="first").reset_index(drop=True)
+
+
+def snapshot_label(path):
+    match = SNAPSHOT_PATTERN.search(os.path.basename(path))
+    return match.group(1) if match else os.path.basename(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vergleicht eine Folge von Snapshots und listet alle Änderungen auf.")
+    parser.add_argument("dateien", nargs="*", help="CSV-Dateien in zeitlicher Reihenfolge (Standard: alle im Archiv).")
+    parser.add_argument("--archiv", default=ARCHIVE_DIR)
+    parser.add_argument("--von", help="Erster Zeitstempel, z.B. 2025-01-01 oder 2025-01-07_10-17-02.")
+    parser.add_argument("--bis", help="Letzter Zeitstempel (einschließlich), z.B. 2025-05-31.")
+    parser.add_argument("--ausgabe", default=OUTPUT_FILE)
+    args = parser.parse_args()
+
+    # Ein reines Datum als --bis schließt den ganzen Tag ein
+    bis = args.bis + "_99" if args.bis and len(args.bis) == 10 else args.bis
+    paths = args.dateien or select_snapshots(args.archiv, args.von, bis)
+    if len(paths) < 2:
+        print("Fehler: Für einen Vergleich werden mindestens zwei Snapshots benötigt.")
+        return
+
+    start = time.perf_counter()
+    try:
+        df = load_snapshots(paths)
+    except ValueError as e:
+        print(f"Fehler: {e}")
+        return
+    t_load = time.perf_counter()
+    changes = diff_snapshots(df, len(paths))
+    t_diff = time.perf_counter()
+
+    labels = np.array([snapshot_label(path) for path in paths])
+    changes["von"] = labels[changes["von"].to_numpy()]
+    changes["bis"] = labels[changes["bis"].to_numpy()]
+    changes.to_csv(args.ausgabe, index=False)
+
+    print(f"Zusammenfassung der Unterschiede ({len(paths)} Snapshots, {len(paths) - 1} Vergleiche):")
+    summary = changes.groupby(["Änderungstyp", "Feld"], dropna=False).size()
+    for (change_type, field), count in summary.items():
+        label = change_type if pd.isna(field) else f"{change_type} ({field})"
+        print(f"  {label:<24}{count:>8}")
+    print(f"\n{len(changes)} Änderungen nach '{args.ausgabe}' geschrieben.")
+    print(f"Einlesen: {(t_load - start) * 1000:.0f} ms, Vergleich: {(t_diff - t_load) * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+import sqlite3
+import os
+import glob
+import time
+import select
+import shutil
+import struct
+import ctypes
+import ctypes.util
+import argparse
+from datetime import datetime
+
+from db_utils import get_db_connection, write_transaction, checkpoint, backup_database, publish_snapshot
+from kickerdb import ingest_snapshot, ingest_source, already_ingested, update_best_teams, LAST_INGESTED_QUERY
+from feeds import STORE_FILE
+from schema import apply_migrations
+from snapshot_store import SNAPSHOT_PATTERN, SnapshotStore
+from value_history import csv_timestamp, format_timestamp
+
+# ==============================================================================
+# --- KONFIGURATION ---
+# ==============================================================================
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DB_PATH = os.path.join(SCRIPT_DIR, "kicker_main.db")
+# Überwachte Ordner; verarbeitete Dateien landen im Unterordner done/
+WATCH_DIRS = [os.path.join(SCRIPT_DIR, "autodownload"), os.path.join(SCRIPT_DIR, "process_gameday")]
+DONE_SUBDIR = "done"
+# Nach dem ersten Ereignis kurz warten, damit gleichzeitig ankommende Dateien
+# gemeinsam und in zeitlicher Reihenfolge verarbeitet werden
+SETTLE_SECONDS = 1.0
+# Wie oft (in Sekunden) ohne Ereignis auf das Beenden geprüft wird
+WAIT_TIMEOUT = 1.0
+# ==============================================================================
+
+# inotify-Ereignisse (linux/inotify.h): Datei fertig geschrieben oder in den Ordner verschoben;
+# IN_Q_OVERFLOW (wd = -1) meldet, dass die Warteschlange des Kernels übergelaufen ist
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_Q_OVERFLOW = 0x00004000
+EVENT_HEADER = struct.Struct("iIII")
+
+
+class Inotify:
+    """Minimale inotify-Anbindung über die libc (nur Linux), ohne zusätzliche Pakete."""
+
+    def __init__(self):
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 fehlgeschlagen")
+        self.watches = {}
+
+    def add_watch(self, directory, mask=IN_CLOSE_WRITE | IN_MOVED_TO):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), mask)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch fehlgeschlagen für '{directory}'")
+        self.watches[wd] = directory
+
+    def read(self, timeout):
+        """
+        Wartet höchstens timeout Sekunden und gibt (Pfade der gemeldeten Dateien, Überlauf)
+        zurück. Nach einem Überlauf fehlen Ereignisse; die Ordner müssen neu gelesen werden.
+        """
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return [], False
+        data = os.read(self.fd, 64 * 1024)
+        paths = []
+        overflow = False
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                overflow = True
+            elif wd in self.watches and name:
+                paths.append(os.path.join(self.watches[wd], os.fsdecode(name)))
+        return paths, overflow
+
+    def close(self):
+        os.close(self.fd)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_snapshot(path):
+    """
+    Inhalt einer Datei der Warteschlange (oder None). autodownload.py lässt nur die neueste
+    CSV im Ordner liegen; eine inzwischen aufgeräumte Datei wird aus dem Delta-Speicher
+    des Ordners wiederhergestellt.
+    """
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        pass
+    store_path = os.path.join(os.path.dirname(path), STORE_FILE)
+    if not os.path.isfile(store_path):
+        return None
+    store = SnapshotStore(store_path)
+    try:
+        timestamp = csv_timestamp(path)
+        if timestamp not in {ts for ts, _, _ in store.list_snapshots()}:
+            return None
+        return store.export_csv(timestamp)
+    finally:
+        store.close()
+
+
+def move_to_done(path):
+    """Verschiebt eine verarbeitete Datei nach done/. Schlägt das fehl, holt der nächste Start es nach."""
+    if not os.path.exists(path):
+        # Bereits aufgeräumt, der Inhalt liegt im Delta-Speicher
+        return
+    try:
+        shutil.move(path, os.path.join(os.path.dirname(path), DONE_SUBDIR, os.path.basename(path)))
+    except OSError as e:
+        print(f"WARNUNG: '{os.path.basename(path)}' konnte nicht nach {DONE_SUBDIR}/ verschoben werden: {e}")
+
+
+def enqueue(conn, path):
+    """
+    Nimmt eine Datei in die Warteschlange auf (einmal je Pfad). Ist sie bereits
+    verarbeitet, aber noch nicht verschoben, wird nur das Verschieben nachgeholt.
+    """
+    if not SNAPSHOT_PATTERN.search(os.path.basename(path)):
+        return
+    if not os.path.isfile(path) and read_snapshot(path) is None:
+        return
+    with write_transaction(conn):
+        conn.execute("""
+            INSERT OR IGNORE INTO ingest_jobs (path, taken_at, status, enqueued_at)
+            VALUES (?, ?, 'pending', ?)
+        """, (path, format_timestamp(csv_timestamp(path)), format_timestamp(datetime.now())))
+    status = conn.execute("SELECT status FROM ingest_jobs WHERE path = ?", (path,)).fetchone()[0]
+    if status == 'done':
+        move_to_done(path)
+
+
+def enqueue_existing(conn, directories):
+    """Übernimmt alle data_*.csv, die in den Ordnern liegen, in die Warteschlange."""
+    for directory in directories:
+        for path in sorted(glob.glob(os.path.join(directory, "data_*.csv"))):
+            enqueue(conn, path)
+
+
+def process_job(conn, path, season_name=None, workers=None):
+    """
+    Verarbeitet eine Datei und markiert den Job in derselben Transaktion als erledigt;
+    danach wird die Datei verschoben. Schlägt die Verarbeitung fehl, bleibt die Datenbank
+    unverändert und der Job wird als 'failed' markiert (falls die Datenbank das zulässt).
+    """
+    timestamp = csv_timestamp(path)
+    taken_at = format_timestamp(timestamp)
+    try:
+        content = read_snapshot(path)
+        if content is None:
+            raise FileNotFoundError(f"'{path}' fehlt, auch im Delta-Speicher ({STORE_FILE}) nicht vorhanden")
+        with write_transaction(conn):
+            source = ingest_source(os.path.dirname(path))
+            last = conn.execute(LAST_INGESTED_QUERY, (source,)).fetchone()[0]
+            if last and taken_at <= last:
+                # Schon über kickerdb.py ingest übernommen oder älter als der letzte Stand dieses Ordners
+                note = f"übersprungen, letzter verarbeiteter Snapshot: {last}"
+                print(f"INFO: {os.path.basename(path)} {note}.")
+            elif already_ingested(conn, timestamp, content):
+                note = "übersprungen, bereits aus einem anderen Ordner übernommen"
+                print(f"INFO: {os.path.basename(path)} {note}.")
+            else:
+                note = None
+                season_id, game_day_number = ingest_snapshot(conn, season_name, timestamp, content, source)
+                if game_day_number is not None:
+                    update_best_teams(conn, {season_id: [game_day_number]}, workers)
+            conn.execute("""
+                UPDATE ingest_jobs SET status = 'done', finished_at = ?, error = ? WHERE path = ?
+            """, (format_timestamp(datetime.now()), note, path))
+    except (sqlite3.Error, OSError, ValueError, KeyError) as e:
+        print(f"FEHLER: {os.path.basename(path)} konnte nicht verarbeitet werden: {e}")
+        try:
+            with write_transaction(conn):
+                conn.execute("UPDATE ingest_jobs SET status = 'failed', finished_at = ?, error = ? WHERE path = ?",
+                             (format_timestamp(datetime.now()), str(e), path))
+        except sqlite3.Error as status_error:
+            # z.B. Datenbank gesperrt: Der Job bleibt 'pending' und wird beim nächsten Durchlauf wiederholt
+            print(f"FEHLER: Status von {os.path.basename(path)} konnte nicht gespeichert werden: {status_error}")
+        return False
+    move_to_done(path)
+    return True
+
+
+def process_pending(conn, db_path, season_name=None, workers=None):
+    """Arbeitet alle offenen Jobs in zeitlicher Reihenfolge ab. Gibt die Anzahl der Jobs zurück."""
+    pending = [row[0] for row in conn.execute(
+        "SELECT path FROM ingest_jobs WHERE status = 'pending' ORDER BY taken_at, path")]
+    if not pending:
+        return 0
+    backup_path = backup_database(db_path)
+    if backup_path:
+        print(f"INFO: Sicherung erstellt: {os.path.basename(backup_path)}")
+    for path in pending:
+        process_job(conn, path, season_name, workers)
+    checkpoint(conn)
+    snapshot_path = publish_snapshot(db_path)
+    if snapshot_path:
+        print(f"INFO: Snapshot für die App veröffentlicht: {os.path.basename(snapshot_path)}")
+    return len(pending)
+
+
+def run(db_path=DB_PATH, directories=WATCH_DIRS, season_name=None, workers=None, stop_event=None):
+    """
+    Überwacht die Ordner per inotify und verarbeitet jede neue data_*.csv genau einmal.
+    Beim Start und nach einem Überlauf der inotify-Warteschlange werden die in den Ordnern
+    liegenden Dateien in die Warteschlange übernommen.
+    stop_event (threading.Event) beendet die Schleife (für Tests).
+    """
+    conn = get_db_connection(db_path)
+    if not conn:
+        return
+    try:
+        apply_migrations(conn)
+        with Inotify() as inotify:
+            # Erst beobachten, dann den Bestand übernehmen, damit keine Datei dazwischen fehlt
+            for directory in directories:
+                os.makedirs(os.path.join(directory, DONE_SUBDIR), exist_ok=True)
+                inotify.add_watch(directory)
+            enqueue_existing(conn, directories)
+            process_pending(conn, db_path, season_name, workers)
+            print(f"INFO: Überwache {', '.join(directories)}")
+
+            while stop_event is None or not stop_event.is_set():
+                paths, overflow = inotify.read(WAIT_TIMEOUT)
+                if not paths and not overflow:
+                    continue
+                time.sleep(SETTLE_SECONDS)
+                more_paths, more_overflow = inotify.read(0)
+                for path in paths + more_paths:
+                    enqueue(conn, path)
+                if overflow or more_overflow:
+                    print("WARNUNG: inotify-Warteschlange übergelaufen, Ordner werden neu gelesen.")
+                    enqueue_existing(conn, directories)
+                process_pending(conn, db_path, season_name, workers)
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verarbeitet neue Spieler-CSVs, sobald sie in den überwachten Ordnern ankommen.")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--ordner", action="append", help="Zu überwachender Ordner (mehrfach möglich, Standard: autodownload/ und process_gameday/).")
+    parser.add_argument("--saison", help="Saison für alle Dateien (Standard: aus Zeitpunkt und Punkte-Reset erkannt).")
+    parser.add_argument("--workers", type=int, default=None, help="Prozesse für die besten Teams (Standard: Anzahl CPUs).")
+    parser.add_argument("--wiederholen", action="store_true", help="Fehlgeschlagene Jobs erneut einreihen.")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        print(f"Fehler: Datenbank '{args.db}' nicht gefunden.")
+        return
+    if args.wiederholen:
+        conn = get_db_connection(args.db)
+        apply_migrations(conn)
+        with write_transaction(conn):
+            count = conn.execute("UPDATE ingest_jobs SET status = 'pending', error = NULL WHERE status = 'failed'").rowcount
+        conn.close()
+        print(f"INFO: {count} fehlgeschlagene Jobs erneut eingereiht.")
+    try:
+        run(args.db, args.ordner or WATCH_DIRS, args.saison, args.workers)
+    except KeyboardInterrupt:
+        print("Beendet.")
+
+
+if __name__ == "__main__":
+    main()